@@ -1,54 +1,48 @@
 #!/usr/bin/python
 
 import os
+from collections.abc import Mapping
 
-from converter.avcodecs import video_codec_list, audio_codec_list, subtitle_codec_list
+from converter.avcodecs import VideoCodec, video_codec_list, audio_codec_list, subtitle_codec_list
 from converter.formats import format_list
-from converter.ffmpeg import FFMpeg, FFMpegError, FFMpegConvertError
+from converter.ffmpeg import FFMpeg, FFMpegError, FFMpegConvertError, FFMpegStallError, FFMpegProgress, \
+    ProcessLimits, ResourceUsage
 
 
 class ConverterError(Exception):
     pass
 
 
-class Converter(object):
-    """
-    Converter class, encapsulates formats and codecs.
-
-    >>> c = Converter()
-    """
+# codec and format registries, built once and shared by all Converter objects
+audio_codecs = dict((cls.codec_name, cls) for cls in audio_codec_list)
+video_codecs = dict((cls.codec_name, cls) for cls in video_codec_list)
+subtitle_codecs = dict((cls.codec_name, cls) for cls in subtitle_codec_list)
+formats = dict((cls.format_name, cls) for cls in format_list)
 
-    def __init__(self, ffmpeg_path=None, ffprobe_path=None):
-        """
-        Initialize a new Converter object.
-        """
 
-        self.ffmpeg = FFMpeg(ffmpeg_path=ffmpeg_path,
-                             ffprobe_path=ffprobe_path)
-        self.video_codecs = {}
-        self.audio_codecs = {}
-        self.subtitle_codecs = {}
-        self.formats = {}
-
-        for cls in audio_codec_list:
-            name = cls.codec_name
-            self.audio_codecs[name] = cls
-
-        for cls in video_codec_list:
-            name = cls.codec_name
-            self.video_codecs[name] = cls
-
-        for cls in subtitle_codec_list:
-            name = cls.codec_name
-            self.subtitle_codecs[name] = cls
-
-        for cls in format_list:
-            name = cls.format_name
-            self.formats[name] = cls
+class OptionsTemplate(Mapping):
+    """
+    Conversion options (see Converter.convert()) validated and compiled
+    once into raw ffmpeg option lists. The only options left to compile
+    by render() are those depending on the source or on the run: size and
+    aspect filters computed from the source dimensions, threads and the
+    pass of a two-pass encoding.
+
+    A template is a read-only mapping of the original options, so it can
+    be used wherever options are expected, and it can be pickled.
+
+    >>> t = OptionsTemplate({
+    ...    'format': 'mp4',
+    ...    'audio': { 'codec': 'aac' },
+    ...    'video': { 'codec': 'h264', 'width': 1280, 'height': 720 }
+    ... })
+    >>> t.render(src_width=1920, src_height=800)
+    """
 
-    def parse_options(self, opt, twopass=None):
+    def __init__(self, opt):
         """
-        Parse format/codec options and prepare raw ffmpeg option list.
+        :param opt: conversion options, as a dictionary
+        :raise ConverterError: if options are invalid
         """
         if not isinstance(opt, dict):
             raise ConverterError('Invalid output specification')
@@ -57,10 +51,10 @@ class Converter(object):
             raise ConverterError('Format not specified')
 
         f = opt['format']
-        if f not in self.formats:
+        if f not in formats:
             raise ConverterError('Requested unknown format: ' + str(f))
 
-        format_options = self.formats[f]().parse_options(opt)
+        format_options = formats[f]().parse_options(opt)
         if format_options is None:
             raise ConverterError('Unknown container format error')
 
@@ -68,51 +62,19 @@ class Converter(object):
             raise ConverterError('Neither audio nor video streams requested')
 
         # audio options
-        if 'audio' not in opt or twopass == 1:
-            opt_audio = {'codec': None}
-        else:
-            opt_audio = opt['audio']
-            if not isinstance(opt_audio, dict) or 'codec' not in opt_audio:
-                raise ConverterError('Invalid audio codec specification')
-
-        c = opt_audio['codec']
-        if c not in self.audio_codecs:
-            raise ConverterError('Requested unknown audio codec ' + str(c))
-
-        audio_options = self.audio_codecs[c]().parse_options(opt_audio)
-        if audio_options is None:
-            raise ConverterError('Unknown audio codec error')
+        audio_options = self._compile(
+            audio_codecs, opt.get('audio', {'codec': None}), 'audio')[1]
+        # first pass of a two-pass encoding has no audio
+        no_audio_options = audio_codecs[None]().parse_options({'codec': None})
 
         # video options
-        if 'video' not in opt:
-            opt_video = {'codec': None}
-        else:
-            opt_video = opt['video']
-            if not isinstance(opt_video, dict) or 'codec' not in opt_video:
-                raise ConverterError('Invalid video codec specification')
+        opt_video = opt.get('video', {'codec': None})
+        video_codec, video_options = self._compile(
+            video_codecs, opt_video, 'video')
 
-        c = opt_video['codec']
-        if c not in self.video_codecs:
-            raise ConverterError('Requested unknown video codec ' + str(c))
-
-        video_options = self.video_codecs[c]().parse_options(opt_video)
-        if video_options is None:
-            raise ConverterError('Unknown video codec error')
-
-        if 'subtitle' not in opt:
-            opt_subtitle = {'codec': None}
-        else:
-            opt_subtitle = opt['subtitle']
-            if not isinstance(opt_subtitle, dict) or 'codec' not in opt_subtitle:
-                raise ConverterError('Invalid subtitle codec specification')
-
-        c = opt_subtitle['codec']
-        if c not in self.subtitle_codecs:
-            raise ConverterError('Requested unknown subtitle codec ' + str(c))
-
-        subtitle_options = self.subtitle_codecs[c]().parse_options(opt_subtitle)
-        if subtitle_options is None:
-            raise ConverterError('Unknown subtitle codec error')
+        # subtitle options
+        subtitle_options = self._compile(
+            subtitle_codecs, opt.get('subtitle', {'codec': None}), 'subtitle')[1]
 
         if 'map' in opt:
             m = opt['map']
@@ -121,9 +83,70 @@ class Converter(object):
             else:
                 format_options.extend(['-map', str(m)])
 
+        self._options = dict(opt)
+        self._audio_options = audio_options
+        self._no_audio_options = no_audio_options
+        self._video_options = video_options
+        self._subtitle_options = subtitle_options
+        self._format_options = format_options
+
+        # codec of an encoded video stream, whose options depend on the
+        # source dimensions and on threads
+        self._video_codec = None
+        self._opt_video = opt_video
+        if isinstance(video_codec, VideoCodec):
+            self._video_codec = video_codec
+
+        self._derived = {}
+
+    @staticmethod
+    def _compile(codecs, opt, stream):
+        """
+        Validate the options of a stream and compile them with the codec
+        they request, returning a tuple (codec object, option list).
+        """
+        if not isinstance(opt, dict) or 'codec' not in opt:
+            raise ConverterError('Invalid %s codec specification' % stream)
+
+        c = opt['codec']
+        if c not in codecs:
+            raise ConverterError('Requested unknown %s codec %s' % (stream, c))
+
+        codec = codecs[c]()
+        options = codec.parse_options(opt)
+        if options is None:
+            raise ConverterError('Unknown %s codec error' % stream)
+
+        return codec, options
+
+    def render(self, twopass=None, src_width=None, src_height=None, threads=None):
+        """
+        Produce the raw ffmpeg option list of a conversion.
+
+        :param twopass: pass (1 or 2) of a two-pass encoding
+        :param src_width: width of the source video stream
+        :param src_height: height of the source video stream
+        :param threads: threads of the video encoder, unless the video
+            options set their own
+        """
+        video_options = self._video_options
+        if self._video_codec is not None:
+            opt = self._opt_video
+            if src_width and src_height and \
+                    (opt.get('width') or opt.get('height')):
+                opt = dict(opt, src_width=src_width, src_height=src_height)
+            if threads and 'threads' not in self._opt_video:
+                opt = dict(opt, threads=threads)
+            if opt is not self._opt_video:
+                video_options = self._video_codec.parse_options(opt)
+
+        if twopass == 1:
+            audio_options = self._no_audio_options
+        else:
+            audio_options = self._audio_options
 
         # aggregate all options
-        optlist = audio_options + video_options + subtitle_options + format_options
+        optlist = audio_options + video_options + self._subtitle_options + self._format_options
 
         if twopass == 1:
             optlist.extend(['-pass', '1'])
@@ -132,13 +155,190 @@ class Converter(object):
 
         return optlist
 
-    def convert(self, infile, outfile, options, twopass=False, timeout=10):
+    def derive(self, key, opt):
+        """
+        Template of options derived from these ones (e.g. by
+        Converter.stream_copy_options()), compiled once for each key.
+        """
+        template = self._derived.get(key)
+        if template is None:
+            template = self._derived[key] = OptionsTemplate(opt)
+        return template
+
+    def __getitem__(self, key):
+        return self._options[key]
+
+    def __iter__(self):
+        return iter(self._options)
+
+    def __len__(self):
+        return len(self._options)
+
+    def __repr__(self):
+        return 'OptionsTemplate(%r)' % (self._options,)
+
+
+class Converter(object):
+    """
+    Converter class, encapsulates formats and codecs.
+
+    >>> c = Converter()
+    """
+
+    audio_codecs = audio_codecs
+    video_codecs = video_codecs
+    subtitle_codecs = subtitle_codecs
+    formats = formats
+
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None,
+                 probe_mode=FFMpeg.PROBE_TEXT, probe_cache=None, limits=None):
+        """
+        Initialize a new Converter object. See FFMpeg for the meaning of
+        the optional parameters.
+        """
+
+        self.ffmpeg = FFMpeg(ffmpeg_path=ffmpeg_path,
+                             ffprobe_path=ffprobe_path,
+                             probe_mode=probe_mode,
+                             probe_cache=probe_cache,
+                             limits=limits)
+
+    def parse_options(self, opt, twopass=None):
+        """
+        Parse format/codec options and prepare raw ffmpeg option list.
+        Options may be given as a dictionary or as an OptionsTemplate.
+        """
+        return self.compile_template(opt).render(twopass)
+
+    @classmethod
+    def compile_template(cls, options):
+        """
+        Validate and compile conversion options (see convert()) into an
+        OptionsTemplate, unless they already are one. Compiling options
+        used for many conversions once, e.g. when a configuration is
+        loaded, reports invalid options early and leaves only source
+        dependent options to compile for each conversion.
+
+        >>> t = Converter.compile_template({
+        ...    'format': 'mkv',
+        ...    'audio': { 'codec': 'aac' },
+        ...    'video': { 'codec': 'h264', 'width': 1280 }
+        ... })
+        """
+        if isinstance(options, OptionsTemplate):
+            return options
+        return OptionsTemplate(options)
+
+    def stream_copy_options(self, options, info):
+        """
+        Compare the source streams (info, as returned by probe()) against
+        the requested options and replace the audio and/or video codec with
+        'copy' whenever the source stream is already compatible, so the
+        stream is remuxed instead of re-encoded.
+
+        A video stream is compatible if it is encoded with the requested
+        codec and it matches the requested width, height and fps (those not
+        specified always match). An audio stream is compatible if it is
+        encoded with the requested codec and it matches the requested
+        channels and samplerate. In both cases a requested bitrate must not
+        be lower than the source one. Encoder tuning options (quality,
+        preset, ...) are ignored.
+
+        Returns a tuple (options, streams) where options is a copy of the
+        original options and streams maps 'audio' and 'video' to 'copy',
+        'transcode' or None (stream not requested). Given an OptionsTemplate,
+        an OptionsTemplate is returned: the original one if no stream is
+        copied, else a derived one, compiled once for each combination of
+        copied streams.
+
+        >>> opts, streams = c.stream_copy_options({
+        ...    'format': 'mp4',
+        ...    'audio': { 'codec': 'aac' },
+        ...    'video': { 'codec': 'h264' }
+        ... }, c.probe('test1.mkv'))
+        >>> streams
+        {'audio': 'transcode', 'video': 'copy'}
+        """
+        if not isinstance(options, (dict, OptionsTemplate)):
+            raise ConverterError('Invalid options')
+
+        template = options if isinstance(options, OptionsTemplate) else None
+        options = dict(options)
+        streams = {'audio': None, 'video': None}
+
+        opt_video = options.get('video')
+        if isinstance(opt_video, dict) and opt_video.get('codec') is not None:
+            src = info.video
+            if src is not None and not src.attached_pic and \
+                    self._is_stream_compatible(self.video_codecs, opt_video, src, (
+                        ('width', src.video_width),
+                        ('height', src.video_height),
+                        ('fps', src.video_fps),
+                    )):
+                options['video'] = {'codec': 'copy'}
+                streams['video'] = 'copy'
+            else:
+                streams['video'] = 'transcode'
+
+        opt_audio = options.get('audio')
+        if isinstance(opt_audio, dict) and opt_audio.get('codec') is not None:
+            src = info.audio
+            if src is not None and \
+                    self._is_stream_compatible(self.audio_codecs, opt_audio, src, (
+                        ('channels', src.audio_channels),
+                        ('samplerate', src.audio_samplerate),
+                    )):
+                options['audio'] = {'codec': 'copy'}
+                streams['audio'] = 'copy'
+            else:
+                streams['audio'] = 'transcode'
+
+        if template is not None:
+            key = (streams['audio'], streams['video'])
+            options = template.derive(key, options) if 'copy' in key else template
+
+        return options, streams
+
+    @staticmethod
+    def _is_stream_compatible(codecs, opt, src, properties):
+        """
+        Check whether the source stream (src) can be copied as it is to
+        satisfy the requested codec options (opt); properties is a sequence
+        of (option name, source value) pairs which must match.
+        """
+        c = opt['codec']
+        if c == 'copy':
+            return True
+        if c not in codecs or codecs[c].ffprobe_codec_name is None:
+            return False
+        if codecs[c].ffprobe_codec_name != src.codec:
+            return False
+
+        for name, value in properties:
+            if opt.get(name) is None:
+                continue
+            if value is None or abs(float(opt[name]) - value) > 0.01:
+                return False
+
+        # requested bitrate is in kbps, probed one in bps
+        if opt.get('bitrate') is not None:
+            if not src.bitrate or src.bitrate > int(opt['bitrate']) * 1000:
+                return False
+
+        return True
+
+    def convert(self, infile, outfile, options, twopass=False, timeout=10,
+                info=None, structured=False, log_file=None,
+                kill_grace=FFMpeg.DEFAULT_KILL_GRACE, threads=None,
+                usage=None):
         """
         Convert media file (infile) according to specified options, and
         save it to outfile. For two-pass encoding, specify the pass (1 or 2)
         in the twopass parameter.
 
-        Options should be passed as a dictionary. The keys are:
+        Options should be passed as a dictionary, or as an OptionsTemplate
+        (see compile_template()) when converting many files with the same
+        options. The keys are:
             * format (mandatory, string) - container format; see
               formats.BaseFormat for list of supported formats
             * audio (optional, dict) - audio codec and options; see
@@ -156,14 +356,33 @@ class Converter(object):
         content is the strategy process currently).
 
         The optional timeout argument specifies how long should the operation
-        be blocked in case ffmpeg gets stuck and doesn't report back. This
+        be blocked in case ffmpeg gets stuck and doesn't report progress. This
         doesn't limit the total strategy time, just the amount of time
-        Converter will wait for each update from ffmpeg. As it's usually
-        less than a second, the default of 10 is a reasonable default. To
-        disable the timeout, set it to None. You may need to do this if
-        using Converter in a threading environment, since the way the
-        timeout is handled (using signals) has special restriction when
-        using threads.
+        Converter will wait for ffmpeg to make progress. As it's usually
+        less than a second, the default of 10 is a reasonable default. A
+        stalled ffmpeg is terminated and FFMpegStallError is raised; it gets
+        kill_grace seconds to exit after SIGTERM before being killed. To
+        disable the timeout, set it to None. The timeout does not rely on
+        signals, so Converter can be used from any thread.
+
+        The optional info argument is a MediaInfo object previously returned
+        by probe() for the same infile. When given, the source file is not
+        probed again, so a caller that already examined the file pays for a
+        single ffprobe run per conversion.
+
+        If structured is True, the generator yields FFMpegProgress objects
+        (with the percent attribute set) instead of bare percentages.
+
+        The optional log_file receives the full ffmpeg stderr output, see
+        FFMpeg.convert().
+
+        The optional threads argument caps the threads used by the decoder
+        and, unless the video options set their own, by the video encoder,
+        so that concurrent conversions share the cores instead of each one
+        starting a thread per core.
+
+        The resource usage of ffprobe and ffmpeg processes is added to the
+        optional usage (a ResourceUsage object).
 
         >>> conv = Converter().convert('test1.ogg', '/tmp/output.mkv', {
         ...    'format': 'mkv',
@@ -175,53 +394,233 @@ class Converter(object):
         ...   pass # can be used to inform the user about the progress
         """
 
-        if not isinstance(options, dict):
+        if not isinstance(options, (dict, OptionsTemplate)):
             raise ConverterError('Invalid options')
 
+        options = self.compile_template(options)
+
         if not os.path.exists(infile):
             raise ConverterError("Source file doesn't exist: " + infile)
 
-        info = self.ffmpeg.probe(infile)
+        if info is None:
+            info = self.ffmpeg.probe(infile, usage=usage)
+        self.check_source(info)
+
+        if twopass:
+            input_opts, optlist1 = self.compile_options(options, info, 1, threads)
+            for progress in self._progress(
+                    self.ffmpeg.convert(infile, outfile, optlist1,
+                                        timeout=timeout, input_opts=input_opts,
+                                        structured=True, log_file=log_file,
+                                        kill_grace=kill_grace, usage=usage),
+                    info.format.duration, 0.0, 50.0, structured):
+                yield progress
+
+            _, optlist2 = self.compile_options(options, info, 2, threads)
+            for progress in self._progress(
+                    self.ffmpeg.convert(infile, outfile, optlist2,
+                                        timeout=timeout, input_opts=input_opts,
+                                        structured=True, log_file=log_file,
+                                        kill_grace=kill_grace, usage=usage),
+                    info.format.duration, 50.0, 50.0, structured):
+                yield progress
+        else:
+            input_opts, optlist = self.compile_options(options, info, twopass, threads)
+            for progress in self._progress(
+                    self.ffmpeg.convert(infile, outfile, optlist,
+                                        timeout=timeout, input_opts=input_opts,
+                                        structured=True, log_file=log_file,
+                                        kill_grace=kill_grace, usage=usage),
+                    info.format.duration, 0.0, 100.0, structured):
+                yield progress
+
+    @staticmethod
+    def check_source(info):
+        """
+        Raise ConverterError unless info (as returned by probe(), or None)
+        describes a source which can be converted.
+        """
         if info is None:
             raise ConverterError("Can't get information about source file")
 
         if not info.video and not info.audio:
             raise ConverterError('Source file has no audio or video streams')
 
-        if info.video and 'video' in options:
-            options = options.copy()
-            v = options['video'] = options['video'].copy()
-            v['src_width'] = info.video.video_width
-            v['src_height'] = info.video.video_height
-
         if info.format.duration < 0.01:
             raise ConverterError('Zero-length media')
 
-        if twopass:
-            optlist1 = self.parse_options(options, 1)
-            for timecode in self.ffmpeg.convert(infile, outfile, optlist1,
-                                                timeout=timeout):
-                yield int((50.0 * timecode) / info.format.duration)
-
-            optlist2 = self.parse_options(options, 2)
-            for timecode in self.ffmpeg.convert(infile, outfile, optlist2,
-                                                timeout=timeout):
-                yield int(50.0 + (50.0 * timecode) / info.format.duration)
-        else:
-            optlist = self.parse_options(options, twopass)
-            for timecode in self.ffmpeg.convert(infile, outfile, optlist,
-                                                timeout=timeout):
-                yield int((100.0 * timecode) / info.format.duration)
+    def compile_options(self, options, info, twopass=None, threads=None):
+        """
+        Compile the options of a conversion (see convert()) of the source
+        described by info into raw ffmpeg option lists, returning a tuple
+        (input options or None, output options).
+        """
+        src = info.video if 'video' in options else None
+        input_opts = ['-threads', str(threads)] if threads else None
+        return input_opts, self.compile_template(options).render(
+            twopass,
+            src.video_width if src else None,
+            src.video_height if src else None,
+            threads)
+
+    @staticmethod
+    def _progress(conversion, duration, offset, scale, structured):
+        """
+        Map the FFMpegProgress updates of a conversion to completion
+        percentages in the range [offset, offset + scale].
+        """
+        for progress in conversion:
+            progress.percent = int(offset + (scale * progress.out_time) / duration)
+            yield progress if structured else progress.percent
+
+    def convert_multi(self, infile, outputs, timeout=10, info=None,
+                      structured=False, log_file=None,
+                      kill_grace=FFMpeg.DEFAULT_KILL_GRACE, threads=None,
+                      usage=None):
+        """
+        Convert media file (infile) to several outputs with a single ffmpeg
+        process, so that the source is decoded only once. The outputs
+        argument is a list of (outfile, options) tuples, where options have
+        the same format used by convert().
+
+        Decoded video is fed through a split filtergraph, one branch per
+        output encoding video; size and filters of each output are applied
+        in its own branch. Outputs copying the video stream and audio-only
+        outputs are mapped straight from the source. Two-pass encoding is
+        not supported.
+
+        Like convert(), returns a generator that needs to be iterated to
+        drive the strategy process, yielding the completion percentage.
+        See convert() for the meaning of timeout, info, structured,
+        log_file, kill_grace and usage. With threads, the decoder gets the given
+        threads and they are split among the video encoders.
+
+        >>> conv = Converter().convert_multi('test1.ogg', [
+        ...    ('/tmp/output_720.mp4', {
+        ...        'format': 'mp4',
+        ...        'audio': { 'codec': 'aac' },
+        ...        'video': { 'codec': 'h264', 'width': 1280, 'height': 720 }
+        ...    }),
+        ...    ('/tmp/output.mp3', {
+        ...        'format': 'mp3',
+        ...        'audio': { 'codec': 'mp3' }
+        ...    })
+        ... ])
+
+        >>> for percent in conv:
+        ...   pass # can be used to inform the user about the progress
+        """
+
+        if not isinstance(outputs, list) or len(outputs) == 0:
+            raise ConverterError('Invalid outputs')
 
-    def probe(self, fname, posters_as_video=True):
+        if not os.path.exists(infile):
+            raise ConverterError("Source file doesn't exist: " + infile)
+
+        if info is None:
+            info = self.ffmpeg.probe(infile, usage=usage)
+        self.check_source(info)
+
+        input_opts, opts, outfile = self.compile_multi(outputs, info, threads)
+        for progress in self._progress(
+                self.ffmpeg.convert(infile, outfile, opts,
+                                    timeout=timeout, input_opts=input_opts,
+                                    structured=True, log_file=log_file,
+                                    kill_grace=kill_grace, usage=usage),
+                info.format.duration, 0.0, 100.0, structured):
+            yield progress
+
+    def compile_multi(self, outputs, info, threads=None):
+        """
+        Compile the outputs of a multiple conversion (see convert_multi())
+        of the source described by info into raw ffmpeg option lists,
+        returning a tuple (input options or None, options, last output
+        file); earlier outputs are embedded in the options.
+        """
+        templates = []
+        for outfile, options in outputs:
+            if not isinstance(options, (dict, OptionsTemplate)):
+                raise ConverterError('Invalid options')
+            templates.append((outfile, self.compile_template(options)))
+
+        encoders = sum(
+            1 for _, options in templates
+            if info.video and isinstance(options.get('video'), dict)
+            and options['video'].get('codec') not in (None, 'copy'))
+
+        branches = []
+        outlist = []
+        for outfile, options in templates:
+            opt_video = options.get('video')
+            encode_video = bool(info.video and isinstance(opt_video, dict)
+                                and opt_video.get('codec') not in (None, 'copy'))
+            if encode_video:
+                optlist = options.render(
+                    src_width=info.video.video_width,
+                    src_height=info.video.video_height,
+                    threads=max(threads // encoders, 1) if threads else None)
+            else:
+                optlist = options.render()
+
+            maps = []
+            if encode_video:
+                # size and filters are output options, which can not be
+                # applied to filtergraph outputs: move them to the branch
+                filters = []
+                scale = None
+                i = 0
+                while i < len(optlist):
+                    if optlist[i] == '-vf':
+                        filters.append(optlist[i + 1])
+                        del optlist[i:i + 2]
+                    elif optlist[i] == '-s':
+                        scale = 'scale=' + optlist[i + 1].replace('x', ':')
+                        del optlist[i:i + 2]
+                    else:
+                        i += 1
+                if scale:
+                    filters.append(scale)
+
+                label = 'v%d' % len(branches)
+                branches.append((label, ','.join(filters) or 'null'))
+                maps.extend(['-map', '[%s]' % label])
+            elif info.video and isinstance(opt_video, dict) and \
+                    opt_video.get('codec') == 'copy':
+                maps.extend(['-map', '0:v:0'])
+
+            opt_audio = options.get('audio')
+            if info.audio and isinstance(opt_audio, dict) and \
+                    opt_audio.get('codec') is not None:
+                maps.extend(['-map', '0:a:0'])
+
+            outlist.append((outfile, maps + optlist))
+
+        opts = []
+        if branches:
+            graph = '[0:v:0]split=%d%s' % (
+                len(branches), ''.join('[s%s]' % label for label, _ in branches))
+            for label, chain in branches:
+                graph += ';[s%s]%s[%s]' % (label, chain, label)
+            opts.extend(['-filter_complex', graph])
+
+        for outfile, optlist in outlist[:-1]:
+            opts.extend(optlist)
+            opts.extend(['-y', outfile])
+        opts.extend(outlist[-1][1])
+
+        input_opts = ['-threads', str(threads)] if threads else None
+        return input_opts, opts, outlist[-1][0]
+
+    def probe(self, fname, posters_as_video=True, usage=None):
         """
         Examine the media file. See the documentation of
         converter.FFMpeg.probe() for details.
 
         :param posters_as_video: Take poster images (mainly for audio files) as
             A video stream, defaults to True
+        :param usage: ResourceUsage object accounting for ffprobe
         """
-        return self.ffmpeg.probe(fname, posters_as_video)
+        return self.ffmpeg.probe(fname, posters_as_video, usage=usage)
 
     def thumbnail(self, fname, time, outfile, size=None, quality=FFMpeg.DEFAULT_JPEG_QUALITY):
         """
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+
+import asyncio
+import os
+import signal
+import subprocess
+import time
+
+from converter import Converter, ConverterError, OptionsTemplate
+from converter.ffmpeg import FFMpeg, FFMpegError, FFMpegProgress, FFMpegStallError, OutputRingBuffer
+
+
+class AsyncProcess(object):
+    """
+    Process spawned by FFMpeg._spawn(), so that it gets the limits of the
+    FFMpeg object, and driven from the event loop: its output pipes are read
+    as asyncio streams and it is collected by FFMpeg._collect() as soon as it
+    exits, so that its resource usage is known. Exit is awaited through a
+    pidfd, or by polling where pidfd_open() is not available.
+    """
+
+    # seconds between two checks of the exit of the process, without pidfd
+    EXIT_POLL = 0.1
+
+    def __init__(self, ffmpeg, popen):
+        self.ffmpeg = ffmpeg
+        self.popen = popen
+        self.pid = popen.pid
+        self.stdout = None
+        self.stderr = None
+        self._transports = []
+
+    @classmethod
+    async def create(cls, ffmpeg, cmds):
+        p = cls(ffmpeg, ffmpeg._spawn(cmds, stdin=subprocess.DEVNULL))
+        try:
+            p.stdout = await p._reader(p.popen.stdout)
+            p.stderr = await p._reader(p.popen.stderr)
+        except BaseException:
+            p.close()
+            await p.terminate(0)
+            raise
+        return p
+
+    async def _reader(self, pipe):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        self._transports.append(transport)
+        return reader
+
+    @property
+    def returncode(self):
+        return self.popen.returncode
+
+    async def _exit(self):
+        """
+        Wait for the process to exit, without collecting it.
+        """
+        if self.ffmpeg._exited(self.popen):
+            return
+        try:
+            fd = os.pidfd_open(self.pid)
+        except (AttributeError, OSError):
+            while not self.ffmpeg._exited(self.popen):
+                await asyncio.sleep(self.EXIT_POLL)
+            return
+
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+        loop.add_reader(fd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await exited
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+
+    async def wait(self, usage=None):
+        """
+        Coroutine waiting for the process to exit and collecting it, see
+        FFMpeg._collect().
+        """
+        await self._exit()
+        return self.ffmpeg._collect(self.popen, usage)
+
+    async def terminate(self, grace, usage=None):
+        """
+        Ask the process to terminate, killing it if still alive after grace
+        seconds, then collect it.
+        """
+        if self.returncode is not None:
+            return
+        self.ffmpeg._signal(self.popen, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self._exit(), grace)
+        except asyncio.TimeoutError:
+            self.ffmpeg._signal(self.popen, signal.SIGKILL)
+        await self.wait(usage)
+
+    def close(self):
+        for transport in self._transports:
+            transport.close()
+
+
+class AsyncFFMpeg(object):
+    """
+    asyncio counterpart of FFMpeg: ffprobe and ffmpeg are run as
+    AsyncProcess objects, so that a single event loop drives any number of
+    them without a thread or a process blocked on each one. Command lines,
+    process limits, parsing of probes and progress updates and error
+    reporting are those of the wrapped FFMpeg object.
+
+    >>> f = AsyncFFMpeg(FFMpeg())
+    """
+
+    def __init__(self, ffmpeg):
+        """
+        :param ffmpeg: wrapped FFMpeg object, which also provides the probe
+            mode and the probe cache
+        """
+        self.ffmpeg = ffmpeg
+
+    async def _spawn(self, cmds):
+        return await AsyncProcess.create(self.ffmpeg, cmds)
+
+    async def probe(self, fname, posters_as_video=True, mode=None, usage=None):
+        """
+        Coroutine examining the media file, see FFMpeg.probe(). The probe
+        cache may block (e.g. on disk), so it is used from the default
+        executor of the loop.
+        """
+        if not os.path.exists(fname):
+            return None
+
+        if mode is None:
+            mode = self.ffmpeg.probe_mode
+
+        loop = asyncio.get_running_loop()
+        # the cache holds results of the default mode only
+        probe_cache = self.ffmpeg.probe_cache if mode == self.ffmpeg.probe_mode else None
+        if probe_cache is not None:
+            info = await loop.run_in_executor(None, probe_cache.get, fname)
+            if info is not None:
+                info.posters_as_video = posters_as_video
+                return info
+
+        self.ffmpeg.probe_count += 1
+        if usage is not None:
+            usage.add_probe()
+        p = await self._spawn(self.ffmpeg.probe_command(fname, mode))
+        try:
+            stdout_data, _ = await asyncio.gather(p.stdout.read(), p.stderr.read())
+            await p.wait(usage)
+        finally:
+            p.close()
+        info = self.ffmpeg.parse_probe(stdout_data, mode, posters_as_video)
+
+        if info is not None and probe_cache is not None:
+            await loop.run_in_executor(None, probe_cache.put, fname, info)
+
+        return info
+
+    async def convert(self, infile, outfile, opts, timeout=10, input_opts=None,
+                      log_file=None, kill_grace=FFMpeg.DEFAULT_KILL_GRACE,
+                      usage=None):
+        """
+        Asynchronous generator converting the source media (infile), see
+        FFMpeg.convert() for the meaning of the arguments. FFMpegProgress
+        objects are yielded.
+
+        >>> async for progress in f.convert('test.ogg', '/tmp/output.mp3',
+        ...    ['-acodec libmp3lame', '-vn']):
+        ...    pass
+        """
+        if not os.path.exists(infile):
+            raise FFMpegError("Input file doesn't exist: " + infile)
+
+        cmds = self.ffmpeg.convert_command(infile, outfile, opts, input_opts)
+
+        try:
+            p = await self._spawn(cmds)
+        except OSError:
+            raise FFMpegError('Error while calling ffmpeg binary')
+
+        yielded = False
+        output = OutputRingBuffer(log_file=log_file)
+        progress = FFMpegProgress()
+        drain = asyncio.ensure_future(self._drain(p.stderr, output))
+
+        last_progress = None
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(
+                        p.stdout.readline(),
+                        None if deadline is None else max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    await p.terminate(kill_grace, usage)
+                    raise FFMpegStallError(
+                        'No progress for %s seconds' % timeout,
+                        ' '.join(cmds), output.tail(), pid=p.pid)
+                if not line:
+                    break
+
+                if progress.parse_line(line.decode('ascii', 'replace')):
+                    current = (progress.out_time, progress.frame,
+                               progress.total_size)
+                    if deadline is not None and current != last_progress:
+                        deadline = time.monotonic() + timeout
+                    last_progress = current
+                    yielded = True
+                    yield progress
+                    progress = FFMpegProgress(progress)
+
+            await drain
+            await p.wait(usage)
+        except BaseException:
+            # stall, error, cancellation or generator closed early: do not
+            # leave ffmpeg behind
+            await p.terminate(kill_grace, usage)
+            raise
+        finally:
+            drain.cancel()
+            output.close()
+            p.close()
+
+        self.ffmpeg.check_result(cmds, infile, output, p.returncode, yielded, p.pid)
+
+    @staticmethod
+    async def _drain(stream, output):
+        while True:
+            data = await stream.read(FFMpeg.READ_SIZE)
+            if not data:
+                break
+            output.write(data)
+
+
+class AsyncConverter(object):
+    """
+    asyncio counterpart of Converter: options are compiled by the wrapped
+    Converter object, ffprobe and ffmpeg are run by AsyncFFMpeg.
+
+    >>> c = AsyncConverter(Converter())
+    """
+
+    def __init__(self, converter):
+        """
+        :param converter: wrapped Converter object
+        """
+        self.converter = converter
+        self.ffmpeg = AsyncFFMpeg(converter.ffmpeg)
+
+    async def probe(self, fname, posters_as_video=True, usage=None):
+        """
+        Coroutine examining the media file, see Converter.probe().
+        """
+        return await self.ffmpeg.probe(fname, posters_as_video, usage=usage)
+
+    async def convert(self, infile, outfile, options, twopass=False,
+                      timeout=10, info=None, log_file=None,
+                      kill_grace=FFMpeg.DEFAULT_KILL_GRACE, threads=None,
+                      usage=None):
+        """
+        Asynchronous generator converting the media file (infile), see
+        Converter.convert() for the meaning of the arguments. FFMpegProgress
+        objects, with percent set, are yielded.
+
+        >>> async for progress in c.convert('test1.ogg', '/tmp/output.mkv', {
+        ...    'format': 'mkv',
+        ...    'audio': { 'codec': 'mp3' },
+        ...    'video': { 'codec': 'h264' }}):
+        ...   pass
+        """
+        if not isinstance(options, (dict, OptionsTemplate)):
+            raise ConverterError('Invalid options')
+
+        options = Converter.compile_template(options)
+
+        if not os.path.exists(infile):
+            raise ConverterError("Source file doesn't exist: " + infile)
+
+        if info is None:
+            info = await self.ffmpeg.probe(infile, usage=usage)
+        Converter.check_source(info)
+
+        passes = [(1, 0.0, 50.0), (2, 50.0, 50.0)] if twopass else [(None, 0.0, 100.0)]
+        for npass, offset, scale in passes:
+            input_opts, optlist = self.converter.compile_options(options, info, npass, threads)
+            async for progress in self._progress(
+                    self.ffmpeg.convert(infile, outfile, optlist,
+                                        timeout=timeout, input_opts=input_opts,
+                                        log_file=log_file,
+                                        kill_grace=kill_grace, usage=usage),
+                    info.format.duration, offset, scale):
+                yield progress
+
+    async def convert_multi(self, infile, outputs, timeout=10, info=None,
+                            log_file=None,
+                            kill_grace=FFMpeg.DEFAULT_KILL_GRACE, threads=None,
+                            usage=None):
+        """
+        Asynchronous generator converting the media file (infile) to
+        several outputs with a single ffmpeg process, see
+        Converter.convert_multi().
+        """
+        if not isinstance(outputs, list) or len(outputs) == 0:
+            raise ConverterError('Invalid outputs')
+
+        if not os.path.exists(infile):
+            raise ConverterError("Source file doesn't exist: " + infile)
+
+        if info is None:
+            info = await self.ffmpeg.probe(infile, usage=usage)
+        Converter.check_source(info)
+
+        input_opts, opts, outfile = self.converter.compile_multi(outputs, info, threads)
+        async for progress in self._progress(
+                self.ffmpeg.convert(infile, outfile, opts,
+                                    timeout=timeout, input_opts=input_opts,
+                                    log_file=log_file,
+                                    kill_grace=kill_grace, usage=usage),
+                info.format.duration, 0.0, 100.0):
+            yield progress
+
+    @staticmethod
+    async def _progress(conversion, duration, offset, scale):
+        """
+        See Converter._progress(); the conversion is closed as soon as the
+        consumer stops iterating, so that ffmpeg is not left behind.
+        """
+        try:
+            async for progress in conversion:
+                progress.percent = int(offset + (scale * progress.out_time) / duration)
+                yield progress
+        finally:
+            await conversion.aclose()
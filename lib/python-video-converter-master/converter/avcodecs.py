@@ -9,6 +9,8 @@ class BaseCodec(object):
     encoder_options = {}
     codec_name = None
     ffmpeg_codec_name = None
+    # codec name reported by ffprobe for streams encoded with this codec
+    ffprobe_codec_name = None
 
     def parse_options(self, opt):
         if 'codec' not in opt or opt['codec'] != self.codec_name:
@@ -152,6 +154,7 @@ class VideoCodec(BaseCodec):
             * pad - pad with black bars
       * src_width (int) - source width
       * src_height (int) - source height
+      * threads (integer) - encoder threads (0 lets the encoder decide)
 
     Aspect preserval mode is only used if both source
     and both destination sizes are specified. If source
@@ -175,6 +178,7 @@ class VideoCodec(BaseCodec):
         'mode': str,
         'src_width': int,
         'src_height': int,
+        'threads': int,
     }
 
     def _aspect_corrections(self, sw, sh, w, h, mode):
@@ -308,6 +312,9 @@ class VideoCodec(BaseCodec):
         if filters:
             optlist.extend(['-vf', filters])
 
+        if 'threads' in safe and safe['threads'] >= 0:
+            optlist.extend(['-threads', str(safe['threads'])])
+
         optlist.extend(self._codec_specific_produce_ffmpeg_list(safe))
         return optlist
 
@@ -381,6 +388,7 @@ class VorbisCodec(AudioCodec):
     """
     codec_name = 'vorbis'
     ffmpeg_codec_name = 'libvorbis'
+    ffprobe_codec_name = 'vorbis'
     encoder_options = AudioCodec.encoder_options.copy()
     encoder_options.update({
         'quality': int,  # audio quality. Range is 0-10(highest quality)
@@ -400,6 +408,7 @@ class AacCodec(AudioCodec):
     """
     codec_name = 'aac'
     ffmpeg_codec_name = 'aac'
+    ffprobe_codec_name = 'aac'
     aac_experimental_enable = ['-strict', 'experimental']
 
     def _codec_specific_produce_ffmpeg_list(self, safe):
@@ -412,6 +421,7 @@ class FdkAacCodec(AudioCodec):
     """
     codec_name = 'libfdk_aac'
     ffmpeg_codec_name = 'libfdk_aac'
+    ffprobe_codec_name = 'aac'
 
 
 class Ac3Codec(AudioCodec):
@@ -420,6 +430,7 @@ class Ac3Codec(AudioCodec):
     """
     codec_name = 'ac3'
     ffmpeg_codec_name = 'ac3'
+    ffprobe_codec_name = 'ac3'
 
 
 class FlacCodec(AudioCodec):
@@ -428,6 +439,7 @@ class FlacCodec(AudioCodec):
     """
     codec_name = 'flac'
     ffmpeg_codec_name = 'flac'
+    ffprobe_codec_name = 'flac'
 
 
 class DtsCodec(AudioCodec):
@@ -436,6 +448,7 @@ class DtsCodec(AudioCodec):
     """
     codec_name = 'dts'
     ffmpeg_codec_name = 'dts'
+    ffprobe_codec_name = 'dts'
 
 
 class Mp3Codec(AudioCodec):
@@ -444,6 +457,7 @@ class Mp3Codec(AudioCodec):
     """
     codec_name = 'mp3'
     ffmpeg_codec_name = 'libmp3lame'
+    ffprobe_codec_name = 'mp3'
 
 
 class Mp2Codec(AudioCodec):
@@ -452,6 +466,7 @@ class Mp2Codec(AudioCodec):
     """
     codec_name = 'mp2'
     ffmpeg_codec_name = 'mp2'
+    ffprobe_codec_name = 'mp2'
 
 
 # Video Codecs
@@ -462,6 +477,7 @@ class TheoraCodec(VideoCodec):
     """
     codec_name = 'theora'
     ffmpeg_codec_name = 'libtheora'
+    ffprobe_codec_name = 'theora'
     encoder_options = VideoCodec.encoder_options.copy()
     encoder_options.update({
         'quality': int,  # audio quality. Range is 0-10(highest quality)
@@ -482,6 +498,7 @@ class H264Codec(VideoCodec):
     """
     codec_name = 'h264'
     ffmpeg_codec_name = 'libx264'
+    ffprobe_codec_name = 'h264'
     encoder_options = VideoCodec.encoder_options.copy()
     encoder_options.update({
         'preset': str,  # common presets are ultrafast, superfast, veryfast,
@@ -512,6 +529,7 @@ class DivxCodec(VideoCodec):
     """
     codec_name = 'divx'
     ffmpeg_codec_name = 'mpeg4'
+    ffprobe_codec_name = 'mpeg4'
 
 
 class Vp8Codec(VideoCodec):
@@ -520,6 +538,7 @@ class Vp8Codec(VideoCodec):
     """
     codec_name = 'vp8'
     ffmpeg_codec_name = 'libvpx'
+    ffprobe_codec_name = 'vp8'
 
 
 class H263Codec(VideoCodec):
@@ -528,6 +547,7 @@ class H263Codec(VideoCodec):
     """
     codec_name = 'h263'
     ffmpeg_codec_name = 'h263'
+    ffprobe_codec_name = 'h263'
 
 
 class FlvCodec(VideoCodec):
@@ -536,6 +556,7 @@ class FlvCodec(VideoCodec):
     """
     codec_name = 'flv'
     ffmpeg_codec_name = 'flv'
+    ffprobe_codec_name = 'flv1'
 
 
 class MpegCodec(VideoCodec):
@@ -569,6 +590,7 @@ class Mpeg1Codec(MpegCodec):
     """
     codec_name = 'mpeg1'
     ffmpeg_codec_name = 'mpeg1video'
+    ffprobe_codec_name = 'mpeg1video'
 
 
 class Mpeg2Codec(MpegCodec):
@@ -577,6 +599,7 @@ class Mpeg2Codec(MpegCodec):
     """
     codec_name = 'mpeg2'
     ffmpeg_codec_name = 'mpeg2video'
+    ffprobe_codec_name = 'mpeg2video'
 
 
 # Subtitle Codecs
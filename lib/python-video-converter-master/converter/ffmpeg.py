@@ -2,8 +2,15 @@
 
 import os.path
 import os
+import ctypes
+import json
 import re
+import resource
+import selectors
 import signal
+import sys
+import threading
+import time
 from subprocess import Popen, PIPE
 import logging
 import locale
@@ -26,7 +33,8 @@ class FFMpegConvertError(Exception):
         @param    cmd: Full command string used to spawn ffmpeg.
         @type     cmd: C{str}
 
-        @param    output: Full stdout output from the ffmpeg command.
+        @param    output: Last part of stderr output from the ffmpeg command
+                          (see OutputRingBuffer).
         @type     output: C{str}
 
         @param    details: Optional error details.
@@ -40,7 +48,7 @@ class FFMpegConvertError(Exception):
         self.pid = pid
 
     def __repr__(self):
-        error = self.details if self.details else self.message
+        error = self.details if self.details else self.args[0]
         return ('<FFMpegConvertError error="%s", pid=%s, cmd="%s">' %
                 (error, self.pid, self.cmd))
 
@@ -48,6 +56,81 @@ class FFMpegConvertError(Exception):
         return self.__repr__()
 
 
+class OutputRingBuffer(object):
+    """
+    Bounded buffer keeping the last capacity bytes written to it, used to
+    hold the tail of ffmpeg output needed to report errors without growing
+    with the length of the conversion. Optionally, everything written is
+    also appended to a log file.
+    """
+
+    DEFAULT_CAPACITY = 64 * 1024
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, log_file=None):
+        """
+        @param    capacity: Maximum number of bytes kept in memory.
+        @type     capacity: C{int}
+
+        @param    log_file: Optional path of a file receiving the full output.
+        @type     log_file: C{str}
+        """
+        self.capacity = capacity
+        self.written = 0
+        self._buf = bytearray()
+        self._log = open(log_file, 'ab') if log_file else None
+
+    def write(self, data):
+        self.written += len(data)
+        if self._log is not None:
+            self._log.write(data)
+
+        self._buf += data
+        # trimming only past twice the capacity keeps writes amortized O(1)
+        if len(self._buf) > 2 * self.capacity:
+            del self._buf[:len(self._buf) - self.capacity]
+
+    def tail(self):
+        """
+        Return the last capacity bytes written, decoded.
+        """
+        return bytes(self._buf[-self.capacity:]).decode(console_encoding,
+                                                         'replace')
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+class FFMpegStallError(FFMpegError):
+    def __init__(self, message, cmd, output, pid=0):
+        """
+        Raised when ffmpeg reports no progress within the timeout and
+        it has been terminated.
+
+        @param    message: Error message.
+        @type     message: C{str}
+
+        @param    cmd: Full command string used to spawn ffmpeg.
+        @type     cmd: C{str}
+
+        @param    output: Last part of stderr output from the ffmpeg command.
+        @type     output: C{str}
+        """
+        super(FFMpegStallError, self).__init__(message)
+
+        self.cmd = cmd
+        self.output = output
+        self.pid = pid
+
+    def __repr__(self):
+        return ('<FFMpegStallError error="%s", pid=%s, cmd="%s">' %
+                (self.args[0], self.pid, self.cmd))
+
+    def __str__(self):
+        return self.__repr__()
+
+
 class MediaFormatInfo(object):
     """
     Describes the media container format. The attributes are:
@@ -58,6 +141,8 @@ class MediaFormatInfo(object):
       * filesize - file size
     """
 
+    __slots__ = ('format', 'fullname', 'bitrate', 'duration', 'filesize')
+
     def __init__(self):
         self.format = None
         self.fullname = None
@@ -78,7 +163,16 @@ class MediaFormatInfo(object):
         elif key == 'duration':
             self.duration = MediaStreamInfo.parse_float(val, None)
         elif key == 'size':
-            self.size = MediaStreamInfo.parse_float(val, None)
+            self.filesize = MediaStreamInfo.parse_float(val, None)
+
+    def parse_ffprobe_json(self, data):
+        """
+        Parse the "format" object of ffprobe JSON output.
+        """
+        for key, val in data.items():
+            field = FFPROBE_JSON_FORMAT_FIELDS.get(key)
+            if field is not None:
+                setattr(self, field[0], field[1](val))
 
     def __repr__(self):
         if self.duration is None:
@@ -108,6 +202,11 @@ class MediaStreamInfo(object):
       * audio_samplerate - sample rate (Hz)
     """
 
+    __slots__ = ('index', 'type', 'codec', 'codec_desc', 'duration', 'bitrate',
+                 'video_width', 'video_height', 'video_fps', 'audio_channels',
+                 'audio_samplerate', 'attached_pic', 'sub_forced',
+                 'sub_default', 'metadata')
+
     def __init__(self):
         self.index = None
         self.type = None
@@ -139,6 +238,52 @@ class MediaStreamInfo(object):
         except:
             return default
 
+    @staticmethod
+    def parse_rate(val, default=None):
+        """
+        Parse a frame rate expressed either as a fraction ("30000/1001")
+        or as a decimal number.
+        """
+        if '/' in val:
+            n, d = val.split('/')
+            n = MediaStreamInfo.parse_float(n)
+            d = MediaStreamInfo.parse_float(d)
+            if n > 0.0 and d > 0.0:
+                return float(n) / float(d)
+        elif '.' in val:
+            return MediaStreamInfo.parse_float(val)
+        return default
+
+    def parse_ffprobe_json(self, data):
+        """
+        Parse one element of the "streams" array of ffprobe JSON output.
+        """
+        for key, val in data.items():
+            field = FFPROBE_JSON_STREAM_FIELDS.get(key)
+            if field is not None:
+                setattr(self, field[0], field[1](val))
+
+        if self.type == 'audio' and 'avg_frame_rate' in data:
+            self.video_fps = self.parse_rate(data['avg_frame_rate'],
+                                             self.video_fps)
+        elif self.type == 'video' and 'r_frame_rate' in data:
+            self.video_fps = self.parse_rate(data['r_frame_rate'],
+                                             self.video_fps)
+
+        disposition = data.get('disposition')
+        if disposition:
+            self.attached_pic = self.parse_int(
+                disposition.get('attached_pic'), None)
+            if self.type == 'subtitle':
+                self.sub_forced = self.parse_int(disposition.get('forced'),
+                                                 None)
+                self.sub_default = self.parse_int(disposition.get('default'),
+                                                  None)
+
+        tags = data.get('tags')
+        if tags:
+            self.metadata.update(tags)
+
     def parse_ffprobe(self, key, val):
         """
         Parse raw ffprobe output (key=value).
@@ -174,25 +319,11 @@ class MediaStreamInfo(object):
 
         if self.type == 'audio':
             if key == 'avg_frame_rate':
-                if '/' in val:
-                    n, d = val.split('/')
-                    n = self.parse_float(n)
-                    d = self.parse_float(d)
-                    if n > 0.0 and d > 0.0:
-                        self.video_fps = float(n) / float(d)
-                elif '.' in val:
-                    self.video_fps = self.parse_float(val)
+                self.video_fps = self.parse_rate(val, self.video_fps)
 
         if self.type == 'video':
             if key == 'r_frame_rate':
-                if '/' in val:
-                    n, d = val.split('/')
-                    n = self.parse_float(n)
-                    d = self.parse_float(d)
-                    if n > 0.0 and d > 0.0:
-                        self.video_fps = float(n) / float(d)
-                elif '.' in val:
-                    self.video_fps = self.parse_float(val)
+                self.video_fps = self.parse_rate(val, self.video_fps)
 
         if self.type == 'subtitle':
             if key == 'disposition:forced':
@@ -274,6 +405,21 @@ class MediaInfo(object):
                 elif in_format:
                     self.format.parse_ffprobe(k, v)
 
+    def parse_ffprobe_json(self, raw):
+        """
+        Parse ffprobe output produced with "-print_format json".
+        """
+        data = json.loads(raw) if raw else {}
+
+        for item in data.get('streams', ()):
+            stream = MediaStreamInfo()
+            stream.parse_ffprobe_json(item)
+            if stream.type:
+                self.streams.append(stream)
+
+        if 'format' in data:
+            self.format.parse_ffprobe_json(data['format'])
+
     def __repr__(self):
         return 'MediaInfo(format=%s, streams=%s)' % (repr(self.format),
                                                      repr(self.streams))
@@ -304,6 +450,270 @@ class MediaInfo(object):
         return None
 
 
+class FFMpegProgress(object):
+    """
+    One progress update, as written by ffmpeg with "-progress". The
+    attributes are:
+      * frame - number of frames processed
+      * fps - encoding speed in frames per second
+      * bitrate - output bitrate (kbit/s)
+      * total_size - bytes written to the output
+      * out_time - position (seconds) in the output timeline
+      * speed - encoding speed as multiple of realtime
+      * progress - 'continue', or 'end' for the last update
+      * percent - completion percentage, when known (see Converter)
+    """
+
+    __slots__ = ('frame', 'fps', 'bitrate', 'total_size', 'out_time',
+                 'speed', 'progress', 'percent')
+
+    def __init__(self, previous=None):
+        """
+        :param previous: update whose values are kept for the keys missing
+            from this one
+        """
+        self.frame = None
+        self.fps = None
+        self.bitrate = None
+        self.total_size = None
+        self.out_time = 0.0
+        self.speed = None
+        self.progress = None
+        self.percent = None
+
+        if previous is not None:
+            for name in self.__slots__:
+                setattr(self, name, getattr(previous, name))
+            self.progress = None
+
+    def parse_line(self, line):
+        """
+        Parse one key=value line. Returns True when the line closes the
+        update (key "progress").
+        """
+        key, _, val = line.strip().partition('=')
+        if key == 'frame':
+            self.frame = MediaStreamInfo.parse_int(val, None)
+        elif key == 'fps':
+            self.fps = MediaStreamInfo.parse_float(val, None)
+        elif key == 'bitrate':
+            self.bitrate = MediaStreamInfo.parse_float(
+                val.replace('kbits/s', ''), None)
+        elif key == 'total_size':
+            self.total_size = MediaStreamInfo.parse_int(val, None)
+        elif key in ('out_time_us', 'out_time_ms'):
+            # out_time_ms is in microseconds as well
+            us = MediaStreamInfo.parse_int(val, None)
+            if us is not None and us >= 0:
+                self.out_time = us / 1000000.0
+        elif key == 'speed':
+            self.speed = MediaStreamInfo.parse_float(val.rstrip('x'), None)
+        elif key == 'progress':
+            self.progress = val
+            return True
+        return False
+
+    def __repr__(self):
+        return ('FFMpegProgress(out_time=%.2f, frame=%s, fps=%s, speed=%s, '
+                'total_size=%s, progress=%s)' % (
+                    self.out_time, self.frame, self.fps, self.speed,
+                    self.total_size, self.progress))
+
+
+# Table-driven decoding of ffprobe JSON output: each known key is mapped to
+# the (attribute, parser) pair that stores it. Keys not listed are ignored.
+FFPROBE_JSON_FORMAT_FIELDS = {
+    'format_name': ('format', str),
+    'format_long_name': ('fullname', str),
+    'bit_rate': ('bitrate', lambda v: MediaStreamInfo.parse_float(v, None)),
+    'duration': ('duration', lambda v: MediaStreamInfo.parse_float(v, None)),
+    'size': ('filesize', lambda v: MediaStreamInfo.parse_float(v, None)),
+}
+
+FFPROBE_JSON_STREAM_FIELDS = {
+    'index': ('index', MediaStreamInfo.parse_int),
+    'codec_type': ('type', str),
+    'codec_name': ('codec', str),
+    'codec_long_name': ('codec_desc', str),
+    'duration': ('duration', MediaStreamInfo.parse_float),
+    'bit_rate': ('bitrate', lambda v: MediaStreamInfo.parse_int(v, None)),
+    'width': ('video_width', MediaStreamInfo.parse_int),
+    'height': ('video_height', MediaStreamInfo.parse_int),
+    'channels': ('audio_channels', MediaStreamInfo.parse_int),
+    'sample_rate': ('audio_samplerate', MediaStreamInfo.parse_float),
+}
+
+
+
+class ProcessLimits(object):
+    """
+    Resource governance of the processes spawned by FFMpeg (Linux). The
+    attributes are:
+      * memory - maximum address space in bytes (RLIMIT_AS): allocations
+        beyond it fail, so that a runaway process ends with an error
+      * cpu - maximum CPU seconds (RLIMIT_CPU): the process receives
+        SIGXCPU, then SIGKILL CPU_GRACE seconds later
+      * parent_death_signal - signal sent to the process when its parent
+        dies (PR_SET_PDEATHSIG), so that it is not left behind as an orphan;
+        note that the signal is sent as soon as the thread which spawned the
+        process ends
+      * process_group - the process leads its own process group (and
+        session), signalled as a whole when the process is terminated, so
+        that helpers it spawned do not survive it
+
+    memory, cpu and parent_death_signal are applied by a preexec_fn, run in
+    the child between fork and exec: in a multithreaded parent it may
+    deadlock on a lock held by another thread at fork time, and it rules out
+    the faster posix_spawn()/vfork() path of subprocess. They are therefore
+    off by default. process_group is applied by subprocess itself
+    (start_new_session), without a preexec_fn.
+
+    >>> f = FFMpeg(limits=ProcessLimits(memory=4 * 1024 ** 3, cpu=3600,
+    ...            parent_death_signal=signal.SIGKILL))
+    """
+
+    # linux/prctl.h
+    PR_SET_PDEATHSIG = 1
+    # seconds between SIGXCPU and SIGKILL
+    CPU_GRACE = 5
+
+    # prctl() of the C library, resolved once; False where not available
+    _prctl = None
+
+    def __init__(self, memory=None, cpu=None, parent_death_signal=None,
+                 process_group=False):
+        self.memory = memory
+        self.cpu = cpu
+        self.parent_death_signal = parent_death_signal
+        self.process_group = process_group
+
+    @property
+    def enabled(self):
+        """
+        Whether a preexec_fn is needed.
+        """
+        return bool(self.memory or self.cpu or self.parent_death_signal)
+
+    @classmethod
+    def prctl(cls):
+        """
+        Return prctl() of the C library, None where it is not available.
+        """
+        if cls._prctl is None:
+            try:
+                cls._prctl = ctypes.CDLL(None, use_errno=True).prctl
+            except (OSError, AttributeError):
+                cls._prctl = False
+        return cls._prctl or None
+
+    @classmethod
+    def set_parent_death_signal(cls, sig):
+        """
+        Have the calling process receive signal sig when its parent dies.
+        Returns False if not supported.
+        """
+        prctl = cls.prctl()
+        return prctl is not None and prctl(cls.PR_SET_PDEATHSIG, int(sig), 0, 0, 0) == 0
+
+    def preexec_fn(self):
+        """
+        Return the function applying the limits in a child process, to be
+        given to Popen, or None if there is nothing to apply. Whatever can
+        fail or allocate (e.g. resolving prctl()) is done here, before the
+        fork.
+        """
+        if not self.enabled:
+            return None
+
+        memory = self.memory
+        cpu = self.cpu
+        sig = self.parent_death_signal
+        prctl = self.prctl() if sig else None
+        parent = os.getpid()
+
+        def preexec():
+            if memory:
+                resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            if cpu:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + ProcessLimits.CPU_GRACE))
+            if prctl is not None:
+                prctl(ProcessLimits.PR_SET_PDEATHSIG, int(sig), 0, 0, 0)
+                # the parent may have died before the signal was requested
+                if os.getppid() != parent:
+                    os.kill(os.getpid(), sig)
+
+        return preexec
+
+    def __repr__(self):
+        return ('ProcessLimits(memory=%s, cpu=%s, parent_death_signal=%s, '
+                'process_group=%s)' % (self.memory, self.cpu,
+                                       self.parent_death_signal,
+                                       self.process_group))
+
+
+class ResourceUsage(object):
+    """
+    Resource usage of the processes of a task (e.g. a conversion), added up
+    from the rusage reported by os.wait4() as each process is collected.
+    The attributes are:
+      * processes - number of processes collected
+      * user_time - CPU seconds spent in user mode
+      * system_time - CPU seconds spent in kernel mode
+      * max_rss - largest resident set of a process, in bytes
+      * probes - number of ffprobe processes spawned, counted as they start
+
+    Processes may be collected by several threads; the object can be
+    pickled.
+    """
+
+    # unit of ru_maxrss: bytes on macOS, kilobytes on Linux and other systems
+    RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+    def __init__(self):
+        self.processes = 0
+        self.probes = 0
+        self.user_time = 0.0
+        self.system_time = 0.0
+        self.max_rss = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def cpu_time(self):
+        return self.user_time + self.system_time
+
+    def add(self, rusage):
+        """
+        Account for a process, given its rusage (see os.wait4()).
+        """
+        with self._lock:
+            self.processes += 1
+            self.user_time += rusage.ru_utime
+            self.system_time += rusage.ru_stime
+            self.max_rss = max(self.max_rss, rusage.ru_maxrss * self.RSS_UNIT)
+
+    def add_probe(self):
+        """
+        Account for an ffprobe process about to be spawned.
+        """
+        with self._lock:
+            self.probes += 1
+
+    def __repr__(self):
+        return ('ResourceUsage(processes=%d, user_time=%.2f, system_time=%.2f, '
+                'max_rss=%d, probes=%d)' % (self.processes, self.user_time,
+                                            self.system_time, self.max_rss,
+                                            self.probes))
+
+
 class FFMpeg(object):
     """
     FFMPeg wrapper object, takes care of calling the ffmpeg binaries,
@@ -313,10 +723,43 @@ class FFMpeg(object):
     """
     DEFAULT_JPEG_QUALITY = 4
 
-    def __init__(self, ffmpeg_path=None, ffprobe_path=None):
+    # bytes requested to the OS for each read of ffmpeg output pipes
+    READ_SIZE = 65536
+    # seconds granted to a stalled ffmpeg to exit after SIGTERM, before SIGKILL
+    DEFAULT_KILL_GRACE = 5
+    # seconds between two checks of the exit of a terminated process
+    EXIT_POLL = 0.05
+
+    # ffprobe output modes, see probe()
+    PROBE_TEXT = 'text'
+    PROBE_JSON = 'json'
+
+    # Only the entries stored in MediaFormatInfo/MediaStreamInfo are requested
+    # in JSON mode; tags are left out, so MediaStreamInfo.metadata stays empty
+    FFPROBE_JSON_ENTRIES = (
+        'format=format_name,format_long_name,bit_rate,duration,size'
+        ':stream=index,codec_type,codec_name,codec_long_name,duration,'
+        'bit_rate,width,height,channels,sample_rate,avg_frame_rate,'
+        'r_frame_rate'
+        ':stream_disposition=attached_pic,forced,default'
+    )
+
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None,
+                 probe_mode=PROBE_TEXT, probe_cache=None, limits=None):
         """
         Initialize a new FFMpeg wrapper object. Optional parameters specify
-        the paths to ffmpeg and ffprobe utilities.
+        the paths to ffmpeg and ffprobe utilities and the default ffprobe
+        output mode (PROBE_TEXT or PROBE_JSON).
+
+        The optional probe_cache is an object providing get(fname), returning
+        a previously stored MediaInfo or None, and put(fname, info). It is
+        consulted by probe() before spawning ffprobe, for the default probe_mode
+        only: it must not mix results of different modes.
+
+        The optional limits (a ProcessLimits object) are applied to every
+        process spawned. Whatever the limits, processes are collected with
+        os.wait4(), so that methods given a ResourceUsage object (usage
+        argument) account for the processes they run.
         """
 
         def which(name):
@@ -338,8 +781,19 @@ class FFMpeg(object):
         if '/' not in ffprobe_path:
             ffprobe_path = which(ffprobe_path) or ffprobe_path
 
+        if probe_mode not in (self.PROBE_TEXT, self.PROBE_JSON):
+            raise FFMpegError("Unknown probe mode: " + str(probe_mode))
+
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
+        self.probe_mode = probe_mode
+        self.probe_cache = probe_cache
+        self.limits = limits
+
+        # number of ffprobe processes spawned by this object
+        self.probe_count = 0
+        # processes spawned by this object and not collected yet
+        self.running = set()
 
         if not os.path.exists(self.ffmpeg_path):
             raise FFMpegError("ffmpeg binary not found: " + self.ffmpeg_path)
@@ -347,18 +801,158 @@ class FFMpeg(object):
         if not os.path.exists(self.ffprobe_path):
             raise FFMpegError("ffprobe binary not found: " + self.ffprobe_path)
 
-    @staticmethod
-    def _spawn(cmds):
+    def _spawn(self, cmds, stdin=PIPE):
         logger.debug('Spawning ffmpeg with command: ' + ' '.join(cmds))
-        return Popen(cmds, shell=False, stdin=PIPE, stdout=PIPE, stderr=PIPE,
-                     close_fds=True)
+        p = Popen(cmds, shell=False, stdin=stdin, stdout=PIPE, stderr=PIPE,
+                  close_fds=True,
+                  start_new_session=bool(self.limits and self.limits.process_group),
+                  preexec_fn=self.limits.preexec_fn() if self.limits else None)
+        self.running.add(p)
+        return p
+
+    def _communicate(self, p, usage=None):
+        """
+        Counterpart of Popen.communicate(), process p being collected by
+        _collect(): returns its (stdout, stderr) output.
+        """
+        if p.stdin:
+            p.stdin.close()
+        data = {p.stdout.fileno(): [], p.stderr.fileno(): []}
+        with selectors.DefaultSelector() as selector:
+            for fd in data:
+                selector.register(fd, selectors.EVENT_READ)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    chunk = os.read(key.fd, self.READ_SIZE)
+                    if chunk:
+                        data[key.fd].append(chunk)
+                    else:
+                        selector.unregister(key.fd)
+        stdout_data = b''.join(data[p.stdout.fileno()])
+        stderr_data = b''.join(data[p.stderr.fileno()])
+        self._close(p)
+        self._collect(p, usage)
+        return stdout_data, stderr_data
+
+    @staticmethod
+    def _close(p):
+        for pipe in (p.stdin, p.stdout, p.stderr):
+            if pipe:
+                pipe.close()
+
+    @staticmethod
+    def _exited(p):
+        """
+        Whether process p has exited, without collecting it where waitid()
+        is available (not on macOS): elsewhere an exited process is
+        collected, its rusage being kept for _collect().
+        """
+        if p.returncode is not None:
+            return True
+        try:
+            if hasattr(os, 'waitid'):
+                return os.waitid(os.P_PID, p.pid,
+                                 os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+            pid, status, rusage = os.wait4(p.pid, os.WNOHANG)
+        except ChildProcessError:
+            return True
+        if pid == 0:
+            return False
+        FFMpeg._reaped(p, status, rusage)
+        return True
+
+    @staticmethod
+    def _reaped(p, status, rusage):
+        """
+        Record the exit status of the collected process p, and its rusage
+        until _collect() accounts for it.
+        """
+        if os.WIFSIGNALED(status):
+            p.returncode = -os.WTERMSIG(status)
+        else:
+            p.returncode = os.WEXITSTATUS(status)
+        p.rusage = rusage
 
-    def probe(self, fname, posters_as_video=True):
+    def _signal(self, p, sig):
+        """
+        Send signal sig to process p, and to its process group if it leads
+        one (see ProcessLimits).
+        """
+        if p.returncode is not None:
+            return
+        try:
+            if self.limits is not None and self.limits.process_group:
+                os.killpg(p.pid, sig)
+            else:
+                os.kill(p.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _collect(self, p, usage=None):
+        """
+        Wait for process p to exit and collect it with os.wait4(), adding
+        its resource usage to usage (a ResourceUsage object). What is left
+        of its process group, if it leads one, is killed. Returns the exit
+        code, negative if the process was killed by a signal.
+        """
+        process_group = self.limits is not None and self.limits.process_group
+        if p.returncode is None:
+            try:
+                if process_group and hasattr(os, 'waitid'):
+                    # not collected yet, so the group id can not be reused
+                    os.waitid(os.P_PID, p.pid, os.WEXITED | os.WNOWAIT)
+                    self._kill_group(p)
+                    process_group = False
+                _, status, rusage = os.wait4(p.pid, 0)
+            except ChildProcessError:
+                # collected elsewhere: resource usage is unknown
+                p.wait()
+            else:
+                self._reaped(p, status, rusage)
+        if process_group:
+            # without waitid(), once collected: the group id is not reused
+            # as long as members of the group are alive
+            self._kill_group(p)
+        rusage = p.__dict__.pop('rusage', None)
+        if usage is not None and rusage is not None:
+            usage.add(rusage)
+        self.running.discard(p)
+        return p.returncode
+
+    @staticmethod
+    def _kill_group(p):
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def terminate_all(self, grace=DEFAULT_KILL_GRACE):
+        """
+        Terminate every process spawned by this object and still running,
+        e.g. on shutdown: SIGTERM, then SIGKILL to those still alive after
+        grace seconds. Safe to call from a signal handler.
+        """
+        processes = list(self.running)
+        for p in processes:
+            self._signal(p, signal.SIGTERM)
+        deadline = time.monotonic() + grace
+        for p in processes:
+            while not self._exited(p) and time.monotonic() < deadline:
+                time.sleep(self.EXIT_POLL)
+            if not self._exited(p):
+                self._signal(p, signal.SIGKILL)
+            self._collect(p)
+
+    def probe(self, fname, posters_as_video=True, mode=None, usage=None):
         """
         Examine the media file and determine its format and media streams.
         Returns the MediaInfo object, or None if the specified file is
         not a valid media file.
 
+        In PROBE_JSON mode ffprobe is asked for JSON output restricted to
+        FFPROBE_JSON_ENTRIES, which is cheaper to produce and decode for
+        files with many streams or large tag blocks.
+
         >>> info = FFMpeg().probe('test1.ogg')
         >>> info.format
         'ogg'
@@ -376,25 +970,72 @@ class FFMpeg(object):
         2
         :param posters_as_video: Take poster images (mainly for audio files) as
             A video stream, defaults to True
+        :param mode: ffprobe output mode, defaults to the one given to the
+            constructor
+        :param usage: ResourceUsage object accounting for ffprobe
         """
 
         if not os.path.exists(fname):
             return None
 
-        info = MediaInfo(posters_as_video)
+        if mode is None:
+            mode = self.probe_mode
+
+        # the cache holds results of the default mode only
+        probe_cache = self.probe_cache if mode == self.probe_mode else None
+        if probe_cache is not None:
+            info = probe_cache.get(fname)
+            if info is not None:
+                info.posters_as_video = posters_as_video
+                return info
 
-        p = self._spawn([self.ffprobe_path,
-                         '-show_format', '-show_streams', fname])
-        stdout_data, _ = p.communicate()
-        stdout_data = stdout_data.decode(console_encoding)
-        info.parse_ffprobe(stdout_data)
+        self.probe_count += 1
+        if usage is not None:
+            usage.add_probe()
+        p = self._spawn(self.probe_command(fname, mode))
+        stdout_data, _ = self._communicate(p, usage)
+        info = self.parse_probe(stdout_data, mode, posters_as_video)
+
+        if info is not None and probe_cache is not None:
+            probe_cache.put(fname, info)
+
+        return info
+
+    def probe_command(self, fname, mode):
+        """
+        Return the ffprobe command line examining fname in the given
+        output mode.
+        """
+        if mode == self.PROBE_JSON:
+            return [self.ffprobe_path, '-v', 'error',
+                    '-print_format', 'json',
+                    '-show_entries', self.FFPROBE_JSON_ENTRIES,
+                    fname]
+        return [self.ffprobe_path, '-show_format', '-show_streams', fname]
+
+    def parse_probe(self, stdout_data, mode, posters_as_video=True):
+        """
+        Parse the ffprobe output (bytes) produced by probe_command().
+        Returns the MediaInfo object, or None if it does not describe a
+        valid media file.
+        """
+        info = MediaInfo(posters_as_video)
+        if mode == self.PROBE_JSON:
+            try:
+                info.parse_ffprobe_json(stdout_data.decode(console_encoding))
+            except ValueError:
+                return None
+        else:
+            info.parse_ffprobe(stdout_data.decode(console_encoding))
 
         if not info.format.format and len(info.streams) == 0:
             return None
 
         return info
 
-    def convert(self, infile, outfile, opts, timeout=10):
+    def convert(self, infile, outfile, opts, timeout=10, input_opts=None,
+                structured=False, log_file=None,
+                kill_grace=DEFAULT_KILL_GRACE, usage=None):
         """
         Convert the source media (infile) according to specified options
         (a list of ffmpeg switches as strings) and save it to outfile.
@@ -402,12 +1043,30 @@ class FFMpeg(object):
         Convert returns a generator that needs to be iterated to drive the
         strategy process. The generator will periodically yield timecode
         of currently processed part of the file (ie. at which second in the
-        content is the strategy process currently).
+        content is the strategy process currently). If structured is True,
+        a FFMpegProgress object is yielded instead, carrying every field of
+        the progress update.
+
+        Progress is read from the key=value blocks ffmpeg writes on stdout
+        ("-progress pipe:1"), while stderr is drained separately; both pipes
+        are read in large non-blocking chunks as data becomes available.
+
+        The optional timeout argument specifies how many seconds ffmpeg may
+        go without reporting progress (out_time, frame or output size not
+        advancing). A stalled ffmpeg receives SIGTERM and, if still alive
+        after kill_grace seconds, SIGKILL; then FFMpegStallError is raised.
+        The deadline is enforced by the wait on the output pipes, so it works
+        from any thread. To disable the timeout, set it to None.
+
+        The optional input_opts (a list of ffmpeg switches as strings) are
+        placed before the input file, e.g. to select the concat demuxer.
+
+        Only the last OutputRingBuffer.DEFAULT_CAPACITY bytes of stderr are
+        kept in memory (and reported by FFMpegConvertError); the optional
+        log_file receives the full stderr output.
 
-        The optional timeout argument specifies how long should the operation
-        be blocked in case ffmpeg gets stuck and doesn't report back. See
-        the documentation in Converter.convert() for more details about this
-        option.
+        The resource usage of ffmpeg is added to the optional usage (a
+        ResourceUsage object) once it exited, however it ended.
 
         >>> conv = FFMpeg().convert('test.ogg', '/tmp/output.mp3',
         ...    ['-acodec libmp3lame', '-vn'])
@@ -418,16 +1077,7 @@ class FFMpeg(object):
         if not os.path.exists(infile):
             raise FFMpegError("Input file doesn't exist: " + infile)
 
-        cmds = [self.ffmpeg_path, '-i', infile]
-        cmds.extend(opts)
-        cmds.extend(['-y', outfile])
-
-        if timeout:
-            def on_sigalrm(*_):
-                signal.signal(signal.SIGALRM, signal.SIG_DFL)
-                raise Exception('timed out while waiting for ffmpeg')
-
-            signal.signal(signal.SIGALRM, on_sigalrm)
+        cmds = self.convert_command(infile, outfile, opts, input_opts)
 
         try:
             p = self._spawn(cmds)
@@ -435,67 +1085,152 @@ class FFMpeg(object):
             raise FFMpegError('Error while calling ffmpeg binary')
 
         yielded = False
-        buf = ''
-        total_output = ''
-        pat = re.compile(r'time=([0-9.:]+) ')
-        while True:
-            if timeout:
-                signal.alarm(timeout)
-
-            ret = p.stderr.read(10)
-
-            if timeout:
-                signal.alarm(0)
-
-            if not ret:
-                break
-
-            ret = ret.decode(console_encoding)
-            total_output += ret
-            buf += ret
-            if '\r' in buf:
-                line, buf = buf.split('\r', 1)
-
-                tmp = pat.findall(line)
-                if len(tmp) == 1:
-                    timespec = tmp[0]
-                    if ':' in timespec:
-                        timecode = 0
-                        for part in timespec.split(':'):
-                            timecode = 60 * timecode + float(part)
-                    else:
-                        timecode = float(tmp[0])
-                    yielded = True
-                    yield timecode
+        output = OutputRingBuffer(log_file=log_file)
+        progress = FFMpegProgress()
+        progress_buf = b''
 
-        if timeout:
-            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        selector = selectors.DefaultSelector()
+        for pipe in (p.stdout, p.stderr):
+            os.set_blocking(pipe.fileno(), False)
+            selector.register(pipe.fileno(), selectors.EVENT_READ, pipe)
 
-        p.communicate()  # wait for process to exit
+        last_progress = None
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while selector.get_map():
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._terminate(p, kill_grace, usage)
+                        raise FFMpegStallError(
+                            'No progress for %s seconds' % timeout,
+                            ' '.join(cmds), output.tail(), pid=p.pid)
+                    events = selector.select(remaining)
+                else:
+                    events = selector.select()
+
+                for key, _ in events:
+                    try:
+                        ret = os.read(key.fd, self.READ_SIZE)
+                    except BlockingIOError:
+                        continue
+
+                    if not ret:
+                        selector.unregister(key.fd)
+                    elif key.data is p.stderr:
+                        output.write(ret)
+                    else:
+                        progress_buf += ret
+                        lines = progress_buf.split(b'\n')
+                        progress_buf = lines.pop()
+                        for line in lines:
+                            if progress.parse_line(line.decode('ascii', 'replace')):
+                                current = (progress.out_time, progress.frame,
+                                           progress.total_size)
+                                if deadline is not None and current != last_progress:
+                                    deadline = time.monotonic() + timeout
+                                last_progress = current
+                                yielded = True
+                                yield progress if structured else progress.out_time
+                                progress = FFMpegProgress(progress)
+        except BaseException:
+            # stall, error or generator closed early: do not leave ffmpeg behind
+            self._terminate(p, kill_grace, usage)
+            raise
+        finally:
+            selector.close()
+            output.close()
+            self._close(p)
+
+        self._collect(p, usage)
+
+        self.check_result(cmds, infile, output, p.returncode, yielded, p.pid)
+
+    def convert_command(self, infile, outfile, opts, input_opts=None):
+        """
+        Return the ffmpeg command line of a conversion, see convert().
+        """
+        cmds = [self.ffmpeg_path, '-nostats', '-progress', 'pipe:1']
+        if input_opts:
+            cmds.extend(input_opts)
+        cmds.extend(['-i', infile])
+        cmds.extend(opts)
+        cmds.extend(['-y', outfile])
+        return cmds
 
-        if total_output == '':
+    @staticmethod
+    def check_result(cmds, infile, output, returncode, yielded, pid=0):
+        """
+        Raise the error reported by an ended conversion, if any. The output
+        argument is the OutputRingBuffer holding its stderr, yielded tells
+        whether any progress update has been received.
+        """
+        if output.written == 0:
             raise FFMpegError('Error while calling ffmpeg binary')
 
+        total_output = output.tail()
+
         cmd = ' '.join(cmds)
         if '\n' in total_output:
             line = total_output.split('\n')[-2]
 
             if line.startswith('Received signal'):
                 # Received signal 15: terminating.
-                raise FFMpegConvertError(line.split(':')[0], cmd, total_output, pid=p.pid)
+                raise FFMpegConvertError(line.split(':')[0], cmd, total_output, pid=pid)
             if line.startswith(infile + ': '):
                 err = line[len(infile) + 2:]
                 raise FFMpegConvertError('Encoding error', cmd, total_output,
-                                         err, pid=p.pid)
+                                         err, pid=pid)
             if line.startswith('Error while '):
                 raise FFMpegConvertError('Encoding error', cmd, total_output,
-                                         line, pid=p.pid)
+                                         line, pid=pid)
             if not yielded:
                 raise FFMpegConvertError('Unknown ffmpeg error', cmd,
-                                         total_output, line, pid=p.pid)
+                                         total_output, line, pid=pid)
+        if returncode != 0:
+            raise FFMpegConvertError('Exited with code %d' % returncode, cmd,
+                                     total_output, pid=pid)
+
+    def _terminate(self, p, grace, usage=None):
+        """
+        Ask process p to terminate, killing it if still alive after grace
+        seconds, then collect it.
+        """
+        if not self._exited(p):
+            self._signal(p, signal.SIGTERM)
+            deadline = time.monotonic() + grace
+            while not self._exited(p) and time.monotonic() < deadline:
+                time.sleep(self.EXIT_POLL)
+            if not self._exited(p):
+                self._signal(p, signal.SIGKILL)
+        self._collect(p, usage)
+
+    def scene_changes(self, fname, threshold=0.4, usage=None):
+        """
+        Detect scene changes of the first video stream of fname, decoding
+        the whole stream. Returns the sorted list of times (in seconds) at
+        which the scene score exceeds threshold (range 0-1). The optional
+        usage (a ResourceUsage object) accounts for ffmpeg.
+
+        >>> FFMpeg().scene_changes('test1.ogg', 0.3)
+        [4.2, 12.76, 25.04]
+        """
+        if not os.path.exists(fname):
+            raise IOError('No such file: ' + fname)
+
+        cmds = [self.ffmpeg_path, '-nostats', '-i', fname, '-map', '0:v:0',
+                '-an', '-sn', '-vf', "select='gt(scene,%s)',showinfo" % threshold,
+                '-f', 'null', '-']
+
+        p = self._spawn(cmds)
+        _, stderr_data = self._communicate(p, usage)
+        stderr_data = stderr_data.decode(console_encoding, 'replace')
         if p.returncode != 0:
-            raise FFMpegConvertError('Exited with code %d' % p.returncode, cmd,
-                                     total_output, pid=p.pid)
+            raise FFMpegError('Error while detecting scene changes: %s' %
+                              stderr_data.split('\n')[-2:])
+
+        pat = re.compile(r'pts_time:([0-9.]+)')
+        return sorted(float(t) for t in pat.findall(stderr_data))
 
     def thumbnail(self, fname, time, outfile, size=None, quality=DEFAULT_JPEG_QUALITY):
         """
@@ -535,7 +1270,7 @@ class FFMpeg(object):
             ])
 
         p = self._spawn(cmds)
-        _, stderr_data = p.communicate()
+        _, stderr_data = self._communicate(p)
         if stderr_data == '':
             raise FFMpegError('Error while calling ffmpeg binary')
         stderr_data.decode(console_encoding)
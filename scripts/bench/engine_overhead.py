@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Memory and dispatch overhead of the worker pool and of the asyncio engine.
+
+--jobs short conversions of the same synthetic source (ffmpeg testsrc2 pattern,
+--duration seconds) run with at most --concurrency at once: first on a pool of
+worker processes, each waiting for its ffmpeg as MediaEventHandler does with
+engine = pool, then as coroutines of a single event loop driving every ffmpeg,
+as AsyncEngine does with engine = asyncio. Reported are the wall-clock time of
+the batch, the mean delay from submission to ffmpeg spawn of the jobs started
+on an idle slot, and the resident memory of the Python processes (parent and
+workers; ffmpeg processes are the same in both cases) sampled while jobs run.
+
+Usage:
+    python scripts/bench/engine_overhead.py --jobs 50 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures.process import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2].joinpath("lib", "python-video-converter-master")))
+
+from converter import Converter  # noqa: E402
+from converter.aio import AsyncConverter  # noqa: E402
+
+OUT_FORMAT = {
+    'format': 'mp4',
+    'video': {'codec': 'h264', 'preset': 'ultrafast'},
+}
+
+
+def synthesize(ffmpeg: str, filename: str, duration: float) -> None:
+    subprocess.run([
+        ffmpeg, '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc2=size=320x240:rate=25:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', filename
+    ], check=True)
+
+
+def rss(pid: int) -> int:
+    """
+    :return: resident memory (bytes) of a process, 0 if it is gone
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def python_rss(pids) -> int:
+    return rss(os.getpid()) + sum(rss(pid) for pid in pids)
+
+
+class Sampler(threading.Thread):
+    """
+    Peak of python_rss() while the batch runs
+    """
+
+    def __init__(self, pids):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(0.05):
+            self.peak = max(self.peak, python_rss(self.pids()))
+
+
+def warm(_: int) -> int:
+    return os.getpid()
+
+
+def convert(paths: tuple, infile: str, outfile: str, submitted: float) -> float:
+    """
+    Job of a pool worker
+    :return: seconds from submission to ffmpeg spawn
+    """
+    started = time.time() - submitted
+    converter = Converter(*paths)
+    for _ in converter.convert(infile, outfile, OUT_FORMAT, timeout=None):
+        pass
+    return started
+
+
+def run_pool(paths: tuple, infile: str, out_dir: str, jobs: int, concurrency: int) -> tuple:
+    with ProcessPoolExecutor(max_workers=concurrency) as executor:
+        # workers are started before timing, as the engine runs from startup
+        list(executor.map(warm, range(concurrency)))
+        sampler = Sampler(lambda: list(executor._processes))
+        sampler.start()
+        start = time.monotonic()
+        futures = [
+            executor.submit(convert, paths, infile, os.path.join(out_dir, f"pool_{i}.mp4"), time.time())
+            for i in range(jobs)
+        ]
+        delays = [future.result() for future in futures]
+        elapsed = time.monotonic() - start
+        sampler.stopped.set()
+    return elapsed, delays[:concurrency], sampler.peak
+
+
+def run_asyncio(paths: tuple, infile: str, out_dir: str, jobs: int, concurrency: int) -> tuple:
+    converter = AsyncConverter(Converter(*paths))
+
+    async def job(slots: asyncio.Semaphore, i: int, submitted: float) -> float:
+        async with slots:
+            started = time.time() - submitted
+            async for _ in converter.convert(infile, os.path.join(out_dir, f"asyncio_{i}.mp4"), OUT_FORMAT,
+                                             timeout=None):
+                pass
+            return started
+
+    async def batch() -> list:
+        slots = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(job(slots, i, time.time()) for i in range(jobs)))
+
+    sampler = Sampler(lambda: [])
+    sampler.start()
+    start = time.monotonic()
+    delays = asyncio.run(batch())
+    elapsed = time.monotonic() - start
+    sampler.stopped.set()
+    return elapsed, delays[:concurrency], sampler.peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the worker pool with the asyncio engine")
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--ffprobe", default="ffprobe")
+    parser.add_argument("--jobs", type=int, default=50, help="conversions of the batch")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum concurrent conversions")
+    parser.add_argument("--duration", type=float, default=1, help="synthesized source duration")
+    args = parser.parse_args()
+
+    paths = (args.ffmpeg, args.ffprobe)
+    with tempfile.TemporaryDirectory() as tmp:
+        infile = os.path.join(tmp, "source.mp4")
+        synthesize(args.ffmpeg, infile, args.duration)
+        print(f"jobs: {args.jobs}, concurrency: {args.concurrency}, source: {args.duration}s")
+
+        for name, run in (("pool", run_pool), ("asyncio", run_asyncio)):
+            elapsed, delays, peak = run(paths, infile, tmp, args.jobs, args.concurrency)
+            print(f"{name:>8}: {elapsed:.2f}s, dispatch {1000 * sum(delays) / len(delays):.1f}ms, "
+                  f"python RSS {peak / 1024 ** 2:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
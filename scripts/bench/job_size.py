@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Bytes per queued job, before and after jobs became compact descriptors.
+
+Before, each job was submitted to the worker pool as the bound method
+execute of the conversion strategy and a MediaInfo embedding the conversion
+formats of its profile: every pickle carried the strategy (converter, caches)
+and the formats. Now a Job referencing its formats by interned profile id is
+submitted with PoolWorker.execute, the strategy being resident in workers.
+Reported are the pickle size of a submission and the memory held by --jobs
+queued jobs (tracemalloc), for profiles of --renditions formats.
+
+Usage:
+    python scripts/bench/job_size.py --jobs 10000 --renditions 3
+"""
+
+import argparse
+import pickle
+import sys
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path[:0] = [str(ROOT.joinpath("src")), str(ROOT.joinpath("lib", "python-video-converter-master"))]
+
+from mediaconversion.engine import PoolWorker  # noqa: E402
+from mediaconversion.model import FormatRegistry, Job, MediaInfo  # noqa: E402
+from mediaconversion.strategy import FFmpeg  # noqa: E402
+from util import LogManager  # noqa: E402
+
+RENDITION = {
+    'format': 'mp4',
+    'audio': {'codec': 'aac', 'channels': 2, 'bitrate': 128},
+    'video': {'codec': 'h264', 'width': 1280, 'height': 720, 'fps': 30, 'preset': 'veryfast', 'quality': 23},
+}
+
+
+def job_of(i: int, profile_id: int, renditions: int) -> Job:
+    filein = f"/srv/media/in/show/season_01/episode_{i:06d}.mkv"
+    fileouts = [f"/srv/media/out/show/season_01/episode_{i:06d}_{r}.mp4" for r in range(renditions)]
+    return Job(filein, (2049, 1000000 + i, 1024 ** 3, 1700000000000000000 + i), profile_id, fileouts,
+               "/srv/media/converted/show/season_01", True)
+
+
+def held(build, jobs: int) -> float:
+    """
+    :return: bytes allocated per object built
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(i) for i in range(jobs)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / jobs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure bytes per queued job")
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--ffprobe", default="ffprobe")
+    parser.add_argument("--jobs", type=int, default=10000, help="queued jobs")
+    parser.add_argument("--renditions", type=int, default=3, help="conversion formats of the profile")
+    args = parser.parse_args()
+
+    LogManager.get_instance().load()
+    strategy = FFmpeg(args.ffmpeg, args.ffprobe)
+    formats = FormatRegistry()
+    out_formats = [dict(RENDITION, name=f"r{r}") for r in range(args.renditions)]
+    profile_id = formats.intern(out_formats)
+
+    def legacy(i: int) -> MediaInfo:
+        # embedded formats: a copy of them for each job once unpickled
+        return pickle.loads(pickle.dumps(MediaInfo(job_of(i, profile_id, args.renditions), out_formats)))
+
+    def compact(i: int) -> Job:
+        return pickle.loads(pickle.dumps(job_of(i, profile_id, args.renditions)))
+
+    job = job_of(0, profile_id, args.renditions)
+    before = len(pickle.dumps((strategy.execute, MediaInfo(job, out_formats))))
+    after = len(pickle.dumps((PoolWorker.execute, job)))
+    print(f"jobs: {args.jobs}, renditions: {args.renditions}")
+    print(f"{'pickled submission':>20}: before {before} B, after {after} B")
+    print(f"{'queued job':>20}: before {held(legacy, args.jobs):.0f} B, after {held(compact, args.jobs):.0f} B")
+
+
+if __name__ == "__main__":
+    main()
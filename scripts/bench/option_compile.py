@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Per-job cost of compiling the ffmpeg options of a conversion, before and after
+conversion formats became templates compiled at startup.
+
+Before, the formats of every job were validated and compiled from scratch:
+format, codec objects and option lists of every stream. Now the formats of a
+profile are compiled once into OptionsTemplate objects and a job only renders
+the options depending on its source (size, aspect filters) and its threads.
+Reported is the mean time to compile the options of a job of --renditions
+formats, for --jobs jobs of sources of varying size.
+
+Usage:
+    python scripts/bench/option_compile.py --jobs 20000 --renditions 3
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2].joinpath("lib", "python-video-converter-master")))
+
+from converter import Converter  # noqa: E402
+
+RENDITIONS = [
+    {
+        'format': 'mp4',
+        'audio': {'codec': 'aac', 'channels': 2, 'bitrate': 128},
+        'video': {'codec': 'h264', 'width': 1280, 'height': 720, 'mode': 'pad', 'preset': 'veryfast', 'quality': 23},
+    },
+    {
+        'format': 'mp4',
+        'audio': {'codec': 'aac', 'channels': 2, 'bitrate': 96},
+        'video': {'codec': 'h264', 'width': 640, 'fps': 25, 'preset': 'veryfast'},
+    },
+    {
+        'format': 'mp3',
+        'audio': {'codec': 'mp3', 'bitrate': 192},
+    },
+]
+
+
+def info_of(i: int) -> SimpleNamespace:
+    video = SimpleNamespace(video_width=1920 - 16 * (i % 8), video_height=800 + 16 * (i % 5))
+    return SimpleNamespace(video=video, audio=object())
+
+
+def per_job(out_formats: list, converter: Converter, jobs: int, threads: int) -> float:
+    """
+    :return: seconds per job
+    """
+    start = time.perf_counter()
+    for i in range(jobs):
+        info = info_of(i)
+        for out_format in out_formats:
+            converter.compile_options(out_format, info, None, threads)
+    return (time.perf_counter() - start) / jobs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure per-job compilation of ffmpeg options")
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--ffprobe", default="ffprobe")
+    parser.add_argument("--jobs", type=int, default=20000, help="compiled jobs")
+    parser.add_argument("--renditions", type=int, default=3, help="conversion formats of a job")
+    parser.add_argument("--threads", type=int, default=2, help="threads of a job, 0 for none")
+    args = parser.parse_args()
+
+    converter = Converter(args.ffmpeg, args.ffprobe)
+    out_formats = [RENDITIONS[r % len(RENDITIONS)] for r in range(args.renditions)]
+    templates = [Converter.compile_template(out_format) for out_format in out_formats]
+
+    before = per_job(out_formats, converter, args.jobs, args.threads or None)
+    after = per_job(templates, converter, args.jobs, args.threads or None)
+    print(f"jobs: {args.jobs}, renditions: {args.renditions}, threads: {args.threads}")
+    print(f"{'options per job':>16}: before {1e6 * before:.1f}us, after {1e6 * after:.1f}us ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of ffprobe output parsing: text (-show_format -show_streams)
+versus JSON (-print_format json -show_entries ...).
+
+Usage:
+    python scripts/bench/probe_parse.py
+    python scripts/bench/probe_parse.py --text probe.txt --json probe.json
+
+Recorded outputs can be produced with:
+    ffprobe -show_format -show_streams FILE > probe.txt
+    ffprobe -v error -print_format json -show_entries <FFMpeg.FFPROBE_JSON_ENTRIES> FILE > probe.json
+
+Without recorded outputs, a ripped Blu-ray like file (hundreds of tracks with
+large tag blocks) is synthesized in both formats.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2].joinpath("lib", "python-video-converter-master")))
+
+from converter.ffmpeg import MediaInfo  # noqa: E402
+
+
+def synthesize(audio_tracks: int, subtitle_tracks: int, tags: int) -> tuple:
+    streams = [{
+        "index": 0, "codec_type": "video", "codec_name": "h264", "codec_long_name": "H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10",
+        "width": 1920, "height": 1080, "r_frame_rate": "24000/1001", "avg_frame_rate": "24000/1001",
+        "duration": "7260.500000", "bit_rate": "28000000",
+    }]
+    for i in range(audio_tracks):
+        streams.append({
+            "index": len(streams), "codec_type": "audio", "codec_name": "ac3", "codec_long_name": "ATSC A/52A (AC-3)",
+            "sample_rate": "48000", "channels": 6, "r_frame_rate": "0/0", "avg_frame_rate": "0/0",
+            "duration": "7260.500000", "bit_rate": "640000",
+        })
+    for i in range(subtitle_tracks):
+        streams.append({
+            "index": len(streams), "codec_type": "subtitle", "codec_name": "hdmv_pgs_subtitle",
+            "codec_long_name": "HDMV Presentation Graphic Stream subtitles",
+            "r_frame_rate": "0/0", "avg_frame_rate": "0/0", "duration": "7260.500000",
+        })
+
+    text = []
+    for stream in streams:
+        text.append("[STREAM]")
+        text.extend(f"{k}={v}" for k, v in stream.items())
+        text.append("DISPOSITION:default=0")
+        text.append("DISPOSITION:forced=0")
+        text.append("DISPOSITION:attached_pic=0")
+        text.extend(f"TAG:tag_{t}={'x' * 64}" for t in range(tags))
+        text.append("[/STREAM]")
+    text.extend([
+        "[FORMAT]", "format_name=matroska,webm", "format_long_name=Matroska / WebM",
+        "duration=7260.500000", "size=40000000000", "bit_rate=44000000",
+    ])
+    text.extend(f"TAG:tag_{t}={'x' * 64}" for t in range(tags))
+    text.append("[/FORMAT]")
+
+    # JSON output only carries the entries requested by FFMpeg.FFPROBE_JSON_ENTRIES
+    for stream in streams:
+        stream["disposition"] = {"default": 0, "forced": 0, "attached_pic": 0}
+    document = {
+        "streams": streams,
+        "format": {
+            "format_name": "matroska,webm", "format_long_name": "Matroska / WebM",
+            "duration": "7260.500000", "size": "40000000000", "bit_rate": "44000000",
+        },
+    }
+
+    return "\n".join(text), json.dumps(document, indent=4)
+
+
+def parse_text(raw: str) -> MediaInfo:
+    info = MediaInfo()
+    info.parse_ffprobe(raw)
+    return info
+
+
+def parse_json(raw: str) -> MediaInfo:
+    info = MediaInfo()
+    info.parse_ffprobe_json(raw)
+    return info
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare ffprobe text and JSON parsers")
+    parser.add_argument("--text", help="recorded ffprobe text output")
+    parser.add_argument("--json", help="recorded ffprobe JSON output")
+    parser.add_argument("--audio", type=int, default=32, help="synthesized audio tracks")
+    parser.add_argument("--subtitles", type=int, default=256, help="synthesized subtitle tracks")
+    parser.add_argument("--tags", type=int, default=16, help="synthesized tags per track")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    raw_text, raw_json = synthesize(args.audio, args.subtitles, args.tags)
+    if args.text:
+        raw_text = Path(args.text).read_text()
+    if args.json:
+        raw_json = Path(args.json).read_text()
+
+    streams_text = len(parse_text(raw_text).streams)
+    streams_json = len(parse_json(raw_json).streams)
+    print(f"text: {len(raw_text)} bytes, {streams_text} streams")
+    print(f"json: {len(raw_json)} bytes, {streams_json} streams")
+
+    for name, fn, raw in (("text", parse_text, raw_text), ("json", parse_json, raw_json)):
+        best = min(timeit.repeat(lambda: fn(raw), repeat=args.repeat, number=args.number)) / args.number
+        print(f"{name:>4}: {best * 1000:.3f} ms/parse")
+
+
+if __name__ == "__main__":
+    main()
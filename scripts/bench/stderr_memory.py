@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark of ffmpeg output handling on a long synthetic encode.
+
+A fake ffmpeg binary writes --megabytes of stderr (the warnings real ffmpeg
+repeats on damaged or long inputs) plus a progress block every --block lines.
+The worker RSS is sampled while FFMpeg.convert drains it (bounded ring buffer)
+and, with --legacy, while the previous loop does (read(10) and string +=).
+
+Usage:
+    python scripts/bench/stderr_memory.py --megabytes 256
+    python scripts/bench/stderr_memory.py --megabytes 256 --legacy
+"""
+
+import argparse
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from subprocess import PIPE, Popen
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2].joinpath("lib", "python-video-converter-master")))
+
+from converter.ffmpeg import FFMpeg  # noqa: E402
+
+FAKE_FFMPEG = """#!{python}
+import sys
+line = b"[h264 @ 0x55d5c0a0b2c0] error while decoding MB 12 34, bytestream -5\\n"
+lines = {size} // len(line)
+for i in range(lines):
+    sys.stderr.buffer.write(line)
+    if i % {block} == 0:
+        sys.stdout.write("frame=%d\\nfps=250.0\\nout_time_us=%d\\nspeed=10x\\nprogress=continue\\n" % (i, i * 1000))
+        sys.stdout.flush()
+sys.stdout.write("progress=end\\n")
+"""
+
+
+def rss_kib() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class Sampler(threading.Thread):
+
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.running = True
+
+    def run(self) -> None:
+        while self.running:
+            self.samples.append(rss_kib())
+            time.sleep(self.interval)
+
+
+def legacy(ffmpeg_path: str, infile: str) -> None:
+    p = Popen([ffmpeg_path, '-i', infile, '-y', os.devnull], stdin=PIPE, stdout=PIPE, stderr=PIPE, close_fds=True)
+    total_output = ''
+    while True:
+        ret = p.stderr.read(10)
+        if not ret:
+            break
+        total_output += ret.decode()
+    p.communicate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker RSS while draining a long ffmpeg output")
+    parser.add_argument("--megabytes", type=int, default=256, help="stderr size written by the fake ffmpeg")
+    parser.add_argument("--block", type=int, default=1000, help="stderr lines between progress blocks")
+    parser.add_argument("--interval", type=float, default=0.1, help="RSS sampling interval")
+    parser.add_argument("--legacy", action="store_true", help="use the previous read(10) and += loop")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = Path(tmp).joinpath("ffmpeg")
+        fake.write_text(FAKE_FFMPEG.format(python=sys.executable, size=args.megabytes * 1024 * 1024, block=args.block))
+        fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+        infile = Path(tmp).joinpath("input")
+        infile.touch()
+
+        sampler = Sampler(args.interval)
+        sampler.start()
+        start = time.monotonic()
+        if args.legacy:
+            legacy(str(fake), str(infile))
+        else:
+            ffmpeg = FFMpeg(str(fake), str(fake))
+            for _ in ffmpeg.convert(str(infile), os.devnull, [], timeout=None):
+                pass
+        elapsed = time.monotonic() - start
+        sampler.running = False
+        sampler.join()
+
+    samples = sampler.samples
+    print(f"mode: {'legacy' if args.legacy else 'ring buffer'}, stderr: {args.megabytes} MiB, {elapsed:.2f}s")
+    print(f"RSS KiB: start {samples[0]}, max {max(samples)}, end {samples[-1]} ({len(samples)} samples)")
+    step = max(len(samples) // 10, 1)
+    print("RSS KiB over time: " + " ".join(str(s) for s in samples[::step]))
+
+
+if __name__ == "__main__":
+    main()
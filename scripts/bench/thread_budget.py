@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Aggregate throughput of concurrent conversions with and without a thread budget.
+
+--jobs conversions of the same synthetic source (ffmpeg testsrc2 pattern and
+sine audio, --duration seconds at --size) run at once, as the worker pool does.
+By default every ffmpeg sizes its decoder and encoder thread pools on the number
+of cores; with the budget each conversion gets its share (--threads / --jobs,
+as ThreadBudget grants it). Throughput is media seconds encoded per wall-clock
+second, summed over all the jobs.
+A single conversion on an idle budget is then measured, granted every thread as
+ThreadBudget does, against the share of one of --slots configured slots.
+
+Usage:
+    python scripts/bench/thread_budget.py --jobs 5
+    python scripts/bench/thread_budget.py --jobs 5 --threads 16 --size 1920x1080 --duration 60
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2].joinpath("lib", "python-video-converter-master")))
+
+from converter import Converter  # noqa: E402
+
+OUT_FORMAT = {
+    'format': 'mp4',
+    'video': {'codec': 'h264', 'preset': 'veryfast', 'quality': 23},
+    'audio': {'codec': 'aac', 'bitrate': 128},
+}
+
+
+def synthesize(ffmpeg: str, filename: str, size: str, duration: float) -> None:
+    subprocess.run([
+        ffmpeg, '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate=25:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', filename
+    ], check=True)
+
+
+def run(converter: Converter, infile: str, out_dir: str, jobs: int, threads: int) -> float:
+    """
+    :return: wall-clock seconds to complete every job
+    """
+    info = converter.probe(infile)
+
+    def job(i: int) -> None:
+        outfile = os.path.join(out_dir, f"out_{i}.mp4")
+        for _ in converter.convert(infile, outfile, OUT_FORMAT, timeout=None, info=info, threads=threads):
+            pass
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(job, range(jobs)))
+    return time.monotonic() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare concurrent conversions with and without a thread budget")
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--ffprobe", default="ffprobe")
+    parser.add_argument("--jobs", type=int, default=5, help="concurrent conversions")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="thread budget shared by the jobs")
+    parser.add_argument("--slots", type=int, default=5, help="configured slots, for the single job case")
+    parser.add_argument("--size", default="1280x720", help="synthesized source size")
+    parser.add_argument("--duration", type=float, default=30, help="synthesized source duration")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    converter = Converter(args.ffmpeg, args.ffprobe)
+    share = max(args.threads // args.jobs, 1)
+    slot_share = max(args.threads // args.slots, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        infile = os.path.join(tmp, "source.mp4")
+        synthesize(args.ffmpeg, infile, args.size, args.duration)
+        print(f"cores: {os.cpu_count()}, jobs: {args.jobs}, source: {args.size} {args.duration}s")
+
+        for name, threads in (("default", None), (f"budget ({share} threads/job)", share)):
+            best = min(run(converter, infile, tmp, args.jobs, threads) for _ in range(args.repeat))
+            print(f"{name:>24}: {best:.2f}s, {args.jobs * args.duration / best:.2f} media s/s")
+
+        print(f"single job, {args.slots} slots")
+        for name, threads in ((f"slot share ({slot_share} threads)", slot_share),
+                              (f"idle grant ({args.threads} threads)", args.threads)):
+            best = min(run(converter, infile, tmp, 1, threads) for _ in range(args.repeat))
+            print(f"{name:>24}: {best:.2f}s, {args.duration / best:.2f} media s/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import atexit
 import sys
 
 from mediaconversion import MediaObserver
+from mediaconversion.cache import ProbeCacheCommand, ResultCacheCommand
 from model import ConverterConfig
 from util import Common
 from util.Validation import Validation
@@ -24,6 +25,12 @@ class Application(object):
         self.__media_observer.stop()
 
     def start(self) -> None:
+        # Subcommands
+        if len(sys.argv) > 1 and sys.argv[1] == ProbeCacheCommand.NAME:
+            sys.exit(ProbeCacheCommand().run(sys.argv[2:]))
+        if len(sys.argv) > 1 and sys.argv[1] == ResultCacheCommand.NAME:
+            sys.exit(ResultCacheCommand().run(sys.argv[2:]))
+
         # Construct configuration file
         if len(sys.argv) > 1:
             config_file = sys.argv[1]
@@ -1,11 +1,22 @@
-import signal
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+from enum import Enum
+from concurrent.futures import Future
 from concurrent.futures.process import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional
 
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
 
-from mediaconversion.model import MediaInfo
-from model import ConverterConfig
+from mediaconversion.engine import AsyncEngine, PoolWorker
+from mediaconversion.journal import JobJournal
+from mediaconversion.model import FormatRegistry, Job, MediaInfo
+from mediaconversion.progress import LoggingProgressSink, ProgressMonitor, ProgressReporter
+from mediaconversion.scheduler import AdmissionQueue, ConcurrencyController, CostScheduler, ThreadBudget
+from model import ConverterConfig, WatchProfile
 from mediaconversion.strategy import ConverterFactory
 from util import LogManager
 from util.Validation import Validation
@@ -18,66 +29,411 @@ class MediaEventHandler(FileSystemEventHandler):
     _CONFIG = ConverterConfig.get_instance()
 
     DEFAULT_MAX_PROCESSES = 2
+
+    class SchedulerPolicy(Enum):
+        # order of arrival
+        FIFO = "fifo"
+        # cheapest first, with slots reserved to short jobs
+        COST = "cost"
+
+    class Engine(Enum):
+        # worker processes, each converting a job at a time
+        POOL = "pool"
+        # asyncio event loop of this process, driving every ffmpeg
+        ASYNCIO = "asyncio"
     DEFAULT_CONVERTER = ConverterFactory.Converters.FFMPEG
 
     def __init__(self, max_processes: int = DEFAULT_MAX_PROCESSES,
-                 converter: ConverterFactory.Converters = DEFAULT_CONVERTER):
+                 converter: ConverterFactory.Converters = DEFAULT_CONVERTER,
+                 progress_interval: float = ProgressReporter.DEFAULT_INTERVAL,
+                 profiles: List[WatchProfile] = None,
+                 high_watermark: int = AdmissionQueue.DEFAULT_HIGH_WATERMARK,
+                 low_watermark: int = AdmissionQueue.DEFAULT_LOW_WATERMARK,
+                 spill_dir: str = None,
+                 scheduler_policy: "MediaEventHandler.SchedulerPolicy" = None,
+                 fast_slots: int = CostScheduler.DEFAULT_FAST_SLOTS,
+                 fast_duration: float = CostScheduler.DEFAULT_FAST_DURATION,
+                 min_processes: int = None,
+                 concurrency_interval: float = ConcurrencyController.DEFAULT_INTERVAL,
+                 threads: int = None,
+                 journal: str = None,
+                 engine: "MediaEventHandler.Engine" = None):
+        """
+
+        :param max_processes: size of the worker pool shared by all profiles
+        :param converter: conversion strategy
+        :param progress_interval: seconds between two progress reports of a job, 0 to disable
+        :param profiles: watch profiles handled, by default the configured ones
+        :param high_watermark: maximum number of files queued in memory, waiting for admission
+        :param low_watermark: number of files queued in memory below which files spilled to disk are read back
+        :param spill_dir: directory for files queued on disk
+        :param scheduler_policy: order of admission of queued files, by default by estimated cost
+        :param fast_slots: workers reserved to short jobs, with cost policy
+        :param fast_duration: maximum media duration (seconds) of short jobs, with cost policy
+        :param min_processes: minimum number of concurrent conversions; if lower than max_processes,
+         the number of concurrent conversions is adapted to the load within these bounds
+        :param concurrency_interval: seconds between two adjustments of the number of concurrent conversions
+        :param threads: ffmpeg threads shared by concurrent conversions, by default the number of cores;
+         0 lets every ffmpeg decide on its own
+        :param journal: database recording jobs, so that jobs lost by a crash are resumed; None to disable
+        :param engine: runner of conversions, by default a pool of worker processes
+        :raise ValueError: if a conversion format of a profile is invalid
+        """
         super().__init__()
 
         MediaEventHandler.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
         self.__converter = ConverterFactory.get_type(converter)
-        self.__executor = ProcessPoolExecutor(
-            max_workers=max_processes,
-            initializer=MediaEventHandler.__init_worker
+        # deepest directories first, so that a file belongs to the innermost profile
+        self.__profiles = sorted(
+            profiles if profiles is not None else MediaEventHandler._CONFIG.watch_profiles,
+            key=lambda profile: len(Path(profile.in_folder).resolve().parts),
+            reverse=True
         )
+        # formats of each profile, compiled and interned once and sent to each worker once
+        self.__formats = FormatRegistry()
+        self.__profile_ids = {}
+        for profile in self.__profiles:
+            try:
+                out_formats = self.__converter.compile_formats(profile.out_formats)
+            except ValueError as e:
+                raise ValueError(f"Invalid out.format of watch profile '{profile.name}': {e}") from e
+            self.__profile_ids[profile] = self.__formats.intern(out_formats)
+
+        # without worker processes, queues between threads are enough
+        use_pool = (engine or MediaEventHandler.Engine.POOL) == MediaEventHandler.Engine.POOL
+        context = MediaEventHandler.__get_pool_context()
+        queue_type = context.Queue if use_pool else queue.Queue
+
+        # workers publish progress of their jobs through a queue drained by the monitor thread
+        self.__progress_monitor = None
+        progress_queue = None
+        if progress_interval:
+            progress_queue = queue_type(ProgressMonitor.QUEUE_SIZE)
+            self.__progress_monitor = ProgressMonitor(progress_queue, [LoggingProgressSink()])
+            self.__progress_monitor.start()
+
+        # workers record the start of their jobs through a queue drained by the journal thread
+        self.__journal = None
+        self.__unfinished = []
+        journal_queue = None
+        if journal:
+            journal_queue = queue_type()
+            self.__journal = JobJournal(journal, journal_queue)
+            # jobs lost by the previous run are read before any new event is written
+            self.__unfinished = self.__journal.replay()
+            self.__journal.start()
+
+        # threads are granted by workers when jobs start, so the budget is shared with them
+        thread_budget = None
+        if threads != 0:
+            thread_budget = ThreadBudget(threads, max_processes, context if use_pool else None)
+        self.__concurrency_controller = None
+
+        # filein -> future of the conversion
+        self.__pending = {}
+        self.__pending_lock = threading.Lock()
+        self.__executor = None
+        self.__engine = None
+        if use_pool:
+            # workers do not inherit the configuration of this process: they load its files
+            self.__executor = ProcessPoolExecutor(
+                max_workers=max_processes,
+                mp_context=context,
+                initializer=PoolWorker.initialize,
+                initargs=(
+                    converter,
+                    self.__formats,
+                    progress_queue,
+                    progress_interval,
+                    journal_queue,
+                    MediaEventHandler._CONFIG.config_files,
+                    thread_budget
+                )
+            )
+            # workers are started and initialized now, not when the first files arrive
+            for future in [self.__executor.submit(PoolWorker.warm) for _ in range(max_processes)]:
+                future.result()
+            MediaEventHandler.__LOG.debug(f"[POOL] {max_processes} workers started ({context.get_start_method()})")
+        else:
+            self.__engine = AsyncEngine(
+                self.__converter,
+                self.__formats,
+                max_processes,
+                progress_queue,
+                progress_interval,
+                journal_queue,
+                thread_budget=thread_budget
+            )
+        # files wait here, instead of in the executor, until a worker is about to be free
+        scheduler = None
+        max_inflight = max_processes * 2
+        if (scheduler_policy or MediaEventHandler.SchedulerPolicy.COST) == MediaEventHandler.SchedulerPolicy.COST:
+            scheduler = CostScheduler(
+                self.__converter.probe,
+                lambda filein: self.profile_of(filein).out_formats,
+                max_processes,
+                fast_slots,
+                fast_duration
+            )
+            # jobs are not queued in the executor, so the choice is made when a worker is free
+            max_inflight = max_processes
+        # with adaptive concurrency, jobs are not queued in the executor either: admitted jobs are running jobs
+        adaptive = min_processes is not None and min_processes < max_processes
+        if adaptive:
+            max_inflight = max_processes
+        self.__admission_queue = AdmissionQueue(
+            self.admit,
+            max_inflight,
+            high_watermark,
+            low_watermark,
+            spill_dir,
+            scheduler
+        )
+        self.__admission_queue.start()
+
+        if adaptive:
+            self.__concurrency_controller = ConcurrencyController(
+                self.__admission_queue,
+                self.__progress_monitor,
+                min_processes,
+                max_processes,
+                concurrency_interval,
+                thread_budget
+            )
+            self.__concurrency_controller.start()
+
+    @property
+    def admission_queue(self) -> AdmissionQueue:
+        return self.__admission_queue
+
+    @property
+    def progress_monitor(self) -> ProgressMonitor:
+        """
+        :return: monitor of running jobs, None if progress is not published
+        """
+        return self.__progress_monitor
 
     @classmethod
-    def __init_worker(cls) -> None:
+    def __get_pool_context(cls) -> multiprocessing.context.BaseContext:
         """
-        Workaround for managing Python's bug: while on wait syscall, KeyboardInterrupt is not handled
-        Prevent the child processes from ever receiving KeyboardInterrupt and leaving it
-         completely up to the parent process to catch the interrupt and clean up
-         the process pool.
-        :author: John Reese, https://noswap.com/blog/python-multiprocessing-keyboardinterrupt
-         and https://github.com/jreese/multiprocessing-keyboardinterrupt
+        Workers are forked from a server process which has imported the worker modules only, so that
+         they start fast, without the threads, locks and memory of this process; spawned where fork is not available
+        :return: multiprocessing context of the worker pool
         """
-        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([PoolWorker.__module__])
+            return context
+        return multiprocessing.get_context("spawn")
 
     def on_created(self, event: FileSystemEvent) -> None:
         super().on_created(event)
+        MediaEventHandler.__LOG.debug(f"[CREATED] '{event.src_path}'")
+        self.submit(event.src_path)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        super().on_moved(event)
+        MediaEventHandler.__LOG.debug(f"[MOVED] '{event.src_path}' -> '{event.dest_path}'")
+        # files renamed into the observed directory are complete
+        self.submit(event.dest_path, ready=True)
+
+    def submit(self, filein: str, ready: bool = False) -> None:
+        """
+        Queue a file for conversion; it is admitted to the worker pool as soon as there is room
+        Called by observer threads: it never blocks
+        :param filein: file to convert
+        :param ready: True if the file is known to be complete (e.g. it has been closed by the writer),
+         so that the worker does not wait for its size to settle
+        """
+        self.__admission_queue.offer(filein, ready)
+
+    def admit(self, filein: str, ready: bool = False) -> Optional[Future]:
+        """
+        Schedule the conversion of a file, unless a conversion of the same file is already pending
+        :param filein: file to convert
+        :param ready: True if the file is known to be complete (e.g. it has been closed by the writer),
+         so that the worker does not wait for its size to settle
+        :return: future of the conversion, None if the file has not been submitted
+        """
         try:
-            Validation.is_file(event.src_path)
+            Validation.is_file(filein)
         except FileNotFoundError:
-            MediaEventHandler.__LOG.debug(f"[SKIPPING] '{event.src_path}': not a file")
-            return
+            MediaEventHandler.__LOG.debug(f"[SKIPPING] '{filein}': not a file")
+            return None
 
-        MediaEventHandler.__LOG.debug(f"[CREATED] '{event.src_path}'")
+        profile = self.profile_of(filein)
+        if profile is None:
+            MediaEventHandler.__LOG.debug(f"[SKIPPING] '{filein}': not within a watched directory")
+            return None
 
-        fileout = self.__get_fileout_from(
-            event.src_path,
-            MediaEventHandler._CONFIG.media_out_folder,
-            MediaEventHandler._CONFIG.media_out_format.get('format')
-        )
-        converter_object = MediaInfo(
-            event.src_path,
-            MediaEventHandler._CONFIG.media_in_converted_folder,
-            fileout,
-            MediaEventHandler._CONFIG.media_out_format
-        )
-        self.__executor.submit(
-            self.__converter.execute,
-            converter_object
-        )
+        with self.__pending_lock:
+            if filein in self.__pending:
+                MediaEventHandler.__LOG.debug(f"[SKIPPING] '{filein}': conversion already pending")
+                return None
+
+            dirout, in_converted_folder = self.__get_dirs_from(filein, profile)
+            Path(dirout).mkdir(parents=True, exist_ok=True)
+            if in_converted_folder:
+                Path(in_converted_folder).mkdir(parents=True, exist_ok=True)
+
+            fileouts = self.__get_fileouts_from(filein, dirout, profile.out_formats)
+            # formats are referenced by id: workers hold the registry
+            job = Job(
+                filein,
+                Job.identity_of(filein),
+                self.__profile_ids[profile],
+                fileouts,
+                in_converted_folder,
+                ready
+            )
+
+            if self.__journal is not None:
+                self.__journal.submitted(filein, fileouts, job.identity)
+            MediaEventHandler.__LOG.debug(
+                f"[SUBMITTED] '{filein}' (profile: {profile.name}, ready: {ready})"
+            )
+            if self.__engine is not None:
+                future = self.__engine.submit(job)
+            else:
+                # the strategy is resident in workers: only the job is sent
+                future = self.__executor.submit(
+                    PoolWorker.execute,
+                    job
+                )
+            self.__pending[filein] = future
+        future.add_done_callback(lambda f: self.__done(filein, f))
+        return future
+
+    def resume(self) -> int:
+        """
+        Queue again the jobs the journal reports as unfinished (lost by a crash or a forced shutdown),
+         removing their partial outputs first; jobs whose input file is gone are closed as failed.
+        :return: number of jobs queued again
+        """
+        resumed = 0
+        unfinished, self.__unfinished = self.__unfinished, []
+        for job in unfinished:
+            if not os.path.isfile(job.filein):
+                MediaEventHandler.__LOG.warning(f"[JOURNAL] '{job.filein}': unfinished job of a missing file, dropped")
+                self.__journal.failed(job.filein)
+                continue
+            for fileout in job.outputs:
+                try:
+                    Path(fileout).unlink()
+                    MediaEventHandler.__LOG.debug(f"[JOURNAL] Removed partial output '{fileout}'")
+                except FileNotFoundError:
+                    pass
+            MediaEventHandler.__LOG.info(f"[RESUMING] '{job.filein}' ({job.state.value})")
+            self.submit(job.filein)
+            resumed += 1
+        return resumed
+
+    def is_converted(self, filein: str) -> bool:
+        """
+        :param filein: input file
+        :return: True if every output of the file exists and is not older than the file
+        """
+        profile = self.profile_of(filein)
+        if profile is None:
+            return False
+        try:
+            mtime = os.stat(filein).st_mtime
+            dirout, _ = self.__get_dirs_from(filein, profile)
+            fileouts = self.__get_fileouts_from(filein, dirout, profile.out_formats)
+            return all(os.stat(fileout).st_mtime >= mtime for fileout in fileouts)
+        except OSError:
+            return False
+
+    def profile_of(self, filein: str) -> Optional[WatchProfile]:
+        """
+        :param filein: input file
+        :return: profile of the innermost watched directory containing the file, None if not watched
+        """
+        parent = Path(filein).resolve().parent
+        for profile in self.__profiles:
+            in_folder = Path(profile.in_folder).resolve()
+            if parent == in_folder or (profile.recursive and in_folder in parent.parents):
+                return profile
+        return None
+
+    @classmethod
+    def __get_dirs_from(cls, filein: str, profile: WatchProfile) -> tuple:
+        """
+        Subdirectories of the watched directory are mirrored in the output and converted directories
+        :param filein: input file
+        :param profile: profile of the file
+        :return: tuple (output directory, converted directory)
+        """
+        relative = Path(filein).resolve().parent.relative_to(Path(profile.in_folder).resolve())
+        dirout = str(Path(profile.out_folder).joinpath(relative))
+        in_converted_folder = profile.in_converted_folder
+        if in_converted_folder:
+            in_converted_folder = str(Path(in_converted_folder).joinpath(relative))
+        return dirout, in_converted_folder
+
+    def __done(self, filein: str, future: Future = None) -> None:
+        with self.__pending_lock:
+            self.__pending.pop(filein, None)
+        # cancelled before running, or interrupted while running (asyncio engine shutting down)
+        interrupted = future is None or future.cancelled() or isinstance(future.exception(), asyncio.CancelledError)
+        result = None
+        if not interrupted and future.exception() is None:
+            result = future.result()
+            MediaEventHandler.__LOG.debug(
+                f"[RESULT] '{filein}': {result.status.value}, probes: {result.probe_count}, streams: {result.streams}"
+            )
+            usage = result.usage
+            if usage is not None:
+                MediaEventHandler.__LOG.debug(
+                    f"[USAGE] '{filein}' ({result.status.value}): {usage.processes} processes, "
+                    f"cpu {usage.user_time:.2f}s user {usage.system_time:.2f}s system, "
+                    f"max RSS {usage.max_rss / 1024 ** 2:.1f} MiB")
+        # interrupted jobs are left unfinished in the journal, so that they are resumed
+        if self.__journal is not None and not interrupted:
+            if result is not None and result.status == MediaInfo.Status.SUCCEEDED:
+                self.__journal.finished(filein)
+            else:
+                self.__journal.failed(filein)
 
     def on_deleted(self, event: FileSystemEvent) -> None:
         super().on_deleted(event)
         MediaEventHandler.__LOG.debug(f"[DELETED] '{event.src_path}'")
 
     def shutdown(self):
-        self.__executor.shutdown(wait=True)
+        if self.__concurrency_controller is not None:
+            self.__concurrency_controller.stop()
+        self.__admission_queue.stop()
+        if self.__engine is not None:
+            self.__engine.shutdown()
+        else:
+            self.__executor.shutdown(wait=True)
+        if self.__progress_monitor is not None:
+            self.__progress_monitor.stop()
+        if self.__journal is not None:
+            self.__journal.stop()
 
     @classmethod
-    def __get_fileout_from(cls, filein: str, dirout: str, extension: str) -> str:
+    def __get_fileout_from(cls, filein: str, dirout: str, extension: str, suffix: str = "") -> str:
         path_filein = Path(filein)
         path_dirout = Path(dirout)
-        return str(path_dirout.joinpath(path_filein.stem).with_suffix(f".{extension}"))
+        # not with_suffix(): a dotted stem (e.g. 'movie.2020') would lose its last part
+        return str(path_dirout.joinpath(f"{path_filein.stem}{suffix}.{extension}"))
+
+    @classmethod
+    def __get_fileouts_from(cls, filein: str, dirout: str, out_formats: list) -> list:
+        """
+        Output file of each rendition: the optional 'name' key of a format is appended
+         to the file name; renditions which would still clash get their index appended
+        :param filein: input file
+        :param dirout: output directory
+        :param out_formats: list of conversion formats
+        :return: list of output files
+        """
+        fileouts = []
+        for i, out_format in enumerate(out_formats):
+            suffix = f"_{out_format['name']}" if out_format.get('name') else ""
+            fileout = cls.__get_fileout_from(filein, dirout, out_format.get('format'), suffix)
+            if fileout in fileouts:
+                fileout = cls.__get_fileout_from(filein, dirout, out_format.get('format'), f"{suffix}_{i}")
+            fileouts.append(fileout)
+        return fileouts
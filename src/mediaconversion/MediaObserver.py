@@ -1,10 +1,9 @@
 from pathlib import Path
 
-from watchdog.observers import Observer
-
 import __version__
 from mediaconversion.MediaEventHandler import MediaEventHandler
-from model import ConverterConfig
+from mediaconversion.observer import BacklogScanner, ObserverFactory
+from model import ConverterConfig, WatchProfile
 from util import LogManager
 from util.Validation import Validation
 
@@ -44,8 +43,30 @@ class MediaObserver(object):
         # Check permissions
         self.__check_permissions()
 
-        self.__observer = Observer(timeout=converter_config.media_in_timeout)
-        self.__event_handler = MediaEventHandler(converter_config.general_processes)
+        self.__observer = ObserverFactory.get_type(
+            ObserverFactory.Observers(converter_config.media_in_observer),
+            converter_config.media_in_timeout,
+            converter_config.media_in_quiet_period
+        )
+        MediaObserver.__LOG.debug(f"Observer: {type(self.__observer).__name__}")
+        # a single worker pool is shared by all watch profiles
+        self.__event_handler = MediaEventHandler(
+            converter_config.general_processes,
+            progress_interval=converter_config.general_progress_interval,
+            profiles=converter_config.watch_profiles,
+            high_watermark=converter_config.general_queue_high_watermark,
+            low_watermark=converter_config.general_queue_low_watermark,
+            spill_dir=converter_config.general_tmp,
+            scheduler_policy=MediaEventHandler.SchedulerPolicy(converter_config.general_scheduler_policy),
+            fast_slots=converter_config.general_scheduler_fast_slots,
+            fast_duration=converter_config.general_scheduler_fast_duration,
+            min_processes=converter_config.general_processes_min,
+            concurrency_interval=converter_config.general_processes_interval,
+            threads=converter_config.general_threads,
+            journal=converter_config.general_journal,
+            engine=MediaEventHandler.Engine(converter_config.general_engine)
+        )
+        self.__backlog_scanners = []
 
     @classmethod
     def __init_loggers(cls, log_filename: str) -> None:
@@ -54,17 +75,32 @@ class MediaObserver(object):
         MediaObserver.__LOG = log_manager.get(LogManager.Logger.OBSERVER)
 
     def __check_permissions(self):
+        """
+        Check permissions on directories of every watch profile
+
+        :raise ValueError if no directory is watched
+        """
+        profiles = self.__converter_config.watch_profiles
+        if not profiles:
+            raise ValueError(
+                f"No directory to watch: set '{ConverterConfig.K_IN_FOLDER}' or add a "
+                f"[{ConverterConfig.S_WATCH_PREFIX}<name>] section"
+            )
+        for profile in profiles:
+            self.__check_profile_permissions(profile)
+
+    def __check_profile_permissions(self, profile: WatchProfile):
         """
         Check permissions on directories before performing the operations
 
-        :raise ValueError if input directory is equal to output directory
+        :raise ValueError if input directory is equal to output directory, or contains it while watched recursively
         :raise NotADirectoryError
         :raise PermissionError
         :raise LinksError
         """
-        media_in_folder = self.__converter_config.media_in_folder
-        media_out_folder = self.__converter_config.media_out_folder
-        media_in_converted_folder = self.__converter_config.media_in_converted_folder
+        media_in_folder = profile.in_folder
+        media_out_folder = profile.out_folder
+        media_in_converted_folder = profile.in_converted_folder
 
         Validation.is_dir(media_in_folder, f"Missing input directory '{media_in_folder}'")
         Validation.can_read(media_in_folder, f"Missing read permission on '{media_in_folder}'")
@@ -84,6 +120,11 @@ class MediaObserver(object):
             media_out_folder,
             f"Input ('{media_in_folder}') and output ('{media_out_folder}') directory can not be the same (or symlinks)"
         )
+        if profile.recursive:
+            # files written there would be reported again
+            for folder in (media_out_folder, media_in_converted_folder):
+                if folder and Path(media_in_folder).resolve() in Path(folder).resolve().parents:
+                    raise ValueError(f"Directory '{folder}' can not be within recursively watched '{media_in_folder}'")
 
         try:
             Validation.is_empty(media_in_converted_folder)
@@ -110,13 +151,33 @@ class MediaObserver(object):
 
     def __observe(self) -> None:
         # Start observing directories
-        self.__observer.schedule(
-            self.__event_handler,
-            self.__converter_config.media_in_folder,
-            recursive=False
-        )
+        profiles = self.__converter_config.watch_profiles
+        for profile in profiles:
+            self.__observer.schedule(
+                self.__event_handler,
+                profile.in_folder,
+                recursive=profile.recursive
+            )
+        # jobs lost by a crash are queued first, after their partial outputs are removed,
+        #  so that the backlog scan does not take those outputs for converted files
+        resumed = self.__event_handler.resume()
+        if resumed:
+            MediaObserver.__LOG.info(f"Resuming {resumed} unfinished jobs")
         self.__observer.start()
-        MediaObserver.__LOG.debug(f"Start observing {self.__converter_config.media_in_folder}")
+        for profile in profiles:
+            MediaObserver.__LOG.debug(f"Start observing {profile.in_folder} (profile: {profile.name}, recursive: {profile.recursive})")
+
+        # files dropped while not observing; new files are already reported, so none is missed
+        if self.__converter_config.media_in_backlog:
+            for profile in profiles:
+                backlog_scanner = BacklogScanner(
+                    self.__event_handler,
+                    profile.in_folder,
+                    recursive=profile.recursive,
+                    quiet_period=self.__converter_config.media_in_quiet_period
+                )
+                backlog_scanner.start()
+                self.__backlog_scanners.append(backlog_scanner)
 
         self.__observer.join()
 
@@ -138,6 +199,13 @@ class MediaObserver(object):
             MediaObserver.__LOG.debug(f"{e}", exc_info=True)
 
     def __cleanup(self) -> None:
+        if self.__backlog_scanners:
+            MediaObserver.__LOG.debug("Stopping backlog scans")
+            for backlog_scanner in self.__backlog_scanners:
+                backlog_scanner.stop()
+            for backlog_scanner in self.__backlog_scanners:
+                backlog_scanner.join()
+
         MediaObserver.__LOG.debug("Detaching event handlers")
         self.__event_handler.shutdown()
 
@@ -146,7 +214,7 @@ class MediaObserver(object):
             self.__observer.unschedule_all()
             self.__observer.stop()
             self.__observer.join()
-            MediaObserver.__LOG.debug(f"Stop observing {self.__converter_config.media_in_folder}")
+            MediaObserver.__LOG.debug(f"Stop observing {[profile.in_folder for profile in self.__converter_config.watch_profiles]}")
         except RuntimeError as e:
             MediaObserver.__LOG.debug(f"{e}", exc_info=True)
 
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+from converter.ffmpeg import FFMpeg
+
+from util import LogManager
+
+
+class ProbeCache(object):
+    """
+    Persistent catalog of probing results.
+    Entries are keyed by file identity (st_dev, st_ino, st_size, st_mtime_ns), so
+     an unchanged file is never probed twice, even across restarts, while
+     a modified or replaced file misses the cache. They are also keyed by the
+     variant of the probe (see variant_of()), as results of different probe
+     modes are not interchangeable; a database of an older FORMAT_VERSION is
+     emptied when opened.
+    The object is safe to share among threads and it can be pickled: each
+     thread (and process) opens its own connection to the database.
+    """
+
+    __LOG = None
+
+    DEFAULT_WORKERS = 4
+    # version of the table and of the pickled results, bumped whenever either changes
+    FORMAT_VERSION = 2
+
+    __SCHEMA = """
+        CREATE TABLE IF NOT EXISTS probe (
+            dev INTEGER NOT NULL,
+            ino INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            variant TEXT NOT NULL,
+            path TEXT NOT NULL,
+            probed_at REAL NOT NULL,
+            info BLOB NOT NULL,
+            PRIMARY KEY (dev, ino, size, mtime_ns, variant)
+        )
+    """
+
+    def __init__(self, filename: str, variant: str = FFMpeg.PROBE_TEXT):
+        """
+
+        :param filename: database file
+        :param variant: variant of the probes stored and looked up, see variant_of()
+        """
+        super().__init__()
+
+        ProbeCache.__LOG = LogManager.get_instance().get(LogManager.Logger.CONVERTER)
+        self.__filename = filename
+        self.__variant = variant
+        self.__local = threading.local()
+        self.__pid = os.getpid()
+
+        with self.__connection() as connection:
+            if connection.execute("PRAGMA user_version").fetchone()[0] != ProbeCache.FORMAT_VERSION:
+                connection.execute("DROP TABLE IF EXISTS probe")
+                connection.execute(f"PRAGMA user_version = {ProbeCache.FORMAT_VERSION}")
+            connection.execute(ProbeCache.__SCHEMA)
+
+    def __getstate__(self) -> dict:
+        return {'filename': self.__filename, 'variant': self.__variant}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__filename = state['filename']
+        self.__variant = state['variant']
+        self.__local = threading.local()
+        self.__pid = os.getpid()
+
+    @classmethod
+    def variant_of(cls, probe_mode: str) -> str:
+        """
+        :param probe_mode: probe mode of the FFMpeg object using the cache
+        :return: variant of its probes: the mode and, in JSON mode, the digest of the entries shown by ffprobe
+        """
+        if probe_mode == FFMpeg.PROBE_JSON:
+            return f"{probe_mode}:{hashlib.sha1(FFMpeg.FFPROBE_JSON_ENTRIES.encode()).hexdigest()[:12]}"
+        return probe_mode
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    @property
+    def variant(self) -> str:
+        return self.__variant
+
+    def __connection(self) -> sqlite3.Connection:
+        # connections can not be shared with forked children
+        if self.__pid != os.getpid():
+            self.__local = threading.local()
+            self.__pid = os.getpid()
+
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.__filename, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.__local.connection = connection
+        return connection
+
+    @classmethod
+    def identity_of(cls, filename: str) -> tuple:
+        """
+        :param filename: file to identify
+        :return: tuple (st_dev, st_ino, st_size, st_mtime_ns)
+        :raise: OSError if file can not be stat'ed
+        """
+        stat = os.stat(filename)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def get(self, filename: str) -> Optional[object]:
+        """
+        :param filename: file to look for
+        :return: cached probing result or None if missing or outdated
+        """
+        try:
+            identity = ProbeCache.identity_of(filename)
+        except OSError:
+            return None
+
+        row = self.__connection().execute(
+            "SELECT info FROM probe WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND variant = ?",
+            (*identity, self.__variant)
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def put(self, filename: str, info: object) -> None:
+        """
+        Store probing result replacing outdated entries of the same file
+        :param filename: probed file
+        :param info: probing result
+        """
+        try:
+            identity = ProbeCache.identity_of(filename)
+        except OSError:
+            return
+
+        blob = pickle.dumps(info, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.__connection() as connection:
+            connection.execute(
+                "DELETE FROM probe WHERE dev = ? AND ino = ? AND NOT (size = ? AND mtime_ns = ?)",
+                identity
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO probe VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*identity, self.__variant, os.path.abspath(filename), time.time(), blob)
+            )
+
+    def entries(self, path_prefix: str = None) -> Iterator[tuple]:
+        """
+        :param path_prefix: restrict results to paths starting with this prefix
+        :return: iterator of (path, identity, probed_at, info)
+        """
+        query = "SELECT path, dev, ino, size, mtime_ns, probed_at, info FROM probe"
+        params = ()
+        if path_prefix is not None:
+            query += " WHERE substr(path, 1, ?) = ?"
+            prefix = os.path.abspath(path_prefix)
+            params = (len(prefix), prefix)
+        query += " ORDER BY path"
+
+        for path, dev, ino, size, mtime_ns, probed_at, info in self.__connection().execute(query, params):
+            yield path, (dev, ino, size, mtime_ns), probed_at, pickle.loads(info)
+
+    def count(self) -> int:
+        return self.__connection().execute("SELECT COUNT(*) FROM probe").fetchone()[0]
+
+    def purge(self) -> int:
+        """
+        Remove entries whose file does not exist anymore or has been modified
+        :return: number of removed entries
+        """
+        stale = []
+        for path, identity, _, _ in self.entries():
+            try:
+                if ProbeCache.identity_of(path) != identity:
+                    stale.append(identity)
+            except OSError:
+                stale.append(identity)
+
+        with self.__connection() as connection:
+            connection.executemany(
+                "DELETE FROM probe WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                stale
+            )
+        return len(stale)
+
+    def clear(self) -> None:
+        with self.__connection() as connection:
+            connection.execute("DELETE FROM probe")
+
+    def fill(self, directory: str, probe: Callable[[str], object],
+             max_workers: int = DEFAULT_WORKERS, recursive: bool = True) -> tuple:
+        """
+        Probe every file not yet cached within directory, using a bounded thread pool
+        Probing is done by external processes, so threads are enough to use all cores
+        :param directory: root of the tree to scan
+        :param probe: function probing a file, returning None for non media files
+        :param max_workers: maximum number of concurrent probes
+        :param recursive: descend into subdirectories
+        :return: tuple (files already cached, files probed, files not probed successfully,
+         files whose cache lookup or update failed)
+        """
+        counters = {'cached': 0, 'probed': 0, 'failed': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def task(filename: str) -> None:
+            try:
+                if self.get(filename) is not None:
+                    result = 'cached'
+                else:
+                    try:
+                        info = probe(filename)
+                    except Exception:
+                        info = None
+                    if info is not None:
+                        self.put(filename, info)
+                        result = 'probed'
+                    else:
+                        result = 'failed'
+            except sqlite3.Error as e:
+                ProbeCache.__LOG.warning(f"[PROBE CACHE] '{filename}': {e}")
+                result = 'errors'
+            with lock:
+                counters[result] += 1
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map() would queue the whole tree at once, so submissions are throttled
+            semaphore = threading.BoundedSemaphore(max_workers * 2)
+            for filename in ProbeCache.__walk(directory, recursive):
+                semaphore.acquire()
+                future = executor.submit(task, filename)
+                future.add_done_callback(lambda _: semaphore.release())
+
+        return counters['cached'], counters['probed'], counters['failed'], counters['errors']
+
+    @classmethod
+    def __walk(cls, directory: str, recursive: bool) -> Iterator[str]:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                if entry.is_file(follow_symlinks=False):
+                    yield entry.path
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    yield from ProbeCache.__walk(entry.path, recursive)
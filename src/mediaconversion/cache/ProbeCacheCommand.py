@@ -0,0 +1,91 @@
+import argparse
+import time
+
+from converter.ffmpeg import FFMpeg
+
+from mediaconversion.cache.ProbeCache import ProbeCache
+from model import ConverterConfig
+from util import Common, LogManager
+
+
+class ProbeCacheCommand(object):
+    """
+    Command line interface to inspect and fill the probe cache
+    """
+
+    NAME = "probe-cache"
+
+    def __init__(self):
+        super().__init__()
+
+        self.__parser = argparse.ArgumentParser(
+            prog=ProbeCacheCommand.NAME,
+            description="Inspect and fill the persistent probe cache"
+        )
+        self.__parser.add_argument(
+            "-c", "--config",
+            default=f"{Common.get_proj_root_path()}/res/conf/conf.ini",
+            help="configuration file"
+        )
+        self.__parser.add_argument("--cache", help="probe cache file, overrides configuration")
+
+        commands = self.__parser.add_subparsers(dest="command", required=True)
+
+        scan = commands.add_parser("scan", help="probe every file not yet cached in a directory tree")
+        scan.add_argument("directory")
+        scan.add_argument("-w", "--workers", type=int, default=ProbeCache.DEFAULT_WORKERS, help="concurrent probes")
+        scan.add_argument("--no-recursive", dest="recursive", action="store_false", help="do not descend into subdirectories")
+
+        query = commands.add_parser("query", help="show cached entries for files or directories")
+        query.add_argument("paths", nargs="*")
+
+        commands.add_parser("stats", help="show number of cached entries")
+        commands.add_parser("purge", help="remove entries of missing or modified files")
+        commands.add_parser("clear", help="remove every entry")
+
+    def run(self, argv: list) -> int:
+        """
+
+        :param argv: command line arguments, without command name
+        :return: exit code
+        """
+        args = self.__parser.parse_args(argv)
+
+        converter_config = ConverterConfig.get_instance()
+        converter_config.load_from(args.config)
+        cache_filename = args.cache or converter_config.media_probe_cache
+        if not cache_filename:
+            print(f"Probe cache not configured: set '{ConverterConfig.K_PROBE_CACHE}' or use --cache")
+            return 1
+
+        # console only, for warnings about files the cache failed on
+        LogManager.get_instance().load()
+        probe_cache = ProbeCache(cache_filename, ProbeCache.variant_of(converter_config.media_probe_mode))
+
+        if args.command == "scan":
+            ffmpeg = FFMpeg(
+                converter_config.media_ffmpeg,
+                converter_config.media_ffprobe,
+                probe_mode=converter_config.media_probe_mode
+            )
+            start = time.monotonic()
+            cached, probed, failed, errors = probe_cache.fill(args.directory, ffmpeg.probe, args.workers, args.recursive)
+            print(
+                f"cached: {cached}, probed: {probed}, failed: {failed}, cache errors: {errors}"
+                f" ({time.monotonic() - start:.2f}s)"
+            )
+            if errors:
+                return 1
+        elif args.command == "query":
+            for path in args.paths or [None]:
+                for filename, identity, probed_at, info in probe_cache.entries(path):
+                    print(f"{filename} {identity} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(probed_at))}")
+                    print(f"\t{info}")
+        elif args.command == "stats":
+            print(f"{probe_cache.filename}: {probe_cache.count()} entries")
+        elif args.command == "purge":
+            print(f"removed: {probe_cache.purge()}")
+        elif args.command == "clear":
+            probe_cache.clear()
+
+        return 0
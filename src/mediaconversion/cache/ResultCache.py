@@ -0,0 +1,263 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class ResultCache(object):
+    """
+    Content-addressed store of conversion outputs.
+    Entries are keyed by a sampled hash of the input content (size and blocks at
+     the head, middle and tail of the file) and by a hash of the compiled ffmpeg
+     options, so a file dropped again, even renamed or copied, is not converted
+     twice: its output is linked from the store, by reflink (copy-on-write clone)
+     where the filesystem supports it, by hardlink otherwise.
+    The store is bounded in size: least recently used entries are evicted first.
+    Like ProbeCache, the object is safe to share among threads and it can be
+     pickled: each thread (and process) opens its own connection to the index.
+    """
+
+    DEFAULT_MAX_SIZE = 10 * 1024 ** 3
+    # bytes hashed at each sampled offset
+    BLOCK_SIZE = 1024 ** 2
+    # linux/fs.h
+    FICLONE = 0x40049409
+
+    __INDEX = "index.sqlite"
+
+    __SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS result (
+            key TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            used_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS result_used_at ON result (used_at)",
+        """
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('evictions', 0)"
+    )
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        """
+
+        :param directory: store directory, holding the index and the cached outputs
+        :param max_size: maximum bytes of cached outputs
+        """
+        super().__init__()
+
+        self.__directory = directory
+        self.__max_size = max_size
+        self.__local = threading.local()
+        self.__pid = os.getpid()
+
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        with self.__connection() as connection:
+            for statement in ResultCache.__SCHEMA:
+                connection.execute(statement)
+
+    def __getstate__(self) -> dict:
+        return {'directory': self.__directory, 'max_size': self.__max_size}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__directory = state['directory']
+        self.__max_size = state['max_size']
+        self.__local = threading.local()
+        self.__pid = os.getpid()
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def max_size(self) -> int:
+        return self.__max_size
+
+    def __connection(self) -> sqlite3.Connection:
+        # connections can not be shared with forked children
+        if self.__pid != os.getpid():
+            self.__local = threading.local()
+            self.__pid = os.getpid()
+
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(os.path.join(self.__directory, ResultCache.__INDEX), timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.__local.connection = connection
+        return connection
+
+    @classmethod
+    def content_hash(cls, filename: str) -> str:
+        """
+        Hash of size and of head, middle and tail blocks of a file (the whole file if small)
+        Reads at most 3 blocks whatever the file size, so it is cheap on large media
+        :param filename: file to hash
+        :return: hex digest
+        :raise: OSError if file can not be read
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        with open(filename, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            digest.update(size.to_bytes(8, 'little'))
+            if size <= 3 * ResultCache.BLOCK_SIZE:
+                for block in iter(lambda: f.read(ResultCache.BLOCK_SIZE), b''):
+                    digest.update(block)
+            else:
+                for offset in (0, (size - ResultCache.BLOCK_SIZE) // 2, size - ResultCache.BLOCK_SIZE):
+                    digest.update(os.pread(f.fileno(), ResultCache.BLOCK_SIZE, offset))
+        return digest.hexdigest()
+
+    @classmethod
+    def options_hash(cls, options: list) -> str:
+        """
+        :param options: compiled ffmpeg options of an output
+        :return: hex digest
+        """
+        return hashlib.blake2b(json.dumps([str(o) for o in options]).encode(), digest_size=20).hexdigest()
+
+    @classmethod
+    def key_of(cls, content_hash: str, options_hash: str) -> str:
+        return f"{content_hash}-{options_hash}"
+
+    def __path_of(self, key: str, extension: str) -> str:
+        return os.path.join(self.__directory, key[:2], f"{key}{extension}")
+
+    def get(self, key: str, fileout: str) -> bool:
+        """
+        Produce an output from the store
+        :param key: entry key
+        :param fileout: output to produce, replaced if it exists
+        :return: True on a hit
+        """
+        connection = self.__connection()
+        row = connection.execute("SELECT filename FROM result WHERE key = ?", (key,)).fetchone()
+        hit = False
+        if row is not None:
+            try:
+                ResultCache.__link(os.path.join(self.__directory, row[0]), fileout)
+                hit = True
+            except OSError:
+                # entry lost, e.g. store cleaned by hand
+                with connection:
+                    connection.execute("DELETE FROM result WHERE key = ?", (key,))
+
+        with connection:
+            if hit:
+                connection.execute("UPDATE result SET used_at = ? WHERE key = ?", (time.time(), key))
+            connection.execute("UPDATE stats SET value = value + 1 WHERE name = ?", ('hits' if hit else 'misses',))
+        return hit
+
+    def put(self, key: str, fileout: str) -> None:
+        """
+        Store a converted output, then evict least recently used entries beyond maximum size
+        :param key: entry key
+        :param fileout: converted output
+        """
+        try:
+            size = os.stat(fileout).st_size
+        except OSError:
+            return
+        if size > self.__max_size:
+            return
+
+        path = self.__path_of(key, Path(fileout).suffix)
+        try:
+            Path(path).parent.mkdir(exist_ok=True)
+            ResultCache.__link(fileout, path)
+        except OSError:
+            return
+
+        now = time.time()
+        with self.__connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO result VALUES (?, ?, ?, ?, ?)",
+                (key, os.path.relpath(path, self.__directory), size, now, now)
+            )
+        self.evict(self.__max_size)
+
+    def evict(self, max_size: int) -> int:
+        """
+        Remove least recently used entries until the store holds at most max_size bytes
+        :param max_size: target size
+        :return: number of evicted entries
+        """
+        connection = self.__connection()
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM result").fetchone()[0]
+        evicted = []
+        if total > max_size:
+            for key, filename, size in connection.execute("SELECT key, filename, size FROM result ORDER BY used_at"):
+                if total <= max_size:
+                    break
+                evicted.append((key, filename))
+                total -= size
+
+        for _, filename in evicted:
+            try:
+                os.unlink(os.path.join(self.__directory, filename))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            with connection:
+                connection.executemany("DELETE FROM result WHERE key = ?", [(key,) for key, _ in evicted])
+                connection.execute("UPDATE stats SET value = value + ? WHERE name = 'evictions'", (len(evicted),))
+        return len(evicted)
+
+    def stats(self) -> dict:
+        """
+        :return: number of entries, bytes stored, hits, misses and evictions
+        """
+        connection = self.__connection()
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result").fetchone()
+        stats = dict(connection.execute("SELECT name, value FROM stats"))
+        stats.update({'entries': entries, 'size': size})
+        return stats
+
+    def clear(self) -> None:
+        connection = self.__connection()
+        for filename, in connection.execute("SELECT filename FROM result").fetchall():
+            try:
+                os.unlink(os.path.join(self.__directory, filename))
+            except FileNotFoundError:
+                pass
+        with connection:
+            connection.execute("DELETE FROM result")
+            connection.execute("UPDATE stats SET value = 0")
+
+    @classmethod
+    def __link(cls, src: str, dst: str) -> None:
+        """
+        Make dst share the content of src: reflink if supported, hardlink otherwise
+         (a hardlinked output must not be modified in place, it would change the store);
+         copy across filesystems
+        :raise: OSError if src can not be linked nor copied
+        """
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        try:
+            with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), ResultCache.FICLONE, fsrc.fileno())
+        except OSError as e:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            if isinstance(e, FileNotFoundError):
+                raise
+            try:
+                os.link(src, tmp)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # e.g. across filesystems
+                shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
@@ -0,0 +1,64 @@
+import argparse
+
+from mediaconversion.cache.ResultCache import ResultCache
+from model import ConverterConfig
+from util import Common
+
+
+class ResultCacheCommand(object):
+    """
+    Command line interface to inspect and trim the conversion result cache
+    """
+
+    NAME = "result-cache"
+
+    def __init__(self):
+        super().__init__()
+
+        self.__parser = argparse.ArgumentParser(
+            prog=ResultCacheCommand.NAME,
+            description="Inspect and trim the conversion result cache"
+        )
+        self.__parser.add_argument(
+            "-c", "--config",
+            default=f"{Common.get_proj_root_path()}/res/conf/conf.ini",
+            help="configuration file"
+        )
+        self.__parser.add_argument("--cache", help="result cache directory, overrides configuration")
+
+        commands = self.__parser.add_subparsers(dest="command", required=True)
+
+        commands.add_parser("stats", help="show entries, size, hits, misses and evictions")
+        evict = commands.add_parser("evict", help="remove least recently used entries down to a size")
+        evict.add_argument("size", type=int, help="target size (MiB)")
+        commands.add_parser("clear", help="remove every entry and reset statistics")
+
+    def run(self, argv: list) -> int:
+        """
+
+        :param argv: command line arguments, without command name
+        :return: exit code
+        """
+        args = self.__parser.parse_args(argv)
+
+        converter_config = ConverterConfig.get_instance()
+        converter_config.load_from(args.config)
+        cache_directory = args.cache or converter_config.media_result_cache
+        if not cache_directory:
+            print(f"Result cache not configured: set '{ConverterConfig.K_RESULT_CACHE}' or use --cache")
+            return 1
+
+        result_cache = ResultCache(cache_directory, converter_config.media_result_cache_size * 1024 ** 2)
+
+        if args.command == "stats":
+            stats = result_cache.stats()
+            lookups = stats['hits'] + stats['misses']
+            print(f"{result_cache.directory}: {stats['entries']} entries, {stats['size'] / 1024 ** 2:.1f} MiB")
+            print(f"hits: {stats['hits']}, misses: {stats['misses']}, evictions: {stats['evictions']}"
+                  f" (hit ratio: {stats['hits'] / lookups if lookups else 0:.1%})")
+        elif args.command == "evict":
+            print(f"evicted: {result_cache.evict(args.size * 1024 ** 2)}")
+        elif args.command == "clear":
+            result_cache.clear()
+
+        return 0
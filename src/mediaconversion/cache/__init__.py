@@ -0,0 +1,6 @@
+from mediaconversion.cache.ProbeCache import ProbeCache
+from mediaconversion.cache.ProbeCacheCommand import ProbeCacheCommand
+from mediaconversion.cache.ResultCache import ResultCache
+from mediaconversion.cache.ResultCacheCommand import ResultCacheCommand
+
+__all__ = ["ProbeCache", "ProbeCacheCommand", "ResultCache", "ResultCacheCommand"]
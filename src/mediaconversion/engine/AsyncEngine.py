@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from concurrent.futures.thread import ThreadPoolExecutor
+
+from mediaconversion.journal import JournalRecorder
+from mediaconversion.model import FormatRegistry, Job, JobResult, MediaInfo
+from mediaconversion.progress import ProgressReporter
+from mediaconversion.scheduler import ThreadBudget
+from mediaconversion.strategy import BaseConverter
+from util import LogManager
+from util.Validation import Validation
+
+
+class AsyncEngine(threading.Thread):
+    """
+    Run conversions from a single asyncio event loop, as an alternative to the worker pool.
+    A worker process only waits on its ffmpeg: here every ffprobe and ffmpeg is a child
+     of this process, driven by the loop (see BaseConverter.execute_async()), so that a job
+     costs a coroutine instead of a Python interpreter, and jobs are handed over without
+     pickling. Blocking steps (result cache, segmented encoding, success and error
+     handlers) run in a small pool of threads, the default executor of the loop.
+    Like ProcessPoolExecutor, submit() returns a concurrent.futures.Future and at most
+     max_jobs conversions run at once, others wait in order of submission.
+    """
+
+    __LOG = None
+
+    # children can be watched from a loop outside the main thread since 3.8
+    PY_VERSION_MIN = (3, 8)
+    DEFAULT_BLOCKING_WORKERS = 4
+
+    def __init__(self, strategy: BaseConverter, formats: FormatRegistry, max_jobs: int, progress_queue=None,
+                 progress_interval: float = ProgressReporter.DEFAULT_INTERVAL, journal_queue=None,
+                 blocking_workers: int = DEFAULT_BLOCKING_WORKERS, thread_budget: ThreadBudget = None):
+        """
+
+        :param strategy: conversion strategy
+        :param formats: conversion formats referenced by jobs
+        :param max_jobs: maximum number of concurrent conversions
+        :param progress_queue: queue drained by the progress monitor, None to disable progress
+        :param progress_interval: minimum seconds between two reports of the same job
+        :param journal_queue: queue drained by the job journal, None to disable journaling
+        :param blocking_workers: threads running blocking steps of conversions
+        :param thread_budget: ffmpeg threads shared by conversions, granted when they start; None to let ffmpeg decide
+        """
+        super().__init__(name="AsyncEngine", daemon=True)
+
+        Validation.python_version(AsyncEngine.PY_VERSION_MIN, f"Python version required >= {AsyncEngine.PY_VERSION_MIN}")
+        AsyncEngine.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__strategy = strategy
+        self.__formats = formats
+        self.__max_jobs = max_jobs
+        self.__blocking_workers = blocking_workers
+        self.__thread_budget = thread_budget
+        self.__loop = asyncio.new_event_loop()
+        self.__ready = threading.Event()
+        self.__slots = None
+        # conversions submitted and not ended yet
+        self.__tasks = set()
+
+        # as the pool initializer does in each worker, jobs of this process publish progress and start events
+        if progress_queue is not None:
+            ProgressReporter.install(progress_queue, progress_interval)
+        if journal_queue is not None:
+            JournalRecorder.install(journal_queue)
+
+        self.start()
+        self.__ready.wait()
+
+    @property
+    def max_jobs(self) -> int:
+        return self.__max_jobs
+
+    @property
+    def pending(self) -> int:
+        """
+        :return: number of submitted jobs not ended yet, running or waiting for a slot
+        """
+        return len(self.__tasks)
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.__loop)
+        executor = ThreadPoolExecutor(max_workers=self.__blocking_workers, thread_name_prefix="AsyncEngine")
+        self.__loop.set_default_executor(executor)
+        self.__slots = asyncio.Semaphore(self.__max_jobs)
+        self.__loop.call_soon(self.__ready.set)
+        try:
+            self.__loop.run_forever()
+        finally:
+            self.__loop.run_until_complete(self.__loop.shutdown_asyncgens())
+            executor.shutdown(wait=True)
+            self.__loop.close()
+
+    def submit(self, job: Job) -> Future:
+        """
+        Schedule the conversion of a job
+        Called by any thread: it never blocks
+        :param job: job
+        :return: future of the conversion, resolved with the outcome of the job (JobResult)
+        """
+        future = Future()
+        self.__loop.call_soon_threadsafe(self.__spawn, job, future)
+        return future
+
+    def __spawn(self, job: Job, future: Future) -> None:
+        self.__tasks.add(self.__loop.create_task(self.__execute(job, future)))
+
+    async def __execute(self, job: Job, future: Future) -> None:
+        try:
+            async with self.__slots:
+                # as with the pool, a job can be cancelled until it starts
+                if not future.set_running_or_notify_cancel():
+                    return
+                threads = self.__thread_budget.acquire() if self.__thread_budget is not None else None
+                try:
+                    media_info = MediaInfo(job, self.__formats.get(job.profile_id))
+                    media_info.threads = threads
+                    future.set_result(JobResult.of(await self.__strategy.execute_async(media_info)))
+                except Exception as e:
+                    future.set_exception(e)
+                except BaseException as e:
+                    # interrupted, e.g. cancelled on shutdown of the loop: the future must end anyway
+                    future.set_exception(e)
+                    raise
+                finally:
+                    if threads is not None:
+                        self.__thread_budget.release(threads)
+        except asyncio.CancelledError:
+            # cancelled while waiting for a slot, the future is not running yet
+            future.cancel()
+            raise
+        finally:
+            self.__tasks.discard(asyncio.current_task())
+
+    async def __drain(self) -> None:
+        tasks = list(self.__tasks)
+        while tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            tasks = list(self.__tasks)
+
+    def shutdown(self) -> None:
+        """
+        Wait for submitted jobs to end, then stop the loop
+        """
+        if not self.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self.__drain(), self.__loop).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.join()
+        AsyncEngine.__LOG.debug("[ENGINE] stopped")
@@ -0,0 +1,104 @@
+import os
+import signal
+from typing import List, Optional
+
+from converter.ffmpeg import ProcessLimits
+
+from mediaconversion.journal import JournalRecorder
+from mediaconversion.model import FormatRegistry, Job, JobResult, MediaInfo
+from mediaconversion.progress import ProgressReporter
+from mediaconversion.scheduler import ThreadBudget
+from mediaconversion.strategy import BaseConverter, ConverterFactory
+from model import ConverterConfig
+from util import LogManager
+
+
+class PoolWorker(object):
+    """
+    Worker side of the process pool.
+    The conversion strategy (with its converter, codec registries and caches) is built
+     once by the pool initializer and stays resident in the worker, like the registry of
+     conversion formats: a job is submitted as PoolWorker.execute and its Job descriptor,
+     so that only the job itself is pickled, and only its outcome is sent back.
+    Workers are not forked from the observer process, but from a fork server which has
+     imported this module already: they inherit neither the configuration nor the
+     loggers, which are loaded again from the configuration files of the parent.
+    """
+
+    __STRATEGY = None
+    __FORMATS = None
+    __THREAD_BUDGET = None
+
+    @classmethod
+    def initialize(cls, converter: ConverterFactory.Converters, formats: FormatRegistry, progress_queue,
+                   progress_interval: float, journal_queue, config_files: Optional[List[str]] = None,
+                   thread_budget: ThreadBudget = None) -> None:
+        """
+        Pool initializer: set up the worker and build its conversion strategy
+        SIGINT is ignored, so that interrupts are handled by the parent only; on SIGTERM
+         the ffmpeg processes of the strategy are stopped before the worker exits
+        :param converter: conversion strategy
+        :param formats: conversion formats referenced by jobs
+        :param progress_queue: queue drained by the progress monitor, None to disable progress
+        :param progress_interval: minimum seconds between two reports of the same job
+        :param journal_queue: queue drained by the job journal, None to disable journaling
+        :param config_files: configuration files of the parent, None if the worker inherits its configuration
+        :param thread_budget: ffmpeg threads shared with the other workers, None to let ffmpeg decide
+        """
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        if config_files is not None:
+            config = ConverterConfig.get_instance()
+            for config_file in config_files:
+                config.load_from(config_file)
+            LogManager.get_instance().load(config.log_filename)
+
+        if progress_queue is not None:
+            ProgressReporter.install(progress_queue, progress_interval)
+        if journal_queue is not None:
+            JournalRecorder.install(journal_queue)
+        cls.__STRATEGY = ConverterFactory.get_type(converter)
+        cls.__FORMATS = formats
+        cls.__THREAD_BUDGET = thread_budget
+
+        signal.signal(signal.SIGTERM, cls.__terminate)
+        if ConverterConfig.get_instance().media_limit_parent_death:
+            # the parent of a worker is the fork server, whose single thread lives as long as the pool
+            ProcessLimits.set_parent_death_signal(signal.SIGTERM)
+
+    @classmethod
+    def __terminate(cls, signum: int, _) -> None:
+        cls.__STRATEGY.terminate()
+        os._exit(128 + signum)
+
+    @classmethod
+    def get_strategy(cls) -> Optional[BaseConverter]:
+        """
+        :return: strategy of the current process, None if it is not a pool worker
+        """
+        return cls.__STRATEGY
+
+    @classmethod
+    def execute(cls, job: Job) -> JobResult:
+        """
+        Convert a job with the strategy of the worker, granting it its share of ffmpeg threads
+        :param job: job
+        :return: outcome of the job
+        """
+        media_info = MediaInfo(job, cls.__FORMATS.get(job.profile_id))
+        if cls.__THREAD_BUDGET is None:
+            return JobResult.of(cls.__STRATEGY.execute(media_info))
+
+        media_info.threads = cls.__THREAD_BUDGET.acquire()
+        try:
+            return JobResult.of(cls.__STRATEGY.execute(media_info))
+        finally:
+            cls.__THREAD_BUDGET.release(media_info.threads)
+
+    @classmethod
+    def warm(cls, _: int = None) -> int:
+        """
+        No-op job, run at startup so that workers are ready before the first file
+        :return: pid of the worker
+        """
+        return os.getpid()
@@ -0,0 +1,4 @@
+from mediaconversion.engine.AsyncEngine import AsyncEngine
+from mediaconversion.engine.PoolWorker import PoolWorker
+
+__all__ = ["AsyncEngine", "PoolWorker"]
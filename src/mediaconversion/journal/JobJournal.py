@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import List, Optional
+
+from util import LogManager
+
+
+class JobJournal(threading.Thread):
+    """
+    Crash-safe, append-only record of conversion jobs, in a SQLite database (WAL mode).
+    A job goes through submitted -> started -> finished | failed. Events of the parent
+     (submission and outcome) and of workers (start, through JournalRecorder) are sent
+     to a multiprocessing queue and written by this thread in batches, one transaction
+     each, so that neither admission nor conversion ever waits for the disk.
+    Jobs whose last event is not an outcome have been lost by a crash or a forced
+     shutdown: replay() returns them so that they are converted again.
+    """
+
+    __LOG = None
+
+    DEFAULT_BATCH_SIZE = 256
+    DEFAULT_BATCH_DELAY = 0.5
+
+    class State(Enum):
+        SUBMITTED = "submitted"
+        STARTED = "started"
+        FINISHED = "finished"
+        FAILED = "failed"
+
+    class Job(object):
+        """
+        Unfinished job found by replay()
+        """
+        __slots__ = ("filein", "identity", "state", "outputs")
+
+        def __init__(self, filein: str, identity: Optional[tuple], state: "JobJournal.State", outputs: List[str]):
+            self.filein = filein
+            self.identity = identity
+            self.state = state
+            self.outputs = outputs
+
+        def __repr__(self) -> str:
+            return f"Job({self.filein!r}, {self.state.value}, outputs={self.outputs})"
+
+    __SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS job (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            dev INTEGER,
+            ino INTEGER,
+            size INTEGER,
+            mtime_ns INTEGER,
+            state TEXT NOT NULL,
+            at REAL NOT NULL,
+            outputs TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS job_path ON job (path)"
+    )
+
+    def __init__(self, filename: str, journal_queue, batch_size: int = DEFAULT_BATCH_SIZE,
+                 batch_delay: float = DEFAULT_BATCH_DELAY):
+        """
+
+        :param filename: journal database
+        :param journal_queue: multiprocessing queue shared with workers
+        :param batch_size: maximum number of events written in a transaction
+        :param batch_delay: seconds events are collected for, after the first one of a batch
+        """
+        super().__init__(name="JobJournal", daemon=True)
+
+        JobJournal.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__filename = filename
+        self.__queue = journal_queue
+        self.__batch_size = batch_size
+        self.__batch_delay = batch_delay
+        self.__written = 0
+
+        connection = self.__connect()
+        try:
+            for statement in JobJournal.__SCHEMA:
+                connection.execute(statement)
+        finally:
+            connection.close()
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    @property
+    def queue(self):
+        return self.__queue
+
+    def __connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.__filename, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # a committed batch survives a crash of the process; only a power loss can lose the last ones
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @classmethod
+    def event(cls, filein: str, state: "JobJournal.State", identity: tuple = None, outputs: list = None) -> tuple:
+        """
+        :return: event, as sent through the queue
+        """
+        return (
+            filein,
+            *(identity or (None, None, None, None)),
+            state.value,
+            time.time(),
+            json.dumps(outputs) if outputs is not None else None
+        )
+
+    def submitted(self, filein: str, outputs: List[str], identity: tuple = None) -> None:
+        """
+        :param filein: file admitted to the worker pool
+        :param outputs: files the job writes, removed if the job does not finish
+        :param identity: (st_dev, st_ino, st_size, st_mtime_ns) of the file, by default read from the file
+        """
+        if identity is None:
+            try:
+                stat = os.stat(filein)
+                identity = stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+            except OSError:
+                pass
+        self.__queue.put(JobJournal.event(filein, JobJournal.State.SUBMITTED, identity, outputs))
+
+    def finished(self, filein: str) -> None:
+        self.__queue.put(JobJournal.event(filein, JobJournal.State.FINISHED))
+
+    def failed(self, filein: str) -> None:
+        self.__queue.put(JobJournal.event(filein, JobJournal.State.FAILED))
+
+    def run(self) -> None:
+        connection = self.__connect()
+        try:
+            stopped = False
+            while not stopped:
+                try:
+                    batch = [self.__queue.get()]
+                except (EOFError, OSError):
+                    break
+                deadline = time.monotonic() + self.__batch_delay
+                while batch[-1] is not None and len(batch) < self.__batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self.__queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    stopped = True
+                    batch.pop()
+
+                if batch:
+                    try:
+                        with connection:
+                            connection.executemany("INSERT INTO job VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                        self.__written += len(batch)
+                    except sqlite3.Error as e:
+                        JobJournal.__LOG.warning(f"[JOURNAL] {len(batch)} events not written: {e}")
+        finally:
+            connection.close()
+
+    def replay(self) -> List["JobJournal.Job"]:
+        """
+        Read the journal, before any new event is written
+        :return: unfinished jobs, in order of submission
+        """
+        return self.__compact()
+
+    def __compact(self) -> List["JobJournal.Job"]:
+        """
+        Drop jobs with an outcome from the journal
+        :return: unfinished jobs, in order of submission
+        """
+        completed, unfinished = [], []
+        for job in self.__scan().values():
+            if job.state in (JobJournal.State.FINISHED, JobJournal.State.FAILED):
+                completed.append(job.filein)
+            else:
+                unfinished.append(job)
+        self.__delete(completed)
+        JobJournal.__LOG.debug(
+            f"[JOURNAL] '{self.__filename}': {len(completed)} jobs completed, {len(unfinished)} unfinished"
+        )
+        return unfinished
+
+    def __scan(self) -> dict:
+        """
+        :return: filein -> its last job
+        """
+        jobs = {}
+        connection = self.__connect()
+        try:
+            rows = connection.execute(
+                "SELECT path, dev, ino, size, mtime_ns, state, outputs FROM job ORDER BY at, seq"
+            )
+            for path, dev, ino, size, mtime_ns, state, outputs in rows:
+                state = JobJournal.State(state)
+                job = jobs.get(path)
+                if job is None or state == JobJournal.State.SUBMITTED:
+                    # a job resubmitted after its outcome is a new job
+                    jobs.pop(path, None)
+                    job = jobs[path] = JobJournal.Job(path, None, state, [])
+                job.state = state
+                if dev is not None:
+                    job.identity = (dev, ino, size, mtime_ns)
+                if outputs is not None:
+                    job.outputs = json.loads(outputs)
+        finally:
+            connection.close()
+        return jobs
+
+    def __delete(self, fileins: List[str]) -> None:
+        if not fileins:
+            return
+        connection = self.__connect()
+        try:
+            with connection:
+                connection.executemany("DELETE FROM job WHERE path = ?", [(filein,) for filein in fileins])
+        finally:
+            connection.close()
+
+    def stop(self) -> None:
+        """
+        Write pending events and drop completed jobs from the journal
+        """
+        self.__queue.put(None)
+        self.join()
+        self.__compact()
+        JobJournal.__LOG.debug(f"[JOURNAL] '{self.__filename}': {self.__written} events written")
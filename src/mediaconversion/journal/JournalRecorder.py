@@ -0,0 +1,46 @@
+from typing import Optional
+
+from mediaconversion.journal.JobJournal import JobJournal
+
+
+class JournalRecorder(object):
+    """
+    Worker side of the job journal.
+    One instance is installed in each worker process by the pool initializer;
+     events are sent to the JobJournal of the parent through a multiprocessing queue,
+     never waiting for the journal to be written.
+    """
+
+    __INSTANCE = None
+
+    def __init__(self, journal_queue):
+        """
+
+        :param journal_queue: multiprocessing queue read by JobJournal
+        """
+        super().__init__()
+
+        self.__queue = journal_queue
+
+    @classmethod
+    def install(cls, journal_queue) -> "JournalRecorder":
+        """
+        Set the recorder of the current process
+        :param journal_queue: multiprocessing queue read by JobJournal
+        :return: installed recorder
+        """
+        cls.__INSTANCE = JournalRecorder(journal_queue)
+        return cls.__INSTANCE
+
+    @classmethod
+    def get_instance(cls) -> Optional["JournalRecorder"]:
+        """
+        :return: recorder of the current process, None if jobs are not journaled
+        """
+        return cls.__INSTANCE
+
+    def started(self, filein: str) -> None:
+        """
+        :param filein: file whose conversion is about to write its outputs
+        """
+        self.__queue.put(JobJournal.event(filein, JobJournal.State.STARTED))
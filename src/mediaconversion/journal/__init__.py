@@ -0,0 +1,4 @@
+from mediaconversion.journal.JobJournal import JobJournal
+from mediaconversion.journal.JournalRecorder import JournalRecorder
+
+__all__ = ["JobJournal", "JournalRecorder"]
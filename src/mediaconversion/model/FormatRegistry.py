@@ -0,0 +1,52 @@
+import threading
+from typing import List
+
+
+class FormatRegistry(object):
+    """
+    Interned conversion formats.
+    Every distinct list of conversion formats (of a watch profile) is stored once and
+     referenced by jobs through its id. The registry is built by the observer process
+     and sent to each worker once, when the worker starts.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        # id -> formats
+        self.__formats = []
+        # canonical form -> id
+        self.__ids = {}
+        self.__lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        return {'formats': self.__formats}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__formats = state['formats']
+        self.__ids = {repr(list(formats)): profile_id for profile_id, formats in enumerate(self.__formats)}
+        self.__lock = threading.Lock()
+
+    def intern(self, out_formats: list) -> int:
+        """
+        :param out_formats: list of conversion formats
+        :return: id of the formats, the same for equal lists
+        """
+        key = repr(out_formats)
+        with self.__lock:
+            profile_id = self.__ids.get(key)
+            if profile_id is None:
+                profile_id = self.__ids[key] = len(self.__formats)
+                self.__formats.append(tuple(out_formats))
+            return profile_id
+
+    def get(self, profile_id: int) -> List[dict]:
+        """
+        :param profile_id: id returned by intern()
+        :return: list of conversion formats
+        :raise: IndexError if the id is unknown
+        """
+        return list(self.__formats[profile_id])
+
+    def __len__(self) -> int:
+        return len(self.__formats)
@@ -0,0 +1,57 @@
+import os
+from typing import Optional, Tuple
+
+
+class Job(object):
+    """
+    Conversion job, as admitted and sent to the worker pool.
+    Compact and immutable: conversion formats are referenced by the id they are interned
+     with in a FormatRegistry, known to every worker, instead of being embedded, so that
+     queued jobs and their pickles do not grow with the formats of their profile.
+     The worker turns a job into a MediaInfo, which carries the state of the conversion.
+    The identity of the input file (device, inode, size, mtime) is taken at admission,
+     so that a file replaced or modified afterwards can be told apart. No probe is
+     carried: the worker probes the file, through the probe cache when configured.
+    """
+
+    __slots__ = ("filein", "identity", "profile_id", "fileouts", "filein_converted_folder", "ready")
+
+    def __init__(self, filein: str, identity: Optional[Tuple[int, int, int, int]], profile_id: int,
+                 fileouts: Tuple[str, ...], filein_converted_folder: str = None, ready: bool = False):
+        """
+
+        :param filein: file to convert
+        :param identity: (st_dev, st_ino, st_size, st_mtime_ns) of the file at admission, None if unknown
+        :param profile_id: id of the conversion formats in the FormatRegistry
+        :param fileouts: output file of each conversion format
+        :param filein_converted_folder: directory where the converted file is moved, "" to delete it, None to leave it
+        :param ready: True if the file is known to be completely written
+        """
+        for name, value in zip(Job.__slots__, (filein, identity, profile_id, tuple(fileouts),
+                                               filein_converted_folder, ready)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self) -> tuple:
+        # positional arguments only: no attribute names in the pickle
+        return Job, tuple(getattr(self, name) for name in Job.__slots__)
+
+    @classmethod
+    def identity_of(cls, filein: str) -> Optional[Tuple[int, int, int, int]]:
+        """
+        :param filein: file
+        :return: (st_dev, st_ino, st_size, st_mtime_ns), None if the file can not be read
+        """
+        try:
+            stat = os.stat(filein)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def __repr__(self) -> str:
+        return f"Job({self.filein!r}, profile={self.profile_id}, outputs={list(self.fileouts)}, ready={self.ready})"
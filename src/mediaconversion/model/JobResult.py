@@ -0,0 +1,44 @@
+from mediaconversion.model.MediaInfo import MediaInfo
+
+
+class JobResult(object):
+    """
+    Outcome of a conversion job, as returned by the worker.
+    Compact and immutable like Job: the status of the job, how each output has been
+     made (stream copy or transcoding), the number of probes run for it and the resource
+     usage (CPU time, peak memory) of its processes, None if not accounted.
+    """
+
+    __slots__ = ("status", "streams", "probe_count", "usage")
+
+    def __init__(self, status: MediaInfo.Status, streams: list = None, probe_count: int = 0, usage: object = None):
+        """
+
+        :param status: final status of the job
+        :param streams: one dict for each output: stream type -> 'copy' or 'transcode'
+        :param probe_count: number of probes run for the job
+        :param usage: resource usage of the processes run for the job, None if not accounted
+        """
+        for name, value in zip(JobResult.__slots__, (status, streams or [], probe_count, usage)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self) -> tuple:
+        # positional arguments only: no attribute names in the pickle
+        return JobResult, tuple(getattr(self, name) for name in JobResult.__slots__)
+
+    @classmethod
+    def of(cls, media_info: MediaInfo) -> "JobResult":
+        """
+        :param media_info: job state in the worker, once the job is over
+        :return: outcome of the job
+        """
+        return cls(media_info.status, media_info.streams, media_info.probe_count, media_info.usage)
+
+    def __repr__(self) -> str:
+        return f"JobResult({self.status}, streams={self.streams}, probes={self.probe_count}, usage={self.usage!r})"
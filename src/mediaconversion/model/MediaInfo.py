@@ -1,45 +1,121 @@
+from enum import Enum
+
+from mediaconversion.model.Job import Job
+
+
 class MediaInfo(object):
     """
-
+    State of a conversion job in the worker.
+    A job has one output or several renditions of the same source, each
+     with its own output file and conversion format.
     """
 
-    def __init__(self, filein: str, filein_converted_folder: str,
-                 fileout: str, out_format: dict):
+    class Status(Enum):
+        PENDING = "pending"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+        STALLED = "stalled"
+
+    def __init__(self, job: Job, out_formats: list):
+        """
+
+        :param job: job admitted to the worker
+        :param out_formats: conversion formats of the job, one for each output file
+        """
         super().__init__()
 
-        self.__filein = filein
-        self.__filein_converted_folder = filein_converted_folder
-        self.__fileout = fileout
-        self.__out_format = out_format
+        self.__filein = job.filein
+        self.__identity = job.identity
+        self.__filein_converted_folder = job.filein_converted_folder
+        # owned by the job: the strategy replaces formats in it (e.g. with stream copy), interned ones are left untouched
+        self.__outputs = list(zip(job.fileouts, out_formats))
+        # probing result shared by every step of the job
+        self.__probe = None
+        self.__probe_count = 0
+        # one dict for each output: stream type -> 'copy' or 'transcode'
+        self.__streams = []
+        self.__status = MediaInfo.Status.PENDING
+        # True if the input file is known to be completely written
+        self.__ready = job.ready
+        # ffmpeg threads granted to the job when it starts, None to let ffmpeg decide
+        self.__threads = None
+        # resource usage of the processes run for the job, None if not accounted
+        self.__usage = None
 
     @property
     def filein(self) -> str:
         return self.__filein
 
-    @filein.setter
-    def filein(self, value: str) -> None:
-        self.__filein = value
+    @property
+    def identity(self) -> tuple:
+        """
+        :return: (st_dev, st_ino, st_size, st_mtime_ns) of the input file at admission, None if unknown
+        """
+        return self.__identity
 
     @property
     def filein_converted_folder(self) -> str:
         return self.__filein_converted_folder
 
-    @filein_converted_folder.setter
-    def filein_converted_folder(self, value: str) -> None:
-        self.__filein_converted_folder = value
+    @property
+    def outputs(self) -> list:
+        """
+        :return: list of (fileout, out_format) tuples, updated in place by the strategy
+        """
+        return self.__outputs
+
+    @property
+    def probe(self) -> object:
+        return self.__probe
+
+    @probe.setter
+    def probe(self, value: object) -> None:
+        self.__probe = value
+
+    @property
+    def probe_count(self) -> int:
+        return self.__probe_count
+
+    @probe_count.setter
+    def probe_count(self, value: int) -> None:
+        self.__probe_count = value
+
+    @property
+    def streams(self) -> list:
+        return self.__streams
+
+    @streams.setter
+    def streams(self, value: list) -> None:
+        self.__streams = value
+
+    @property
+    def status(self) -> "MediaInfo.Status":
+        return self.__status
+
+    @status.setter
+    def status(self, value: "MediaInfo.Status") -> None:
+        self.__status = value
+
+    @property
+    def ready(self) -> bool:
+        return self.__ready
+
+    @ready.setter
+    def ready(self, value: bool) -> None:
+        self.__ready = value
 
     @property
-    def fileout(self) -> str:
-        return self.__fileout
+    def threads(self) -> int:
+        return self.__threads
 
-    @fileout.setter
-    def fileout(self, value: str) -> None:
-        self.__fileout = value
+    @threads.setter
+    def threads(self, value: int) -> None:
+        self.__threads = value
 
     @property
-    def out_format(self) -> dict:
-        return self.__out_format
+    def usage(self) -> object:
+        return self.__usage
 
-    @out_format.setter
-    def out_format(self, value: dict) -> None:
-        self.__out_format = value
+    @usage.setter
+    def usage(self, value: object) -> None:
+        self.__usage = value
@@ -1,3 +1,6 @@
 from mediaconversion.model.MediaInfo import MediaInfo
+from mediaconversion.model.Job import Job
+from mediaconversion.model.JobResult import JobResult
+from mediaconversion.model.FormatRegistry import FormatRegistry
 
-__all__ = ["MediaInfo"]
+__all__ = ["MediaInfo", "Job", "JobResult", "FormatRegistry"]
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+from util import LogManager
+
+
+class BacklogScanner(threading.Thread):
+    """
+    Startup reconciliation of files already present in a watched directory,
+     e.g. dropped while the daemon was down.
+    Files whose outputs already exist are skipped; the others are submitted,
+     smallest first, like files reported by the observer: the admission queue
+     coalesces, orders and throttles them, spilling to disk a backlog larger
+     than its high watermark.
+    """
+
+    __LOG = None
+
+    def __init__(self, event_handler, directory: str, recursive: bool = False, quiet_period: float = 0):
+        """
+
+        :param event_handler: handler exposing is_converted(path) and submit(path, ready)
+        :param directory: directory to scan
+        :param recursive: scan subdirectories too
+        :param quiet_period: files modified within this many seconds may still be written,
+         so workers wait for them to be complete
+        """
+        super().__init__(name="BacklogScanner", daemon=True)
+
+        BacklogScanner.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__event_handler = event_handler
+        self.__directory = directory
+        self.__recursive = recursive
+        self.__quiet_period = quiet_period
+        self.__stopped = threading.Event()
+
+    def run(self) -> None:
+        try:
+            backlog = self.__scan()
+        except OSError as e:
+            BacklogScanner.__LOG.error(f"[BACKLOG] can not scan '{self.__directory}': {e}")
+            return
+        BacklogScanner.__LOG.info(f"[BACKLOG] '{self.__directory}': {len(backlog)} files to convert")
+
+        # cheapest first: the size of the file is a good enough estimate of the conversion cost
+        backlog.sort()
+        for _, mtime, path in backlog:
+            if self.__stopped.is_set():
+                return
+            self.__event_handler.submit(path, ready=time.time() - mtime >= self.__quiet_period)
+        BacklogScanner.__LOG.debug(f"[BACKLOG] '{self.__directory}': {len(backlog)} files submitted")
+
+    def __scan(self) -> list:
+        """
+        :return: list of (size, mtime, path) of files not converted yet
+        """
+        backlog = []
+        directories = [self.__directory]
+        while directories:
+            with os.scandir(directories.pop()) as iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.__recursive:
+                                directories.append(entry.path)
+                        elif entry.is_file() and not self.__event_handler.is_converted(entry.path):
+                            stat = entry.stat()
+                            backlog.append((stat.st_size, stat.st_mtime, entry.path))
+                    except OSError:
+                        continue
+        return backlog
+
+    def stop(self) -> None:
+        self.__stopped.set()
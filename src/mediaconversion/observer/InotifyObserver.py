@@ -0,0 +1,169 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import selectors
+import struct
+import sys
+import threading
+
+from util import LogManager
+
+
+class InotifyObserver(threading.Thread):
+    """
+    Linux only observer which reports a file once it is complete, instead of when it appears.
+    Files are submitted to the event handler when the writer closes them (IN_CLOSE_WRITE)
+     or when they are renamed into a watched directory (IN_MOVED_TO), so jobs are marked
+     ready and workers do not have to wait for the file size to settle.
+    Exposes the subset of watchdog's observer interface used by MediaObserver.
+    """
+
+    __LOG = None
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    IN_NONBLOCK = 0o0004000
+
+    EVENT_HEADER = struct.Struct("iIII")
+    READ_SIZE = 65536
+
+    __LIBC = None
+
+    def __init__(self, timeout: float = None):
+        """
+
+        :param timeout: unused, kept for compatibility with watchdog's observers
+        :raise OSError: if inotify is not available
+        """
+        super().__init__(name="InotifyObserver", daemon=True)
+
+        InotifyObserver.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        libc = InotifyObserver.__libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not supported on this platform")
+
+        self.__fd = libc.inotify_init1(InotifyObserver.IN_NONBLOCK | InotifyObserver.IN_CLOEXEC)
+        if self.__fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, f"inotify_init1: {os.strerror(e)}")
+        self.__wake_r, self.__wake_w = os.pipe()
+        # watch descriptor -> (directory, event handler, recursive)
+        self.__watches = {}
+        self.__stopped = threading.Event()
+
+    @classmethod
+    def __libc(cls):
+        if cls.__LIBC is None and sys.platform.startswith("linux"):
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            if hasattr(libc, "inotify_init1"):
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                cls.__LIBC = libc
+        return cls.__LIBC
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        return cls.__libc() is not None
+
+    def schedule(self, event_handler, path: str, recursive: bool = False) -> None:
+        """
+        :param event_handler: handler whose submit(path, ready) is called for each complete file
+        :param path: directory to watch
+        :param recursive: watch subdirectories too, including the ones created later
+        :raise OSError: if the directory can not be watched
+        """
+        self.__add_watch(event_handler, path, recursive)
+        if recursive:
+            for root, dirs, _ in os.walk(path):
+                for d in dirs:
+                    self.__add_watch(event_handler, os.path.join(root, d), recursive)
+
+    def __add_watch(self, event_handler, path: str, recursive: bool) -> None:
+        mask = InotifyObserver.IN_CLOSE_WRITE | InotifyObserver.IN_MOVED_TO | InotifyObserver.IN_ONLYDIR
+        if recursive:
+            mask |= InotifyObserver.IN_CREATE
+        wd = InotifyObserver.__libc().inotify_add_watch(self.__fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, f"inotify_add_watch: {os.strerror(e)}", path)
+        self.__watches[wd] = (path, event_handler, recursive)
+
+    def unschedule_all(self) -> None:
+        # watches are released with the inotify descriptor, on stop
+        self.__watches.clear()
+
+    def run(self) -> None:
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.__fd, selectors.EVENT_READ)
+            selector.register(self.__wake_r, selectors.EVENT_READ)
+            while not self.__stopped.is_set():
+                for key, _ in selector.select():
+                    if key.fd == self.__fd:
+                        self.__read_events()
+
+        os.close(self.__fd)
+        os.close(self.__wake_r)
+        os.close(self.__wake_w)
+
+    def __read_events(self) -> None:
+        try:
+            buffer = os.read(self.__fd, InotifyObserver.READ_SIZE)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = InotifyObserver.EVENT_HEADER.unpack_from(buffer, offset)
+            offset += InotifyObserver.EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & InotifyObserver.IN_Q_OVERFLOW:
+                InotifyObserver.__LOG.warning("[INOTIFY] event queue overflow: some files may have been missed")
+                continue
+            if mask & InotifyObserver.IN_IGNORED:
+                watch = self.__watches.pop(wd, None)
+                if watch is not None:
+                    InotifyObserver.__LOG.debug(f"[INOTIFY] '{watch[0]}' is not watched anymore")
+                continue
+            watch = self.__watches.get(wd)
+            if watch is None:
+                continue
+
+            directory, event_handler, recursive = watch
+            path = os.path.join(directory, name)
+            if mask & InotifyObserver.IN_ISDIR:
+                if recursive:
+                    self.__watch_new_directory(event_handler, path)
+            elif mask & (InotifyObserver.IN_CLOSE_WRITE | InotifyObserver.IN_MOVED_TO):
+                try:
+                    event_handler.submit(path, ready=True)
+                except Exception as e:
+                    InotifyObserver.__LOG.error(f"[INOTIFY] error submitting '{path}': {e}")
+                    InotifyObserver.__LOG.debug(f"{e}", exc_info=True)
+
+    def __watch_new_directory(self, event_handler, path: str) -> None:
+        try:
+            self.schedule(event_handler, path, True)
+        except OSError as e:
+            InotifyObserver.__LOG.warning(f"[INOTIFY] can not watch '{path}': {e}")
+            return
+
+        # files written before the watch was added are not reported: they are submitted
+        #  as not ready, so the worker waits until they are complete
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    event_handler.submit(os.path.join(root, name), ready=False)
+                except Exception as e:
+                    InotifyObserver.__LOG.error(f"[INOTIFY] error submitting '{name}': {e}")
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        os.write(self.__wake_w, b"\0")
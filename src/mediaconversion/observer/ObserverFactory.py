@@ -0,0 +1,41 @@
+from enum import Enum
+
+from watchdog.observers import Observer
+
+from mediaconversion.observer.InotifyObserver import InotifyObserver
+from mediaconversion.observer.ScandirObserver import ScandirObserver
+
+
+class ObserverFactory(object):
+
+    class Observers(Enum):
+        # inotify when supported, watchdog otherwise
+        AUTO = "auto"
+        INOTIFY = "inotify"
+        WATCHDOG = "watchdog"
+        # scandir based, for network shares
+        POLLING = "polling"
+
+    @classmethod
+    def get_type(cls, observer: Observers, timeout: float,
+                 quiet_period: float = ScandirObserver.DEFAULT_QUIET_PERIOD) -> object:
+        """
+        :param observer: kind of observer
+        :param timeout: polling timeout (seconds) of watchdog's and polling observers
+        :param quiet_period: seconds a file must stay unchanged before being submitted by the polling observer
+        :return: an object exposing schedule(), start(), stop(), join() and unschedule_all()
+        """
+        if observer is None:
+            raise ValueError
+
+        if observer == cls.Observers.AUTO:
+            observer = cls.Observers.INOTIFY if InotifyObserver.is_supported() else cls.Observers.WATCHDOG
+
+        if observer == cls.Observers.INOTIFY:
+            return InotifyObserver(timeout)
+        elif observer == cls.Observers.WATCHDOG:
+            return Observer(timeout=timeout)
+        elif observer == cls.Observers.POLLING:
+            return ScandirObserver(timeout, quiet_period)
+        else:
+            raise NotImplementedError
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+
+from util import LogManager
+
+
+class ScandirObserver(threading.Thread):
+    """
+    Polling observer for network shares (SMB, NFS), where file system events of
+     remote writers are not delivered.
+    An in-memory index of the entries of each watched directory is kept; a directory
+     is listed again (os.scandir) only when its mtime changes, that is when entries
+     are added, removed or renamed, plus a periodic full scan as a safety net for
+     coarse timestamps and attribute caching.
+    New files are tracked until they stay unchanged (size and mtime) for the quiet
+     period; they are checked with an exponential backoff and then submitted as ready.
+    Exposes the subset of watchdog's observer interface used by MediaObserver.
+    """
+
+    __LOG = None
+
+    DEFAULT_INTERVAL = 1
+    DEFAULT_QUIET_PERIOD = 5
+    FULL_SCAN_INTERVAL = 60
+
+    class Directory(object):
+
+        __slots__ = ('path', 'event_handler', 'recursive', 'mtime_ns', 'entries')
+
+        def __init__(self, path: str, event_handler, recursive: bool):
+            super().__init__()
+
+            self.path = path
+            self.event_handler = event_handler
+            self.recursive = recursive
+            self.mtime_ns = None
+            # name -> (size, mtime_ns) of files; None for directories
+            self.entries = {}
+
+    class Pending(object):
+
+        __slots__ = ('event_handler', 'signature', 'stable_since', 'backoff', 'next_check')
+
+        def __init__(self, event_handler, signature: tuple, now: float, backoff: float):
+            super().__init__()
+
+            self.event_handler = event_handler
+            self.signature = signature
+            self.stable_since = now
+            self.backoff = backoff
+            self.next_check = now + backoff
+
+    def __init__(self, timeout: float = DEFAULT_INTERVAL, quiet_period: float = DEFAULT_QUIET_PERIOD):
+        """
+
+        :param timeout: seconds between two polls
+        :param quiet_period: seconds a file must stay unchanged before being submitted
+        """
+        super().__init__(name="ScandirObserver", daemon=True)
+
+        ScandirObserver.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__interval = timeout or ScandirObserver.DEFAULT_INTERVAL
+        self.__quiet_period = quiet_period
+        # path -> Directory
+        self.__directories = {}
+        # path -> Pending
+        self.__pending = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+
+    def schedule(self, event_handler, path: str, recursive: bool = False) -> None:
+        """
+        Watch a directory; files already present are indexed, not submitted
+        :param event_handler: handler whose submit(path, ready) is called for each complete file
+        :param path: directory to watch
+        :param recursive: watch subdirectories too, including the ones created later
+        :raise OSError: if the directory can not be read
+        """
+        with self.__lock:
+            self.__add_directory(event_handler, path, recursive, False)
+
+    def __add_directory(self, event_handler, path: str, recursive: bool, track: bool) -> None:
+        directory = ScandirObserver.Directory(path, event_handler, recursive)
+        self.__directories[path] = directory
+        self.__scan(directory, time.monotonic(), track)
+
+    def unschedule_all(self) -> None:
+        with self.__lock:
+            self.__directories.clear()
+            self.__pending.clear()
+
+    def run(self) -> None:
+        last_full_scan = time.monotonic()
+        while not self.__stopped.wait(self.__interval):
+            now = time.monotonic()
+            full_scan = now - last_full_scan >= ScandirObserver.FULL_SCAN_INTERVAL
+            if full_scan:
+                last_full_scan = now
+            try:
+                with self.__lock:
+                    ready = self.__poll(now, full_scan)
+            except Exception as e:
+                ScandirObserver.__LOG.error(f"[POLLING] {e}")
+                ScandirObserver.__LOG.debug(f"{e}", exc_info=True)
+                continue
+
+            for path, event_handler in ready:
+                try:
+                    event_handler.submit(path, ready=True)
+                except Exception as e:
+                    ScandirObserver.__LOG.error(f"[POLLING] error submitting '{path}': {e}")
+                    ScandirObserver.__LOG.debug(f"{e}", exc_info=True)
+
+    def __poll(self, now: float, full_scan: bool) -> list:
+        """
+        :return: list of (path, event handler) of files which became stable
+        """
+        for directory in list(self.__directories.values()):
+            try:
+                mtime_ns = os.stat(directory.path).st_mtime_ns
+            except OSError:
+                ScandirObserver.__LOG.debug(f"[POLLING] '{directory.path}' is not watched anymore")
+                self.__remove_directory(directory.path)
+                continue
+            if full_scan or mtime_ns != directory.mtime_ns:
+                self.__scan(directory, now, True)
+
+        ready = []
+        for path, pending in list(self.__pending.items()):
+            if now < pending.next_check:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.__pending[path]
+                continue
+
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != pending.signature:
+                # still being written: check again soon
+                pending.signature = signature
+                pending.stable_since = now
+                pending.backoff = self.__interval
+            elif now - pending.stable_since >= self.__quiet_period:
+                del self.__pending[path]
+                ready.append((path, pending.event_handler))
+                continue
+            else:
+                pending.backoff = min(pending.backoff * 2, self.__quiet_period)
+            pending.next_check = now + pending.backoff
+        return ready
+
+    def __scan(self, directory: "ScandirObserver.Directory", now: float, track: bool) -> None:
+        """
+        List a directory updating its index
+        :param track: True to track new files until they are stable, False to only index them
+        """
+        directory.mtime_ns = os.stat(directory.path).st_mtime_ns
+        entries = {}
+        with os.scandir(directory.path) as iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        entries[entry.name] = None
+                        if directory.recursive and entry.path not in self.__directories:
+                            self.__add_directory(directory.event_handler, entry.path, True, track)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                        if track and entry.name not in directory.entries:
+                            self.__pending[entry.path] = ScandirObserver.Pending(
+                                directory.event_handler,
+                                entries[entry.name],
+                                now,
+                                self.__interval
+                            )
+                except OSError:
+                    # removed while scanning
+                    continue
+
+        for name in directory.entries.keys() - entries.keys():
+            path = os.path.join(directory.path, name)
+            self.__pending.pop(path, None)
+            if directory.entries[name] is None:
+                self.__remove_directory(path)
+        directory.entries = entries
+
+    def __remove_directory(self, path: str) -> None:
+        prefix = os.path.join(path, "")
+        for watched in [d for d in self.__directories if d == path or d.startswith(prefix)]:
+            del self.__directories[watched]
+        for pending in [p for p in self.__pending if p.startswith(prefix)]:
+            del self.__pending[pending]
+
+    def stop(self) -> None:
+        self.__stopped.set()
@@ -0,0 +1,6 @@
+from mediaconversion.observer.BacklogScanner import BacklogScanner
+from mediaconversion.observer.InotifyObserver import InotifyObserver
+from mediaconversion.observer.ScandirObserver import ScandirObserver
+from mediaconversion.observer.ObserverFactory import ObserverFactory
+
+__all__ = ["BacklogScanner", "InotifyObserver", "ScandirObserver", "ObserverFactory"]
@@ -0,0 +1,25 @@
+from abc import abstractmethod
+
+from mediaconversion.progress.ProgressReport import ProgressReport
+
+
+class IProgressSink(object):
+    """
+    Consumer of the progress reports collected by ProgressMonitor
+    """
+
+    @abstractmethod
+    def update(self, report: ProgressReport) -> None:
+        """
+        Called, from the monitor thread, for each report of a running job
+        :param report: latest report of the job
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish(self, report: ProgressReport) -> None:
+        """
+        Called, from the monitor thread, when a job terminates (successfully or not)
+        :param report: last report of the job
+        """
+        raise NotImplementedError
@@ -0,0 +1,22 @@
+from mediaconversion.progress.IProgressSink import IProgressSink
+from mediaconversion.progress.ProgressReport import ProgressReport
+from util import LogManager
+
+
+class LoggingProgressSink(IProgressSink):
+    """
+    Write progress of running jobs to the observer log
+    """
+
+    __LOG = None
+
+    def __init__(self):
+        super().__init__()
+
+        LoggingProgressSink.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+
+    def update(self, report: ProgressReport) -> None:
+        LoggingProgressSink.__LOG.info(f"[PROGRESS] '{report.filein}': {report}")
+
+    def finish(self, report: ProgressReport) -> None:
+        LoggingProgressSink.__LOG.debug(f"[PROGRESS END] '{report.filein}': {report.elapsed:.1f}s")
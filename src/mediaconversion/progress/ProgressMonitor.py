@@ -0,0 +1,81 @@
+import queue
+import threading
+from typing import List
+
+from mediaconversion.progress.IProgressSink import IProgressSink
+from mediaconversion.progress.ProgressReport import ProgressReport
+from util import LogManager
+
+
+class ProgressMonitor(threading.Thread):
+    """
+    Parent side of progress publishing.
+    Drains the queue filled by the ProgressReporter of each worker, keeps the
+     latest report of each running job and forwards reports to the sinks.
+    """
+
+    __LOG = None
+
+    POLL_TIMEOUT = 1
+    QUEUE_SIZE = 1024
+
+    def __init__(self, progress_queue, sinks: List[IProgressSink] = None):
+        """
+
+        :param progress_queue: multiprocessing queue shared with workers
+        :param sinks: consumers of reports
+        """
+        super().__init__(name="ProgressMonitor", daemon=True)
+
+        ProgressMonitor.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__queue = progress_queue
+        self.__sinks = list(sinks or [])
+        self.__jobs = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+
+    def add_sink(self, sink: IProgressSink) -> None:
+        with self.__lock:
+            self.__sinks.append(sink)
+
+    def snapshot(self) -> List[ProgressReport]:
+        """
+        :return: latest report of each running job
+        """
+        with self.__lock:
+            return list(self.__jobs.values())
+
+    def run(self) -> None:
+        while not self.__stopped.is_set():
+            try:
+                report = self.__queue.get(timeout=ProgressMonitor.POLL_TIMEOUT)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if report is None:
+                break
+
+            with self.__lock:
+                if report.finished:
+                    self.__jobs.pop(report.filein, None)
+                else:
+                    self.__jobs[report.filein] = report
+                sinks = list(self.__sinks)
+
+            for sink in sinks:
+                try:
+                    if report.finished:
+                        sink.finish(report)
+                    else:
+                        sink.update(report)
+                except Exception as e:
+                    ProgressMonitor.__LOG.debug(f"[PROGRESS] sink error: {e}", exc_info=True)
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        try:
+            self.__queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self.join()
@@ -0,0 +1,57 @@
+class ProgressReport(object):
+    """
+    Snapshot of the progress of a conversion job, published by workers.
+    Kept small (slots, plain numbers) since one is pickled for each update.
+    """
+
+    __slots__ = ('filein', 'pid', 'percent', 'out_time', 'duration', 'fps', 'speed', 'eta', 'elapsed', 'finished')
+
+    def __init__(self, filein: str, pid: int, percent: int = 0, out_time: float = None, duration: float = None,
+                 fps: float = None, speed: float = None, eta: float = None, elapsed: float = 0.0,
+                 finished: bool = False):
+        """
+
+        :param filein: converted file, identifies the job
+        :param pid: worker process running the job
+        :param percent: completion percentage
+        :param out_time: media time (seconds) already converted
+        :param duration: media duration (seconds)
+        :param fps: encoding frames per second
+        :param speed: encoding speed relative to realtime
+        :param eta: estimated seconds to completion, None if unknown
+        :param elapsed: seconds since the conversion started
+        :param finished: True for the last report of the job
+        """
+        super().__init__()
+
+        self.filein = filein
+        self.pid = pid
+        self.percent = percent
+        self.out_time = out_time
+        self.duration = duration
+        self.fps = fps
+        self.speed = speed
+        self.eta = eta
+        self.elapsed = elapsed
+        self.finished = finished
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in ProgressReport.__slots__)
+
+    def __setstate__(self, state: tuple) -> None:
+        for name, value in zip(ProgressReport.__slots__, state):
+            setattr(self, name, value)
+
+    def __str__(self):
+        fields = [f"{self.percent}%"]
+        if self.out_time is not None:
+            fields.append(f"time {self.out_time:.1f}s")
+        if self.fps is not None:
+            fields.append(f"fps {self.fps:.1f}")
+        if self.speed is not None:
+            fields.append(f"speed {self.speed:.2f}x")
+        if self.eta is not None:
+            fields.append(f"eta {self.eta:.0f}s")
+        fields.append(f"elapsed {self.elapsed:.0f}s")
+        fields.append(f"pid {self.pid}")
+        return ", ".join(fields)
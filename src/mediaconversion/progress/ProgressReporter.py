@@ -0,0 +1,100 @@
+import os
+import queue
+import time
+from typing import Optional
+
+from converter.ffmpeg import FFMpegProgress
+
+from mediaconversion.progress.ProgressReport import ProgressReport
+
+
+class ProgressReporter(object):
+    """
+    Worker side of progress publishing.
+    One instance is installed in each worker process by the pool initializer;
+     reports are sent to the parent through a multiprocessing queue, at most
+     one every interval seconds for each job. Reports never block the
+     conversion: when the queue is full they are dropped.
+    """
+
+    __INSTANCE = None
+
+    DEFAULT_INTERVAL = 5
+
+    def __init__(self, progress_queue, interval: float = DEFAULT_INTERVAL):
+        """
+
+        :param progress_queue: multiprocessing queue read by ProgressMonitor
+        :param interval: minimum seconds between two reports of the same job
+        """
+        super().__init__()
+
+        self.__queue = progress_queue
+        self.__interval = interval
+        self.__pid = os.getpid()
+        # filein -> (start time, last report time)
+        self.__jobs = {}
+
+    @classmethod
+    def install(cls, progress_queue, interval: float = DEFAULT_INTERVAL) -> "ProgressReporter":
+        """
+        Set the reporter of the current process
+        :param progress_queue: multiprocessing queue read by ProgressMonitor
+        :param interval: minimum seconds between two reports of the same job
+        :return: installed reporter
+        """
+        cls.__INSTANCE = ProgressReporter(progress_queue, interval)
+        return cls.__INSTANCE
+
+    @classmethod
+    def get_instance(cls) -> Optional["ProgressReporter"]:
+        """
+        :return: reporter of the current process, None if progress is not published
+        """
+        return cls.__INSTANCE
+
+    def update(self, filein: str, progress: object, duration: float = None) -> None:
+        """
+        :param filein: converted file
+        :param progress: FFMpegProgress (with percent set) or bare completion percentage
+        :param duration: media duration (seconds), used to estimate remaining time
+        """
+        now = time.monotonic()
+        start, last = self.__jobs.setdefault(filein, (now, None))
+        if last is not None and now - last < self.__interval:
+            return
+        self.__jobs[filein] = (start, now)
+
+        elapsed = now - start
+        if isinstance(progress, FFMpegProgress):
+            report = ProgressReport(
+                filein, self.__pid, progress.percent, progress.out_time, duration,
+                progress.fps, progress.speed, elapsed=elapsed
+            )
+        else:
+            report = ProgressReport(filein, self.__pid, int(progress), duration=duration, elapsed=elapsed)
+        report.eta = ProgressReporter.__eta(report)
+        self.__put(report)
+
+    def finish(self, filein: str) -> None:
+        """
+        Publish the last report of a job
+        :param filein: converted file
+        """
+        start, _ = self.__jobs.pop(filein, (time.monotonic(), None))
+        self.__put(ProgressReport(filein, self.__pid, elapsed=time.monotonic() - start, finished=True))
+
+    def __put(self, report: ProgressReport) -> None:
+        try:
+            self.__queue.put_nowait(report)
+        except queue.Full:
+            pass
+
+    @staticmethod
+    def __eta(report: ProgressReport) -> Optional[float]:
+        # ffmpeg speed is the most accurate estimate; overall rate is used otherwise (e.g. segmented encoding)
+        if report.speed and report.duration is not None and report.out_time is not None:
+            return max(report.duration - report.out_time, 0.0) / report.speed
+        if 0 < report.percent < 100:
+            return report.elapsed * (100 - report.percent) / report.percent
+        return None
@@ -0,0 +1,7 @@
+from mediaconversion.progress.ProgressReport import ProgressReport
+from mediaconversion.progress.ProgressReporter import ProgressReporter
+from mediaconversion.progress.IProgressSink import IProgressSink
+from mediaconversion.progress.LoggingProgressSink import LoggingProgressSink
+from mediaconversion.progress.ProgressMonitor import ProgressMonitor
+
+__all__ = ["ProgressReport", "ProgressReporter", "IProgressSink", "LoggingProgressSink", "ProgressMonitor"]
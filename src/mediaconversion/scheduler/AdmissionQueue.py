@@ -0,0 +1,280 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from mediaconversion.scheduler.CostScheduler import CostScheduler
+from util import LogManager
+
+
+class AdmissionQueue(threading.Thread):
+    """
+    Bounded queue between file system events and the worker pool.
+    Events are only recorded by the observer threads; a dispatcher thread admits
+     them to the pool in batches, keeping at most max_inflight jobs submitted.
+    Events for a file already queued are coalesced. Up to high watermark files are
+     queued in memory; beyond that, files are appended to a spill file on disk,
+     read back once the memory queue drains below the low watermark, so that the
+     order of arrival is kept.
+    Files are admitted in order of arrival or, when a CostScheduler is given, in
+     order of estimated cost, as soon as their cost is known.
+    Queued files are not persisted across restarts: the startup backlog scan finds them again.
+    """
+
+    __LOG = None
+
+    DEFAULT_HIGH_WATERMARK = 1000
+    DEFAULT_LOW_WATERMARK = 500
+    # events of a burst arriving within this delay are admitted together
+    BATCH_DELAY = 0.1
+    METRICS_INTERVAL = 60
+
+    def __init__(self, admit: Callable[[str, bool], Optional[Future]], max_inflight: int,
+                 high_watermark: int = DEFAULT_HIGH_WATERMARK, low_watermark: int = DEFAULT_LOW_WATERMARK,
+                 spill_dir: str = None, scheduler: CostScheduler = None):
+        """
+
+        :param admit: function submitting the conversion of (file, ready) to the pool,
+         returning its future or None if the file has not been submitted
+        :param max_inflight: maximum number of jobs submitted and not yet completed
+        :param high_watermark: maximum number of files queued in memory
+        :param low_watermark: number of files queued in memory below which spilled files are read back
+        :param spill_dir: directory of the spill file
+        :param scheduler: scheduler choosing the order of admission, None for order of arrival
+        """
+        super().__init__(name="AdmissionQueue", daemon=True)
+
+        AdmissionQueue.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__admit = admit
+        self.__max_inflight = max_inflight
+        self.__high_watermark = high_watermark
+        self.__low_watermark = min(low_watermark, high_watermark)
+        self.__spill_dir = spill_dir
+        self.__scheduler = scheduler
+
+        # filein -> (ready, enqueue time)
+        self.__queue = OrderedDict()
+        # filein -> future of CostScheduler.Estimate, for queued files
+        self.__estimates = {}
+        self.__running_long = 0
+        self.__spill_file = None
+        self.__spill_offset = 0
+        self.__spilled = 0
+        self.__inflight = 0
+        self.__condition = threading.Condition()
+        self.__stopped = False
+
+        # metrics
+        self.__coalesced = 0
+        self.__admitted = 0
+        self.__dequeued = 0
+        self.__wait_total = 0.0
+        self.__wait_max = 0.0
+        self.__depth_max = 0
+
+    @property
+    def max_inflight(self) -> int:
+        return self.__max_inflight
+
+    @max_inflight.setter
+    def max_inflight(self, value: int) -> None:
+        """
+        Change the number of jobs submitted at once, e.g. to adapt concurrency to the load
+        """
+        with self.__condition:
+            self.__max_inflight = value
+            if self.__scheduler is not None:
+                self.__scheduler.slots = value
+            self.__condition.notify()
+
+    def offer(self, filein: str, ready: bool = False) -> None:
+        """
+        Queue a file, without blocking the caller
+        :param filein: file to convert
+        :param ready: True if the file is known to be complete
+        """
+        with self.__condition:
+            entry = self.__queue.get(filein)
+            if entry is not None:
+                self.__coalesce(filein, entry, ready)
+                return
+
+            # once spilling, files go to disk until it is drained, to keep the order
+            if self.__spilled > 0 or len(self.__queue) >= self.__high_watermark:
+                self.__spill(filein, ready)
+            else:
+                self.__enqueue(filein, ready, time.monotonic())
+            self.__depth_max = max(self.__depth_max, self.__depth())
+            self.__condition.notify()
+
+    def __enqueue(self, filein: str, ready: bool, enqueued: float) -> None:
+        self.__queue[filein] = (ready, enqueued)
+        if self.__scheduler is not None:
+            self.__estimate(filein)
+
+    def __coalesce(self, filein: str, entry: tuple, ready: bool) -> None:
+        self.__queue[filein] = (entry[0] or ready, entry[1])
+        self.__coalesced += 1
+        # the file is complete now, so its cost is estimated again from its whole duration
+        if self.__scheduler is not None and ready and not entry[0]:
+            self.__estimate(filein)
+
+    def __estimate(self, filein: str) -> None:
+        estimate = self.__scheduler.estimate(filein)
+        self.__estimates[filein] = estimate
+        estimate.add_done_callback(lambda _: self.__notify())
+
+    def __notify(self) -> None:
+        with self.__condition:
+            self.__condition.notify()
+
+    def __depth(self) -> int:
+        return len(self.__queue) + self.__spilled
+
+    def __spill(self, filein: str, ready: bool) -> None:
+        if self.__spill_file is None:
+            self.__spill_file = tempfile.TemporaryFile("w+", prefix="admission.", dir=self.__spill_dir)
+        self.__spill_file.seek(0, os.SEEK_END)
+        self.__spill_file.write(json.dumps([filein, ready, time.monotonic()]) + "\n")
+        self.__spilled += 1
+
+    def __refill(self) -> None:
+        self.__spill_file.seek(self.__spill_offset)
+        while self.__spilled > 0 and len(self.__queue) < self.__high_watermark:
+            filein, ready, enqueued = json.loads(self.__spill_file.readline())
+            self.__spilled -= 1
+            entry = self.__queue.get(filein)
+            if entry is not None:
+                self.__coalesce(filein, entry, ready)
+            else:
+                self.__enqueue(filein, ready, enqueued)
+        self.__spill_offset = self.__spill_file.tell()
+
+        if self.__spilled == 0:
+            self.__spill_file.seek(0)
+            self.__spill_file.truncate()
+            self.__spill_offset = 0
+
+    def run(self) -> None:
+        last_metrics = time.monotonic()
+        while True:
+            with self.__condition:
+                batch = []
+                while not self.__stopped:
+                    if time.monotonic() - last_metrics >= AdmissionQueue.METRICS_INTERVAL:
+                        last_metrics = time.monotonic()
+                        self.__log_metrics()
+
+                    if self.__spilled > 0 and len(self.__queue) <= self.__low_watermark:
+                        self.__refill()
+
+                    if self.__queue and self.__inflight < self.__max_inflight:
+                        # let a burst of events settle, so that they are coalesced
+                        _, (_, oldest) = next(iter(self.__queue.items()))
+                        delay = oldest + AdmissionQueue.BATCH_DELAY - time.monotonic()
+                        if delay > 0:
+                            self.__condition.wait(delay)
+                            continue
+
+                        batch = self.__next_batch()
+                        if batch:
+                            break
+                    self.__condition.wait(AdmissionQueue.METRICS_INTERVAL)
+                if self.__stopped:
+                    break
+                self.__inflight += len(batch)
+
+            # submission (job creation, pickling) does not hold the lock, so observers are never blocked
+            now = time.monotonic()
+            for filein, ready, enqueued, estimate in batch:
+                self.__dequeued += 1
+                self.__wait_total += now - enqueued
+                self.__wait_max = max(self.__wait_max, now - enqueued)
+                long = estimate is not None and not estimate.short
+                try:
+                    future = self.__admit(filein, ready)
+                except Exception as e:
+                    AdmissionQueue.__LOG.error(f"[ADMISSION] error submitting '{filein}': {e}")
+                    AdmissionQueue.__LOG.debug(f"{e}", exc_info=True)
+                    future = None
+
+                if future is None:
+                    self.__release(long)
+                else:
+                    self.__admitted += 1
+                    future.add_done_callback(lambda _, long=long: self.__release(long))
+
+    def __next_batch(self) -> list:
+        """
+        Dequeue files which can be admitted now, while there is room
+        :return: list of (file, ready, enqueue time, estimate or None)
+        """
+        batch = []
+        if self.__scheduler is None:
+            while self.__queue and self.__inflight + len(batch) < self.__max_inflight:
+                filein, (ready, enqueued) = self.__queue.popitem(last=False)
+                batch.append((filein, ready, enqueued, None))
+            return batch
+
+        while self.__inflight + len(batch) < self.__max_inflight:
+            candidates = (
+                (filein, self.__estimates[filein].result(), enqueued)
+                for filein, (_, enqueued) in self.__queue.items()
+                if self.__estimates[filein].done()
+            )
+            filein = self.__scheduler.select(candidates, self.__running_long)
+            if filein is None:
+                break
+            ready, enqueued = self.__queue.pop(filein)
+            estimate = self.__estimates.pop(filein).result()
+            if not estimate.short:
+                self.__running_long += 1
+            batch.append((filein, ready, enqueued, estimate))
+        return batch
+
+    def __release(self, long: bool = False) -> None:
+        with self.__condition:
+            self.__inflight -= 1
+            if long:
+                self.__running_long -= 1
+            self.__condition.notify()
+
+    @property
+    def metrics(self) -> dict:
+        """
+        :return: queue depth (memory and spilled), jobs in flight, coalesced events and admission wait times
+        """
+        with self.__condition:
+            return {
+                'queued': len(self.__queue),
+                'spilled': self.__spilled,
+                'depth_max': self.__depth_max,
+                'inflight': self.__inflight,
+                'running_long': self.__running_long,
+                'coalesced': self.__coalesced,
+                'admitted': self.__admitted,
+                'wait_avg': self.__wait_total / self.__dequeued if self.__dequeued else 0.0,
+                'wait_max': self.__wait_max
+            }
+
+    def __log_metrics(self) -> None:
+        if self.__dequeued or self.__depth():
+            AdmissionQueue.__LOG.info(
+                f"[ADMISSION] queued: {len(self.__queue)}, spilled: {self.__spilled}, inflight: {self.__inflight}, "
+                f"coalesced: {self.__coalesced}, admitted: {self.__admitted}, "
+                f"wait avg: {self.__wait_total / max(self.__dequeued, 1):.2f}s, wait max: {self.__wait_max:.2f}s"
+            )
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify_all()
+        self.join()
+        if self.__scheduler is not None:
+            self.__scheduler.shutdown()
+        if self.__spill_file is not None:
+            self.__spill_file.close()
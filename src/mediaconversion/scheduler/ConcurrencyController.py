@@ -0,0 +1,176 @@
+import os
+import threading
+from typing import Optional
+
+from mediaconversion.progress import ProgressMonitor
+from mediaconversion.scheduler.AdmissionQueue import AdmissionQueue
+from mediaconversion.scheduler.ThreadBudget import ThreadBudget
+from util import LogManager
+
+
+class ConcurrencyController(threading.Thread):
+    """
+    Adapt the number of concurrent conversions, within bounds, to the load of the host.
+    Every interval the controller samples CPU utilization and run queue length
+     (/proc/stat on Linux, load average elsewhere) and the aggregate encoding speed
+     of running jobs (sum of ffmpeg speed factors, i.e. media seconds encoded per
+     wall-clock second, from progress reports) and then:
+      - removes a slot if the host is oversubscribed (run queue longer than the cores);
+      - adds a slot if CPU is underused and jobs are waiting;
+      - otherwise takes back the last added slot if throughput did not improve,
+         holding further increases for a while.
+    """
+
+    __LOG = None
+
+    DEFAULT_INTERVAL = 15
+    # runnable threads per core above which the host is oversubscribed
+    OVERLOAD = 1.5
+    # CPU utilization below which a slot is added
+    UNDERUSE = 0.75
+    # relative throughput gain an added slot must bring
+    MIN_GAIN = 0.05
+    # intervals without increases after an unprofitable one
+    HOLD = 4
+    # smoothing of run queue samples
+    ALPHA = 0.5
+
+    def __init__(self, admission_queue: AdmissionQueue, progress_monitor: Optional[ProgressMonitor],
+                 minimum: int, maximum: int, interval: float = DEFAULT_INTERVAL,
+                 thread_budget: ThreadBudget = None):
+        """
+
+        :param admission_queue: queue whose max_inflight is adapted
+        :param progress_monitor: source of encoding speed of running jobs, None if progress is not published
+        :param minimum: minimum number of concurrent conversions
+        :param maximum: maximum number of concurrent conversions (size of the worker pool)
+        :param interval: seconds between two adjustments
+        :param thread_budget: budget whose slots follow the number of concurrent conversions, None if none
+        """
+        super().__init__(name="ConcurrencyController", daemon=True)
+
+        ConcurrencyController.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__admission_queue = admission_queue
+        self.__thread_budget = thread_budget
+        self.__progress_monitor = progress_monitor
+        self.__minimum = max(minimum, 1)
+        self.__maximum = max(maximum, self.__minimum)
+        self.__interval = interval
+        self.__cores = os.cpu_count() or 1
+        self.__stopped = threading.Event()
+
+        self.__limit = min(max(self.__cores // 2, self.__minimum), self.__maximum)
+        self.__apply()
+
+        self.__cpu_times = ConcurrencyController.__read_cpu_times()
+        self.__run_queue = None
+        self.__last_step = 0
+        self.__last_throughput = None
+        self.__hold = 0
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    def run(self) -> None:
+        while not self.__stopped.wait(self.__interval):
+            try:
+                self.__adjust()
+            except Exception as e:
+                ConcurrencyController.__LOG.debug(f"[CONCURRENCY] {e}", exc_info=True)
+
+    def __adjust(self) -> None:
+        cpu, run_queue = self.__sample()
+        throughput = self.__throughput()
+        metrics = self.__admission_queue.metrics
+        waiting = metrics['queued'] + metrics['spilled']
+
+        step = 0
+        if run_queue > ConcurrencyController.OVERLOAD * self.__cores:
+            step = -1
+        elif (self.__last_step > 0 and throughput is not None and self.__last_throughput is not None
+              and throughput < self.__last_throughput * (1 + ConcurrencyController.MIN_GAIN)):
+            # the last slot added did not pay off
+            step = -1
+            self.__hold = ConcurrencyController.HOLD
+        elif self.__hold > 0:
+            self.__hold -= 1
+        elif cpu < ConcurrencyController.UNDERUSE and waiting > 0:
+            step = 1
+
+        limit = min(max(self.__limit + step, self.__minimum), self.__maximum)
+        ConcurrencyController.__LOG.debug(
+            f"[CONCURRENCY] cpu: {cpu:.2f}, run queue: {run_queue:.1f}/{self.__cores}, "
+            f"throughput: {throughput if throughput is None else round(throughput, 2)}, waiting: {waiting}, "
+            f"limit: {self.__limit} -> {limit}"
+        )
+        self.__last_step = limit - self.__limit
+        self.__last_throughput = throughput
+        if limit != self.__limit:
+            ConcurrencyController.__LOG.info(f"[CONCURRENCY] concurrent conversions: {self.__limit} -> {limit}")
+            self.__limit = limit
+            self.__apply()
+
+    def __apply(self) -> None:
+        self.__admission_queue.max_inflight = self.__limit
+        if self.__thread_budget is not None:
+            self.__thread_budget.slots = self.__limit
+
+    def __sample(self) -> tuple:
+        """
+        :return: tuple (CPU utilization in [0, 1], smoothed number of runnable threads)
+        """
+        cpu_times = ConcurrencyController.__read_cpu_times()
+        running = ConcurrencyController.__read_procs_running()
+        if cpu_times is not None and self.__cpu_times is not None and cpu_times[1] > self.__cpu_times[1]:
+            cpu = (cpu_times[0] - self.__cpu_times[0]) / (cpu_times[1] - self.__cpu_times[1])
+        else:
+            cpu = min(os.getloadavg()[0] / self.__cores, 1.0)
+        self.__cpu_times = cpu_times
+
+        if running is None:
+            running = os.getloadavg()[0]
+        if self.__run_queue is None:
+            self.__run_queue = running
+        else:
+            self.__run_queue = ConcurrencyController.ALPHA * running + (1 - ConcurrencyController.ALPHA) * self.__run_queue
+        return cpu, self.__run_queue
+
+    def __throughput(self) -> Optional[float]:
+        """
+        :return: media seconds encoded per wall-clock second by running jobs, None if unknown
+        """
+        if self.__progress_monitor is None:
+            return None
+        speeds = [report.speed for report in self.__progress_monitor.snapshot() if report.speed is not None]
+        return sum(speeds) if speeds else None
+
+    @staticmethod
+    def __read_cpu_times() -> Optional[tuple]:
+        """
+        :return: tuple (busy, total) jiffies of all CPUs, None if not available
+        """
+        try:
+            with open("/proc/stat") as f:
+                fields = [int(field) for field in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        # idle and iowait
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+        total = sum(fields[:8])
+        return total - idle, total
+
+    @staticmethod
+    def __read_procs_running() -> Optional[int]:
+        try:
+            with open("/proc/stat") as f:
+                for line in f:
+                    if line.startswith("procs_running"):
+                        # the sampling thread itself is running
+                        return max(int(line.split()[1]) - 1, 0)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def stop(self) -> None:
+        self.__stopped.set()
@@ -0,0 +1,156 @@
+import time
+from concurrent.futures import Future
+from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from util import LogManager
+
+
+class CostScheduler(object):
+    """
+    Orders queued jobs by estimated conversion cost, cheapest first, and keeps
+     some worker slots for short jobs, so that small files keep a low latency
+     while long ones saturate the pool.
+    Cost is estimated, in the parent process, from the probe of the source:
+     media duration x pixel count x weight of the target video codec, summed over
+     outputs. Only the cost is kept, so queued estimates hold no probe: workers
+     probe again, through the probe cache when configured, which the estimate filled.
+    Waiting jobs age: their cost halves every AGING_HALF_LIFE seconds, so long
+     jobs are not starved by a steady flow of short ones.
+    Files still being written are probed too, as under a plain watchdog observer
+     no file is ever known to be complete: the duration so far is a lower bound
+     of the actual one.
+    Files which can not be probed get UNKNOWN_COST: they are scheduled after the
+     jobs whose cost is known, but may use the fast slots, as they are as likely
+     to be short as long.
+    """
+
+    __LOG = None
+
+    DEFAULT_FAST_SLOTS = 1
+    DEFAULT_FAST_DURATION = 120
+    AGING_HALF_LIFE = 600
+    PROBE_WORKERS = 4
+
+    # encoding cost relative to h264, per pixel and second
+    VIDEO_WEIGHTS = {
+        'copy': 0.02,
+        'h264': 1.0,
+        'vp8': 1.5,
+        'theora': 0.8,
+        'divx': 0.4,
+        'h263': 0.3,
+        'flv': 0.3,
+        'mpeg1': 0.25,
+        'mpeg2': 0.3
+    }
+    DEFAULT_VIDEO_WEIGHT = 1.0
+    # cost of audio encoding, relative to h264 encoding of a 1080p stream
+    AUDIO_WEIGHT = 0.02
+    REFERENCE_PIXELS = 1920 * 1080
+    # cost of a job whose source can not be probed: an hour of 1080p h264
+    UNKNOWN_COST = 3600.0
+
+    class Estimate(object):
+
+        __slots__ = ('cost', 'short')
+
+        def __init__(self, cost: float, short: bool):
+            super().__init__()
+
+            self.cost = cost
+            self.short = short
+
+    def __init__(self, probe: Callable[[str], object], formats_of: Callable[[str], list], slots: int,
+                 fast_slots: int = DEFAULT_FAST_SLOTS, fast_duration: float = DEFAULT_FAST_DURATION):
+        """
+
+        :param probe: function probing a file, returning converter.MediaInfo or None
+        :param formats_of: function returning the list of conversion formats of a file
+        :param slots: number of jobs running at once
+        :param fast_slots: slots long jobs can not use
+        :param fast_duration: maximum media duration (seconds) of short jobs
+        """
+        super().__init__()
+
+        CostScheduler.__LOG = LogManager.get_instance().get(LogManager.Logger.OBSERVER)
+        self.__probe = probe
+        self.__formats_of = formats_of
+        self.__slots = slots
+        self.__fast_slots = fast_slots
+        self.__fast_duration = fast_duration
+        self.__executor = ThreadPoolExecutor(max_workers=CostScheduler.PROBE_WORKERS, thread_name_prefix="CostScheduler")
+        # estimates not done yet, cancelled on shutdown
+        self.__pending = set()
+
+    @property
+    def slots(self) -> int:
+        return self.__slots
+
+    @slots.setter
+    def slots(self, value: int) -> None:
+        self.__slots = value
+
+    def estimate(self, filein: str) -> Future:
+        """
+        Estimate the cost of a job in background
+        :param filein: file to convert, possibly still being written
+        :return: future of CostScheduler.Estimate
+        """
+        future = self.__executor.submit(self.__estimate, filein)
+        self.__pending.add(future)
+        future.add_done_callback(self.__pending.discard)
+        return future
+
+    def __estimate(self, filein: str) -> "CostScheduler.Estimate":
+        try:
+            probe = self.__probe(filein)
+            out_formats = self.__formats_of(filein)
+        except Exception as e:
+            CostScheduler.__LOG.debug(f"[SCHEDULER] probing '{filein}' failed: {e}")
+            probe = None
+
+        if probe is None or probe.format.duration is None:
+            # not a media file, or not a readable one yet
+            return CostScheduler.Estimate(CostScheduler.UNKNOWN_COST, True)
+
+        duration = probe.format.duration
+        pixels = 0
+        if probe.video is not None and probe.video.video_width and probe.video.video_height:
+            pixels = probe.video.video_width * probe.video.video_height
+
+        cost = 0.0
+        for out_format in out_formats:
+            video = out_format.get('video')
+            if isinstance(video, dict) and pixels:
+                weight = CostScheduler.VIDEO_WEIGHTS.get(video.get('codec'), CostScheduler.DEFAULT_VIDEO_WEIGHT)
+                cost += weight * pixels / CostScheduler.REFERENCE_PIXELS
+            if isinstance(out_format.get('audio'), dict):
+                cost += CostScheduler.AUDIO_WEIGHT
+        return CostScheduler.Estimate(duration * cost, duration <= self.__fast_duration)
+
+    def select(self, candidates: Iterable[tuple], running_long: int) -> Optional[str]:
+        """
+        Choose the next job to run
+        :param candidates: iterable of (file, estimate, enqueue time) of queued jobs whose cost is known
+        :param running_long: number of long jobs running
+        :return: chosen file, None if no candidate can run now
+        """
+        # at least a slot is left to long jobs
+        fast_slots = max(min(self.__fast_slots, self.__slots - 1), 0)
+        long_allowed = running_long < self.__slots - fast_slots
+        now = time.monotonic()
+        chosen, chosen_priority = None, None
+        for filein, estimate, enqueued in candidates:
+            if not estimate.short and not long_allowed:
+                continue
+            priority = estimate.cost * 0.5 ** ((now - enqueued) / CostScheduler.AGING_HALF_LIFE)
+            if chosen is None or priority < chosen_priority:
+                chosen, chosen_priority = filein, priority
+        return chosen
+
+    def shutdown(self) -> None:
+        # as shutdown(cancel_futures=True), which requires Python 3.9
+        for future in list(self.__pending):
+            future.cancel()
+        self.__executor.shutdown(wait=False)
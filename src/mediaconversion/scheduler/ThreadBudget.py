@@ -0,0 +1,87 @@
+import os
+import threading
+
+
+class ThreadBudget(object):
+    """
+    Split the cores of the host among running conversions.
+    Left alone, every ffmpeg starts a decoder and an encoder thread pool as large as
+     the number of cores, so concurrent conversions oversubscribe the CPU and thrash
+     caches. Each job is granted, when it starts, the threads still free split among
+     the running jobs, itself included, so that a job alone on an idle host gets every
+     core; threads are given back when the job ends. Jobs waiting for a slot hold
+     no thread.
+    ffmpeg can not change its thread count while running, so shares are rebalanced
+     as jobs start: threads freed by ended jobs go to the next ones, and a job starting
+     while the others hold every thread still gets its share of the budget among the
+     slots of concurrent conversions, oversubscribing the cores until they end.
+    Given a multiprocessing context, the budget lives in shared memory, so that it
+     can be handed to worker processes, which acquire threads for their jobs.
+    """
+
+    # indexes in the shared state
+    __ALLOCATED = 0
+    __SLOTS = 1
+    __RUNNING = 2
+
+    def __init__(self, threads: int = None, slots: int = 1, context=None):
+        """
+
+        :param threads: threads shared by running conversions, by default the number of cores
+        :param slots: number of conversions running at once
+        :param context: multiprocessing context of the worker processes sharing the budget, None if not shared
+        """
+        super().__init__()
+
+        self.__threads = threads or os.cpu_count() or 1
+        if context is not None:
+            self.__state = context.Array('i', [0, slots, 0])
+            self.__lock = self.__state.get_lock()
+        else:
+            self.__state = [0, slots, 0]
+            self.__lock = threading.Lock()
+
+    @property
+    def threads(self) -> int:
+        return self.__threads
+
+    @property
+    def allocated(self) -> int:
+        return self.__state[ThreadBudget.__ALLOCATED]
+
+    @property
+    def running(self) -> int:
+        return self.__state[ThreadBudget.__RUNNING]
+
+    @property
+    def slots(self) -> int:
+        return self.__state[ThreadBudget.__SLOTS]
+
+    @slots.setter
+    def slots(self, value: int) -> None:
+        """
+        Set by the parent, as the number of concurrent conversions is adapted
+        """
+        with self.__lock:
+            self.__state[ThreadBudget.__SLOTS] = value
+
+    def acquire(self) -> int:
+        """
+        Called when a job starts
+        :return: threads granted to the job
+        """
+        with self.__lock:
+            self.__state[ThreadBudget.__RUNNING] += 1
+            share = self.__threads // max(self.__state[ThreadBudget.__SLOTS], 1)
+            free = max(self.__threads - self.__state[ThreadBudget.__ALLOCATED], 0)
+            threads = max(free // self.__state[ThreadBudget.__RUNNING], share, 1)
+            self.__state[ThreadBudget.__ALLOCATED] += threads
+            return threads
+
+    def release(self, threads: int) -> None:
+        """
+        :param threads: threads granted to an ended job
+        """
+        with self.__lock:
+            self.__state[ThreadBudget.__RUNNING] = max(self.__state[ThreadBudget.__RUNNING] - 1, 0)
+            self.__state[ThreadBudget.__ALLOCATED] = max(self.__state[ThreadBudget.__ALLOCATED] - threads, 0)
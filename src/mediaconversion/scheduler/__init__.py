@@ -0,0 +1,6 @@
+from mediaconversion.scheduler.CostScheduler import CostScheduler
+from mediaconversion.scheduler.AdmissionQueue import AdmissionQueue
+from mediaconversion.scheduler.ConcurrencyController import ConcurrencyController
+from mediaconversion.scheduler.ThreadBudget import ThreadBudget
+
+__all__ = ["CostScheduler", "AdmissionQueue", "ConcurrencyController", "ThreadBudget"]
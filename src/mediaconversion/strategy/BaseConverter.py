@@ -1,9 +1,10 @@
+import asyncio
 import time
 from abc import ABC
 from os.path import getsize
 
 from mediaconversion.model import MediaInfo
-from mediaconversion.strategy import IConverter
+from mediaconversion.strategy import ConverterException, IConverter
 
 
 class BaseConverter(ABC, IConverter):
@@ -13,29 +14,86 @@ class BaseConverter(ABC, IConverter):
 
     TRANSFER_DATA_POLL = 0.5
 
-    def execute(self, media_info: MediaInfo) -> None:
+    def execute(self, media_info: MediaInfo) -> MediaInfo:
         """
         DO NOT EDIT OR OVERRIDE THIS METHOD
         :param media_info: object which incapsulate information for strategy
+        :return: media_info, updated with the outcome of the job
         """
         self.prepare(media_info)
 
         try:
             self.convert(media_info)
         except Exception as e:
-            return self.on_error(media_info, e)
+            self.on_error(media_info, e)
+        else:
+            self.on_success(media_info)
 
-        return self.on_success(media_info)
+        return media_info
+
+    async def execute_async(self, media_info: MediaInfo) -> MediaInfo:
+        """
+        Coroutine counterpart of execute(), run by AsyncEngine on its event loop
+        DO NOT EDIT OR OVERRIDE THIS METHOD
+        :param media_info: object which incapsulate information for strategy
+        :return: media_info, updated with the outcome of the job
+        """
+        loop = asyncio.get_running_loop()
+        await self.prepare_async(media_info)
+
+        try:
+            await self.convert_async(media_info)
+        except Exception as e:
+            await loop.run_in_executor(None, self.on_error, media_info, e)
+        else:
+            await loop.run_in_executor(None, self.on_success, media_info)
+
+        return media_info
+
+    def compile_formats(self, out_formats: list) -> list:
+        """
+        Called once at startup on the conversion formats of each watch profile
+        :param out_formats: list of conversion formats
+        :return: formats handed to the jobs of the profile, by default out_formats unchanged
+        :raise ValueError: if a format is invalid
+        """
+        return out_formats
+
+    def terminate(self) -> None:
+        """
+        Called on shutdown of the process running conversions, to stop the processes left by them
+        """
+        pass
 
     def prepare(self, media_info: MediaInfo) -> None:
         pass
 
+    async def prepare_async(self, media_info: MediaInfo) -> None:
+        """
+        By default prepare() runs in the default executor of the event loop
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.prepare, media_info)
+
+    async def convert_async(self, media_info: MediaInfo) -> None:
+        """
+        By default convert() runs in the default executor of the event loop:
+         strategies override it to drive their conversions from the loop itself
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.convert, media_info)
+
     def on_error(self, media_info: MediaInfo = None,
                  exception: Exception = None) -> None:
-        pass
+        """
+        Record the outcome of the job: stalled conversions (ConverterException.StallError)
+         are told apart from encoding failures
+        """
+        if isinstance(exception, ConverterException.StallError):
+            media_info.status = MediaInfo.Status.STALLED
+        else:
+            media_info.status = MediaInfo.Status.FAILED
 
     def on_success(self, media_info: MediaInfo = None) -> None:
-        pass
+        media_info.status = MediaInfo.Status.SUCCEEDED
 
     @classmethod
     def _wait_file(cls, media_info: MediaInfo,
@@ -51,3 +109,14 @@ class BaseConverter(ABC, IConverter):
         while size != getsize(media_info.filein):
             size = getsize(media_info.filein)
             time.sleep(poll_time)
+
+    @classmethod
+    async def _wait_file_async(cls, media_info: MediaInfo,
+                               poll_time: float = TRANSFER_DATA_POLL) -> None:
+        """
+        Coroutine counterpart of _wait_file()
+        """
+        size = -1
+        while size != getsize(media_info.filein):
+            size = getsize(media_info.filein)
+            await asyncio.sleep(poll_time)
@@ -0,0 +1,21 @@
+class ConverterException(object):
+
+    class BaseException(Exception):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(args, kwargs)
+
+        def __str__(self):
+            if len(self.args) == 0:
+                return ""
+            if len(self.args) == 1:
+                return str(self.args[0])
+            return str(self.args[0][0])
+
+    class StallError(BaseException):
+        """
+        Conversion made no progress within the configured timeout and it has been aborted
+        """
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
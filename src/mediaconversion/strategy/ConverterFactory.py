@@ -1,5 +1,9 @@
+import signal
 from enum import Enum, auto
 
+from converter.ffmpeg import ProcessLimits
+
+from mediaconversion.cache import ProbeCache, ResultCache
 from mediaconversion.strategy import FFmpeg, BaseConverter
 from model import ConverterConfig
 
@@ -17,13 +21,37 @@ class ConverterFactory(object):
             raise ValueError
 
         if strategy == cls.Converters.FFMPEG:
-            if ConverterFactory._CONFIG.media_ffmpeg is not None and \
-                    ConverterFactory._CONFIG.media_ffprobe is not None:
-                return FFmpeg(
-                    ConverterFactory._CONFIG.media_ffmpeg,
-                    ConverterFactory._CONFIG.media_ffprobe
+            config = ConverterFactory._CONFIG
+            options = {
+                'probe_mode': config.media_probe_mode,
+                'probe_cache': ProbeCache(
+                    config.media_probe_cache,
+                    ProbeCache.variant_of(config.media_probe_mode)
+                ) if config.media_probe_cache else None,
+                'result_cache': ResultCache(
+                    config.media_result_cache,
+                    config.media_result_cache_size * 1024 ** 2
+                ) if config.media_result_cache else None,
+                'stream_copy': config.media_out_stream_copy,
+                'stall_timeout': config.media_stall_timeout,
+                'stall_kill_grace': config.media_stall_kill_grace,
+                'segment_threshold': config.media_segment_threshold,
+                'segment_length': config.media_segment_length,
+                'segment_scene': config.media_segment_scene,
+                'segment_workers': config.media_segment_workers,
+                'tmp': config.general_tmp,
+                'ffmpeg_log_dir': config.general_log_ffmpeg_dir,
+                'limits': ProcessLimits(
+                    config.media_limit_memory * 1024 ** 2 if config.media_limit_memory else None,
+                    config.media_limit_cpu,
+                    signal.SIGKILL if config.media_limit_parent_death else None,
+                    config.media_limit_process_group
                 )
+            }
+
+            if config.media_ffmpeg is not None and config.media_ffprobe is not None:
+                return FFmpeg(config.media_ffmpeg, config.media_ffprobe, **options)
             else:
-                return FFmpeg()
+                return FFmpeg(**options)
         else:
             raise NotImplementedError
@@ -1,9 +1,17 @@
+import asyncio
 import shutil
+import time
 from pathlib import Path
+from typing import List, Optional
 
-from converter import Converter
+from converter import Converter, ConverterError, FFMpegStallError, ProcessLimits, ResourceUsage
+from converter.aio import AsyncConverter
 
-from mediaconversion.strategy import BaseConverter
+from mediaconversion.cache import ProbeCache, ResultCache
+from mediaconversion.journal import JournalRecorder
+from mediaconversion.progress import ProgressReporter
+from mediaconversion.strategy import BaseConverter, ConverterException
+from mediaconversion.strategy.SegmentedEncoder import SegmentedEncoder
 from mediaconversion.model import MediaInfo
 from util import LogManager
 from util.Validation import Validation
@@ -15,19 +23,83 @@ class FFmpeg(BaseConverter):
 
     FFMPEG_BIN = "ffmpeg"
     FFPROBE_BIN = "ffprobe"
+    PROBE_MODE = "json"
+    STREAM_COPY = True
+    STALL_TIMEOUT = 30
+    STALL_KILL_GRACE = 5
 
-    def __init__(self, ffmpeg: str = FFMPEG_BIN, ffprobe: str = FFPROBE_BIN):
+    def __init__(self, ffmpeg: str = FFMPEG_BIN, ffprobe: str = FFPROBE_BIN,
+                 probe_mode: str = PROBE_MODE, probe_cache: ProbeCache = None, result_cache: ResultCache = None,
+                 stream_copy: bool = STREAM_COPY, stall_timeout: float = STALL_TIMEOUT,
+                 stall_kill_grace: float = STALL_KILL_GRACE, segment_threshold: float = None,
+                 segment_length: float = SegmentedEncoder.DEFAULT_LENGTH, segment_scene: float = None,
+                 segment_workers: int = None, tmp: str = None,
+                 ffmpeg_log_dir: str = None, limits: ProcessLimits = None):
         super().__init__()
 
         Validation.is_installed(ffmpeg, f"Wrong path for {FFmpeg.FFMPEG_BIN}")
         Validation.is_installed(ffprobe, f"Wrong path for {FFmpeg.FFPROBE_BIN}")
 
         FFmpeg.__LOG = LogManager.get_instance().get(LogManager.Logger.CONVERTER)
-        self.__converter = Converter(ffmpeg, ffprobe)
+        # limits are applied to every ffmpeg and ffprobe child, whose resource usage is accounted to its job
+        self.__converter = Converter(ffmpeg, ffprobe, probe_mode, probe_cache, limits)
+        # conversions run by AsyncEngine
+        self.__async_converter = AsyncConverter(self.__converter)
+        self.__result_cache = result_cache
+        self.__stream_copy = stream_copy
+        # no progress for stall timeout seconds means a stuck ffmpeg; 0 disables the check
+        self.__stall_timeout = stall_timeout or None
+        self.__stall_kill_grace = stall_kill_grace
+        self.__ffmpeg_log_dir = ffmpeg_log_dir
+        # long files are converted by segments iff a threshold is set
+        self.__segmented_encoder = None
+        if segment_threshold is not None:
+            self.__segmented_encoder = SegmentedEncoder(
+                self.__converter,
+                segment_threshold,
+                segment_length,
+                segment_scene,
+                segment_workers,
+                tmp,
+                self.__stall_timeout,
+                stall_kill_grace
+            )
+
+    def probe(self, filein: str) -> object:
+        """
+        Probe a file, through the probe cache if configured
+        :param filein: file to probe
+        :return: converter.MediaInfo, None if filein is not a media file
+        """
+        return self.__converter.probe(filein)
+
+    def compile_formats(self, out_formats: list) -> list:
+        """
+        Formats are validated and compiled into templates of ffmpeg options, so that jobs only compile
+         the options depending on their source (size and aspect filters) and on their threads
+        :param out_formats: list of conversion formats
+        :return: list of OptionsTemplate
+        :raise ValueError: if a format is invalid
+        """
+        try:
+            return [Converter.compile_template(out_format) for out_format in out_formats]
+        except ConverterError as e:
+            raise ValueError(e) from e
+
+    def terminate(self) -> None:
+        """
+        ffmpeg and ffprobe children still running are terminated, with their process group if enabled
+        """
+        self.__converter.ffmpeg.terminate_all(self.__stall_kill_grace)
+        if self.__segmented_encoder is not None:
+            self.__segmented_encoder.terminate()
 
     def prepare(self, media_info: MediaInfo) -> None:
         super().prepare(media_info)
-        super()._wait_file(media_info)
+        media_info.usage = ResourceUsage()
+        # files reported by the observer as complete are converted immediately
+        if not media_info.ready:
+            super()._wait_file(media_info)
 
     def convert(self, media_info: MediaInfo) -> None:
         """
@@ -37,22 +109,246 @@ class FFmpeg(BaseConverter):
         """
         FFmpeg.__LOG.debug(f"[CONVERTING] '{media_info.filein}'")
 
-        probe = self.__converter.probe(media_info.filein)
-        FFmpeg.__LOG.debug(f"[PROBING] '{media_info.filein}': {probe}")
+        # the same content converted with the same options is linked from the result cache
+        cache_keys = self.__get_cache_keys_from(media_info)
+        if self.__from_cache(media_info, cache_keys):
+            FFmpeg.__LOG.info(f"[CONVERSION CACHED] '{media_info.filein}'")
+            return
+
+        # probes of the job only: other jobs may probe with the same converter meanwhile
+        probe_count = media_info.usage.probes
+        if media_info.probe is None:
+            media_info.probe = self.__converter.probe(media_info.filein, usage=media_info.usage)
+            FFmpeg.__LOG.debug(f"[PROBING] '{media_info.filein}': {media_info.probe}")
+        Validation.not_none(
+            media_info.probe,
+            f"Probing failed: '{media_info.filein}' is not a valid media file"
+        )
+
+        self.__select_streams(media_info)
+        outputs = media_info.outputs
+        log_file = self.__start(media_info)
+        if len(outputs) > 1:
+            # renditions share a single decoding of the source
+            FFmpeg.__LOG.debug(f"[RENDITIONS] '{media_info.filein}': {[fileout for fileout, _ in outputs]}")
+            conversion = self.__converter.convert_multi(
+                media_info.filein,
+                outputs,
+                timeout=self.__stall_timeout,
+                info=media_info.probe,
+                structured=True,
+                log_file=log_file,
+                kill_grace=self.__stall_kill_grace,
+                threads=media_info.threads,
+                usage=media_info.usage
+            )
+        elif self.__is_segmented(media_info):
+            conversion = self.__segmented_encoder.encode(media_info, outputs[0][1], log_file)
+        else:
+            conversion = self.__converter.convert(
+                media_info.filein,
+                outputs[0][0],
+                outputs[0][1],
+                timeout=self.__stall_timeout,
+                info=media_info.probe,
+                structured=True,
+                log_file=log_file,
+                kill_grace=self.__stall_kill_grace,
+                threads=media_info.threads,
+                usage=media_info.usage
+            )
+
+        # progress is published to the parent iff a reporter has been installed in this worker
+        reporter = ProgressReporter.get_instance()
+        try:
+            for progress in conversion:
+                if reporter is not None:
+                    reporter.update(media_info.filein, progress, media_info.probe.format.duration)
+        except FFMpegStallError as e:
+            raise ConverterException.StallError(
+                f"No progress for {self.__stall_timeout}s converting '{media_info.filein}'"
+            ) from e
+        else:
+            self.__to_cache(media_info, cache_keys)
+        finally:
+            if reporter is not None:
+                reporter.finish(media_info.filein)
+            media_info.probe_count += media_info.usage.probes - probe_count
+            FFmpeg.__LOG.debug(f"[PROBES] '{media_info.filein}': {media_info.probe_count}")
+
+    async def prepare_async(self, media_info: MediaInfo) -> None:
+        super().prepare(media_info)
+        media_info.usage = ResourceUsage()
+        if not media_info.ready:
+            await super()._wait_file_async(media_info)
+
+    async def convert_async(self, media_info: MediaInfo) -> None:
+        """
+        Coroutine counterpart of convert(): ffprobe and ffmpeg run as asyncio subprocesses,
+         disk bound steps (result cache, segmented encoding) in the default executor of the loop
+        :param media_info: object which incapsulate infformation for strategy
+        """
+        FFmpeg.__LOG.debug(f"[CONVERTING] '{media_info.filein}'")
+        loop = asyncio.get_running_loop()
+
+        cache_keys = await loop.run_in_executor(None, self.__get_cache_keys_from, media_info)
+        if await loop.run_in_executor(None, self.__from_cache, media_info, cache_keys):
+            FFmpeg.__LOG.info(f"[CONVERSION CACHED] '{media_info.filein}'")
+            return
+
+        # probes of the job only: other jobs may probe with the same converter meanwhile
+        probe_count = media_info.usage.probes
+        if media_info.probe is None:
+            media_info.probe = await self.__async_converter.probe(media_info.filein, usage=media_info.usage)
+            FFmpeg.__LOG.debug(f"[PROBING] '{media_info.filein}': {media_info.probe}")
         Validation.not_none(
-            probe,
+            media_info.probe,
             f"Probing failed: '{media_info.filein}' is not a valid media file"
         )
 
+        self.__select_streams(media_info)
+        outputs = media_info.outputs
+        log_file = self.__start(media_info)
+        reporter = ProgressReporter.get_instance()
+        try:
+            if self.__is_segmented(media_info):
+                # segments are encoded by threads of the executor, each waiting for its ffmpeg
+                await loop.run_in_executor(None, self.__encode_segmented, media_info, log_file, reporter)
+            else:
+                if len(outputs) > 1:
+                    FFmpeg.__LOG.debug(
+                        f"[RENDITIONS] '{media_info.filein}': {[fileout for fileout, _ in outputs]}"
+                    )
+                    conversion = self.__async_converter.convert_multi(
+                        media_info.filein,
+                        outputs,
+                        timeout=self.__stall_timeout,
+                        info=media_info.probe,
+                        log_file=log_file,
+                        kill_grace=self.__stall_kill_grace,
+                        threads=media_info.threads,
+                        usage=media_info.usage
+                    )
+                else:
+                    conversion = self.__async_converter.convert(
+                        media_info.filein,
+                        outputs[0][0],
+                        outputs[0][1],
+                        timeout=self.__stall_timeout,
+                        info=media_info.probe,
+                        log_file=log_file,
+                        kill_grace=self.__stall_kill_grace,
+                        threads=media_info.threads,
+                        usage=media_info.usage
+                    )
+                async for progress in conversion:
+                    if reporter is not None:
+                        reporter.update(media_info.filein, progress, media_info.probe.format.duration)
+        except FFMpegStallError as e:
+            raise ConverterException.StallError(
+                f"No progress for {self.__stall_timeout}s converting '{media_info.filein}'"
+            ) from e
+        else:
+            await loop.run_in_executor(None, self.__to_cache, media_info, cache_keys)
+        finally:
+            if reporter is not None:
+                reporter.finish(media_info.filein)
+            media_info.probe_count += media_info.usage.probes - probe_count
+            FFmpeg.__LOG.debug(f"[PROBES] '{media_info.filein}': {media_info.probe_count}")
+
+    def __encode_segmented(self, media_info: MediaInfo, log_file: Optional[str],
+                           reporter: Optional[ProgressReporter]) -> None:
+        for progress in self.__segmented_encoder.encode(media_info, media_info.outputs[0][1], log_file):
+            if reporter is not None:
+                reporter.update(media_info.filein, progress, media_info.probe.format.duration)
+
+    def __is_segmented(self, media_info: MediaInfo) -> bool:
+        """
+        :param media_info: probed job, after stream copy selection
+        :return: True iff the job is converted by segments
+        """
+        if len(media_info.outputs) > 1 or self.__segmented_encoder is None:
+            return False
+        if not self.__segmented_encoder.accepts(media_info, media_info.outputs[0][1]):
+            return False
+        FFmpeg.__LOG.debug(f"[SEGMENTED] '{media_info.filein}': {media_info.probe.format.duration}s")
+        return True
+
+    def __select_streams(self, media_info: MediaInfo) -> None:
+        """
+        Streams already matching the target are copied instead of encoded, if enabled
+        :param media_info: probed job, whose outputs are updated
+        """
+        if not self.__stream_copy:
+            return
+        outputs = media_info.outputs
+        media_info.streams = []
+        for i, (fileout, out_format) in enumerate(outputs):
+            out_format, streams = self.__converter.stream_copy_options(out_format, media_info.probe)
+            outputs[i] = (fileout, out_format)
+            media_info.streams.append(streams)
+        FFmpeg.__LOG.debug(f"[STREAMS] '{media_info.filein}': {media_info.streams}")
+
+    def __start(self, media_info: MediaInfo) -> Optional[str]:
+        """
+        :param media_info: job whose outputs are about to be written
+        :return: file receiving the full ffmpeg output of the job, None if not requested
+        """
         FFmpeg.__LOG.info(f"[CONVERSION STARTED] '{media_info.filein}'")
-        conversion = self.__converter.convert(
-            media_info.filein,
-            media_info.fileout,
-            media_info.out_format
+        # outputs are about to be written: if the job does not end, they are partial
+        recorder = JournalRecorder.get_instance()
+        if recorder is not None:
+            recorder.started(media_info.filein)
+        return self.__get_log_file_from(media_info.filein)
+
+    def __from_cache(self, media_info: MediaInfo, cache_keys: Optional[List[str]]) -> bool:
+        """
+        :param media_info: job
+        :param cache_keys: result cache key of each output, None if results are not cached
+        :return: True iff every output has been linked from the result cache
+        """
+        return cache_keys is not None and all(
+            self.__result_cache.get(key, fileout) for key, (fileout, _) in zip(cache_keys, media_info.outputs)
         )
 
-        for _ in conversion:
-            pass
+    def __to_cache(self, media_info: MediaInfo, cache_keys: Optional[List[str]]) -> None:
+        """
+        :param media_info: converted job
+        :param cache_keys: result cache key of each output, None if results are not cached
+        """
+        if cache_keys is None:
+            return
+        for key, (fileout, _) in zip(cache_keys, media_info.outputs):
+            self.__result_cache.put(key, fileout)
+
+    def __get_cache_keys_from(self, media_info: MediaInfo) -> Optional[List[str]]:
+        """
+        :param media_info: job
+        :return: result cache key of each output, None if results are not cached
+        """
+        if self.__result_cache is None:
+            return None
+        try:
+            content_hash = ResultCache.content_hash(media_info.filein)
+            # stream copy depends on the content, so the setting is enough to tell outputs apart
+            return [
+                ResultCache.key_of(content_hash, ResultCache.options_hash(
+                    self.__converter.parse_options(out_format) + [f"stream_copy={self.__stream_copy}"]
+                ))
+                for _, out_format in media_info.outputs
+            ]
+        except (OSError, ConverterError) as e:
+            FFmpeg.__LOG.debug(f"[CACHE] '{media_info.filein}': {e}")
+            return None
+
+    def __get_log_file_from(self, filein: str) -> str:
+        """
+        :param filein: converted file
+        :return: file receiving the full ffmpeg output of the job, None if not requested
+        """
+        if self.__ffmpeg_log_dir is None:
+            return None
+        return str(Path(self.__ffmpeg_log_dir).joinpath(f"{Path(filein).stem}_{time.strftime('%Y%m%d%H%M%S')}.log"))
 
     def on_success(self, media_info: MediaInfo = None) -> None:
         super().on_success(media_info)
@@ -73,12 +369,16 @@ class FFmpeg(BaseConverter):
 
     def on_error(self, media_info: MediaInfo = None, exception: Exception = None) -> None:
         super().on_error(media_info, exception)
-        FFmpeg.__LOG.warning(f"[CONVERSION ERROR] '{media_info.filein}'")
+        if media_info.status == MediaInfo.Status.STALLED:
+            FFmpeg.__LOG.warning(f"[CONVERSION STALLED] '{media_info.filein}': {exception}")
+        else:
+            FFmpeg.__LOG.warning(f"[CONVERSION ERROR] '{media_info.filein}'")
         FFmpeg.__LOG.debug("[CONVERSION ERROR]", exc_info=True)
 
-        try:
-            Validation.is_file(media_info.fileout)
-            Path(media_info.fileout).unlink()
-            FFmpeg.__LOG.debug(f"Removed half parsed file '{media_info.fileout}'")
-        except FileNotFoundError:
-            pass
+        for fileout, _ in media_info.outputs:
+            try:
+                Validation.is_file(fileout)
+                Path(fileout).unlink()
+                FFmpeg.__LOG.debug(f"Removed half parsed file '{fileout}'")
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,217 @@
+import bisect
+import shutil
+import tempfile
+from concurrent.futures import as_completed, wait
+from concurrent.futures.thread import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from converter import Converter
+from converter.ffmpeg import FFMpeg, ResourceUsage
+
+from mediaconversion.model import MediaInfo
+from util import LogManager
+
+
+class SegmentedEncoder(object):
+    """
+    Split-encode-concat conversion of a single long file.
+    The video stream is cut (stream copy, so at keyframes) in chunks of about
+     segment length seconds, optionally moved to the nearest scene change;
+     chunks are encoded concurrently while the audio stream is encoded once,
+     as a whole, to avoid gaps and priming artifacts at chunk boundaries.
+     Encoded chunks are joined with the concat demuxer and muxed with the audio.
+    Chunks are encoded by concurrent ffmpeg children of the calling worker:
+     encoding runs in those processes, so threads are enough to use all cores.
+     They are spawned by an FFMpeg object of the job, so that when a chunk fails
+     the others are terminated without touching the processes of other jobs.
+    Concurrent chunks share the threads granted to the job by the thread budget,
+     at least one each, so segmented jobs never run more encoders than the budget
+     grants them on top of the conversions running in the other slots.
+    """
+
+    __LOG = None
+
+    DEFAULT_LENGTH = 120
+    # Intermediate files container, able to hold every supported codec
+    INTERMEDIATE_FORMAT = "mkv"
+
+    def __init__(self, converter: Converter, threshold: float, length: float = DEFAULT_LENGTH,
+                 scene: float = None, workers: int = None, tmp: str = None,
+                 stall_timeout: float = None, stall_kill_grace: float = FFMpeg.DEFAULT_KILL_GRACE):
+        """
+
+        :param converter: converter used to run ffmpeg and to parse options
+        :param threshold: minimum duration (seconds) of files converted by segments
+        :param length: target length (seconds) of segments
+        :param scene: scene change score (0-1) to align cuts on; None to cut only at keyframes
+        :param workers: maximum number of segments encoded concurrently; None for the threads granted to the job
+        :param tmp: directory for intermediate files
+        :param stall_timeout: seconds without progress before an ffmpeg run is aborted; None to wait forever
+        :param stall_kill_grace: seconds a stalled ffmpeg is given to exit before being killed
+        """
+        super().__init__()
+
+        SegmentedEncoder.__LOG = LogManager.get_instance().get(LogManager.Logger.CONVERTER)
+        self.__converter = converter
+        self.__threshold = threshold
+        self.__length = length
+        self.__scene = scene
+        self.__workers = workers
+        self.__tmp = tmp
+        self.__stall_timeout = stall_timeout
+        self.__stall_kill_grace = stall_kill_grace
+        # FFMpeg objects encoding the chunks of running jobs
+        self.__chunk_ffmpegs = set()
+
+    def accepts(self, media_info: MediaInfo, out_format: dict) -> bool:
+        """
+        :param media_info: probed job
+        :param out_format: conversion format, after stream copy selection
+        :return: True iff the job is long enough and its video stream must be encoded
+        """
+        probe = media_info.probe
+        if probe.video is None or probe.format.duration is None:
+            return False
+        if not isinstance(out_format.get('video'), dict) or out_format['video'].get('codec') in (None, 'copy'):
+            return False
+        return probe.format.duration >= self.__threshold
+
+    def terminate(self) -> None:
+        """
+        ffmpeg children encoding chunks are terminated
+        """
+        for chunk_ffmpeg in list(self.__chunk_ffmpegs):
+            chunk_ffmpeg.terminate_all(self.__stall_kill_grace)
+
+    def encode(self, media_info: MediaInfo, out_format: dict, log_file: str = None) -> Iterator[int]:
+        """
+        Generator driving the conversion, periodically yields completion percentage
+        :param media_info: probed job
+        :param out_format: conversion format, after stream copy selection
+        :param log_file: file receiving ffmpeg output of split and join steps
+        """
+        probe = media_info.probe
+        ffmpeg = self.__converter.ffmpeg
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f"{Path(media_info.filein).stem}.", dir=self.__tmp))
+
+        try:
+            # 1. cut video stream
+            split_options = ['-map', '0:v:0', '-an', '-sn', '-c:v', 'copy',
+                             '-f', 'segment', '-segment_format', 'matroska', '-reset_timestamps', '1']
+            if self.__scene is not None:
+                boundaries = self.__boundaries(probe.format.duration, ffmpeg.scene_changes(media_info.filein, self.__scene,
+                                                                                                  media_info.usage))
+                split_options.extend(['-segment_times', ','.join(f"{t:.3f}" for t in boundaries)])
+            else:
+                split_options.extend(['-segment_time', str(self.__length)])
+
+            for _ in ffmpeg.convert(media_info.filein, str(tmp_dir.joinpath("chunk_%05d.mkv")), split_options,
+                                    timeout=self.__stall_timeout, log_file=log_file,
+                                    kill_grace=self.__stall_kill_grace, usage=media_info.usage):
+                pass
+            chunks = sorted(tmp_dir.glob("chunk_*.mkv"))
+            SegmentedEncoder.__LOG.debug(f"[SEGMENTED] '{media_info.filein}': {len(chunks)} segments")
+            yield 0
+
+            # 2. encode segments and audio concurrently
+            video = dict(out_format['video'])
+            video['src_width'] = probe.video.video_width
+            video['src_height'] = probe.video.video_height
+
+            # threads granted to the job are split among concurrent encodings, one at least each
+            workers = self.__workers or media_info.threads or 1
+            threads = None
+            if media_info.threads:
+                workers = min(workers, media_info.threads)
+                threads = media_info.threads // workers
+                video['threads'] = threads
+            video_options = self.__converter.parse_options({'format': SegmentedEncoder.INTERMEDIATE_FORMAT, 'video': video})
+
+            audio_file = None
+            tasks = []
+            for chunk in chunks:
+                tasks.append((str(chunk), str(chunk.with_name(f"encoded_{chunk.name}")), video_options))
+            if probe.audio is not None and isinstance(out_format.get('audio'), dict):
+                audio_file = str(tmp_dir.joinpath("audio.mkv"))
+                audio_options = ['-map', '0:a:0'] + self.__converter.parse_options({
+                    'format': SegmentedEncoder.INTERMEDIATE_FORMAT,
+                    'audio': out_format['audio']
+                })
+                tasks.append((media_info.filein, audio_file, audio_options))
+
+            chunk_ffmpeg = FFMpeg(ffmpeg.ffmpeg_path, ffmpeg.ffprobe_path, limits=ffmpeg.limits)
+            self.__chunk_ffmpegs.add(chunk_ffmpeg)
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(self.__encode, chunk_ffmpeg, *task, threads, media_info.usage)
+                               for task in tasks]
+                    try:
+                        for done, future in enumerate(as_completed(futures), start=1):
+                            future.result()
+                            yield int(90.0 * done / len(futures))
+                    except BaseException:
+                        # the job is lost: pending chunks are cancelled and running ones terminated,
+                        #  until none is left, as a chunk may be spawning its ffmpeg meanwhile
+                        for future in futures:
+                            future.cancel()
+                        chunk_ffmpeg.terminate_all(self.__stall_kill_grace)
+                        while wait(futures, timeout=FFMpeg.EXIT_POLL).not_done:
+                            chunk_ffmpeg.terminate_all(self.__stall_kill_grace)
+                        raise
+            finally:
+                self.__chunk_ffmpegs.discard(chunk_ffmpeg)
+
+            # 3. join segments, restoring a single timeline, and mux audio
+            concat_list = tmp_dir.joinpath("concat.txt")
+            with open(concat_list, 'w') as f:
+                for _, encoded, _ in tasks[:len(chunks)]:
+                    escaped = encoded.replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+
+            join_format = {'format': out_format['format'], 'video': {'codec': 'copy'}}
+            join_options = ['-map', '0:v:0']
+            if audio_file is not None:
+                join_format['audio'] = {'codec': 'copy'}
+                join_options = ['-i', audio_file, '-map', '0:v:0', '-map', '1:a:0']
+            join_options.extend(self.__converter.parse_options(join_format))
+            join_options.extend(['-avoid_negative_ts', 'make_zero'])
+
+            for _ in ffmpeg.convert(str(concat_list), media_info.outputs[0][0], join_options,
+                                    timeout=self.__stall_timeout,
+                                    input_opts=['-f', 'concat', '-safe', '0', '-fflags', '+genpts'],
+                                    log_file=log_file, kill_grace=self.__stall_kill_grace,
+                                    usage=media_info.usage):
+                pass
+            yield 100
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def __encode(self, ffmpeg: FFMpeg, infile: str, outfile: str, options: list, threads: int = None,
+                 usage: ResourceUsage = None) -> None:
+        # stall detection does not use signals, so it works in pool threads too
+        input_opts = ['-threads', str(threads)] if threads else None
+        for _ in ffmpeg.convert(infile, outfile, options, timeout=self.__stall_timeout,
+                                input_opts=input_opts, kill_grace=self.__stall_kill_grace, usage=usage):
+            pass
+
+    def __boundaries(self, duration: float, scenes: list) -> list:
+        """
+        Cut points about segment length seconds apart, moved to the nearest
+         scene change within half segment length
+        :param duration: media duration
+        :param scenes: sorted scene change times
+        :return: sorted cut points
+        """
+        boundaries = []
+        target = self.__length
+        while target < duration - self.__length / 2:
+            i = bisect.bisect_left(scenes, target)
+            candidates = [
+                s for s in scenes[max(i - 1, 0):i + 1]
+                if abs(s - target) <= self.__length / 2 and (not boundaries or s > boundaries[-1])
+            ]
+            boundary = min(candidates, key=lambda s: abs(s - target)) if candidates else target
+            boundaries.append(boundary)
+            target = boundary + self.__length
+        return boundaries
@@ -1,8 +1,10 @@
+from mediaconversion.strategy.ConverterException import ConverterException
 from mediaconversion.strategy.IConverter import IConverter
 from mediaconversion.strategy.BaseConverter import BaseConverter
+from mediaconversion.strategy.SegmentedEncoder import SegmentedEncoder
 
 from mediaconversion.strategy.FFmpeg import FFmpeg
 
 from mediaconversion.strategy.ConverterFactory import ConverterFactory
 
-__all__ = ["IConverter", "BaseConverter", "FFmpeg", "ConverterFactory"]
+__all__ = ["ConverterException", "IConverter", "BaseConverter", "SegmentedEncoder", "FFmpeg", "ConverterFactory"]
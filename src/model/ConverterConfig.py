@@ -5,6 +5,7 @@ import threading
 from datetime import date
 
 import __version__
+from model.WatchProfile import WatchProfile
 from util import Common, Validation
 
 
@@ -29,10 +30,34 @@ class ConverterConfig(dict):
     # Keys
     K_LOG_DIR = "log.dir"
     V_DEFAULT_LOG_DIR = None
+    K_LOG_FFMPEG_DIR = "log.ffmpeg_dir"
+    V_DEFAULT_LOG_FFMPEG_DIR = None
     K_TMP = "tmp"
     V_DEFAULT_TMP = "/tmp"
     K_PROCESSES = "processes"
     V_DEFAULT_PROCESSES = 2
+    K_PROCESSES_MIN = "processes.min"
+    V_DEFAULT_PROCESSES_MIN = None
+    K_PROCESSES_INTERVAL = "processes.interval"
+    V_DEFAULT_PROCESSES_INTERVAL = 15
+    K_THREADS = "threads"
+    V_DEFAULT_THREADS = None
+    K_ENGINE = "engine"
+    V_DEFAULT_ENGINE = "pool"
+    K_JOURNAL = "journal"
+    V_DEFAULT_JOURNAL = None
+    K_PROGRESS_INTERVAL = "progress.interval"
+    V_DEFAULT_PROGRESS_INTERVAL = 5
+    K_QUEUE_HIGH_WATERMARK = "queue.high_watermark"
+    V_DEFAULT_QUEUE_HIGH_WATERMARK = 1000
+    K_QUEUE_LOW_WATERMARK = "queue.low_watermark"
+    V_DEFAULT_QUEUE_LOW_WATERMARK = 500
+    K_SCHEDULER_POLICY = "scheduler.policy"
+    V_DEFAULT_SCHEDULER_POLICY = "cost"
+    K_SCHEDULER_FAST_SLOTS = "scheduler.fast_slots"
+    V_DEFAULT_SCHEDULER_FAST_SLOTS = 1
+    K_SCHEDULER_FAST_DURATION = "scheduler.fast_duration"
+    V_DEFAULT_SCHEDULER_FAST_DURATION = 120
 
     # Section
     S_MEDIA = "MEDIA"
@@ -41,16 +66,60 @@ class ConverterConfig(dict):
     V_DEFAULT_IN_FOLDER = None
     K_IN_CONVERTED_FOLDER = "in.converted_folder"
     V_DEFAULT_IN_CONVERTED_FOLDER = None
+    K_IN_RECURSIVE = "in.recursive"
+    V_DEFAULT_IN_RECURSIVE = False
     K_IN_TIMEOUT = "in.timeout"
     V_DEFAULT_IN_TIMEOUT = 1
+    K_IN_OBSERVER = "in.observer"
+    V_DEFAULT_IN_OBSERVER = "auto"
+    K_IN_QUIET_PERIOD = "in.quiet_period"
+    V_DEFAULT_IN_QUIET_PERIOD = 5
+    K_IN_BACKLOG = "in.backlog"
+    V_DEFAULT_IN_BACKLOG = True
     K_OUT_FOLDER = "out.folder"
     V_DEFAULT_OUT_FOLDER = None
     K_OUT_FORMAT = "out.format"
     V_DEFAULT_OUT_FORMAT = None
+    K_OUT_STREAM_COPY = "out.stream_copy"
+    V_DEFAULT_OUT_STREAM_COPY = True
+    K_STALL_TIMEOUT = "stall.timeout"
+    V_DEFAULT_STALL_TIMEOUT = 30
+    K_STALL_KILL_GRACE = "stall.kill_grace"
+    V_DEFAULT_STALL_KILL_GRACE = 5
+    K_LIMIT_MEMORY = "limit.memory"
+    V_DEFAULT_LIMIT_MEMORY = None
+    K_LIMIT_CPU = "limit.cpu"
+    V_DEFAULT_LIMIT_CPU = None
+    K_LIMIT_PARENT_DEATH = "limit.parent_death"
+    V_DEFAULT_LIMIT_PARENT_DEATH = False
+    K_LIMIT_PROCESS_GROUP = "limit.process_group"
+    V_DEFAULT_LIMIT_PROCESS_GROUP = False
+    K_SEGMENT_THRESHOLD = "segment.threshold"
+    V_DEFAULT_SEGMENT_THRESHOLD = None
+    K_SEGMENT_LENGTH = "segment.length"
+    V_DEFAULT_SEGMENT_LENGTH = 120
+    K_SEGMENT_SCENE = "segment.scene"
+    V_DEFAULT_SEGMENT_SCENE = None
+    K_SEGMENT_WORKERS = "segment.workers"
+    V_DEFAULT_SEGMENT_WORKERS = None
     K_FFMPEG_BIN = "ffmpeg"
     V_DEFAULT_FFMPEG_BIN = None
     K_FFPROBE_BIN = "ffprobe"
     V_DEFAULT_FFPROBE_BIN = None
+    K_PROBE_MODE = "probe.mode"
+    V_DEFAULT_PROBE_MODE = "json"
+    K_PROBE_CACHE = "probe.cache"
+    V_DEFAULT_PROBE_CACHE = None
+    K_RESULT_CACHE = "result.cache"
+    V_DEFAULT_RESULT_CACHE = None
+    K_RESULT_CACHE_SIZE = "result.cache_size"
+    V_DEFAULT_RESULT_CACHE_SIZE = 10240
+
+    # Sections [WATCH:<name>], one for each watch profile
+    S_WATCH_PREFIX = "WATCH:"
+    # Keys: in.folder, in.converted_folder, in.recursive, out.folder, out.format (as in [MEDIA])
+    K_WATCH_PROFILES = "watch.profiles"
+    V_DEFAULT_PROFILE_NAME = "default"
 
     def __init__(self):
         if ConverterConfig.__INSTANCE is not None:
@@ -60,6 +129,7 @@ class ConverterConfig(dict):
 
         ConverterConfig.__INSTANCE = self
         self.__config_parser = configparser.ConfigParser(interpolation=configparser.ExtendedInterpolation())
+        self.__config_files = []
         self.__upload_config()
 
     @classmethod
@@ -83,8 +153,16 @@ class ConverterConfig(dict):
 
         with self.__LOCK:
             self.__config_parser.read(config_file)
+            self.__config_files.append(config_file)
             self.__upload_config()
 
+    @property
+    def config_files(self) -> list:
+        """
+        :return: configuration files loaded, in order, so that processes not forked from this one can load them again
+        """
+        return list(self.__config_files)
+
     def __upload_config(self):
         """
 
@@ -92,17 +170,51 @@ class ConverterConfig(dict):
         """
         # section [GENERAL]
         self.__put_str(ConverterConfig.K_LOG_DIR, ConverterConfig.S_GENERAL, ConverterConfig.K_LOG_DIR, ConverterConfig.V_DEFAULT_LOG_DIR)
+        self.__put_str(ConverterConfig.K_LOG_FFMPEG_DIR, ConverterConfig.S_GENERAL, ConverterConfig.K_LOG_FFMPEG_DIR, ConverterConfig.V_DEFAULT_LOG_FFMPEG_DIR)
         self.__put_str(ConverterConfig.K_TMP, ConverterConfig.S_GENERAL, ConverterConfig.K_TMP, ConverterConfig.V_DEFAULT_TMP)
         self.__put_int(ConverterConfig.K_PROCESSES, ConverterConfig.S_GENERAL, ConverterConfig.K_PROCESSES, ConverterConfig.V_DEFAULT_PROCESSES)
+        self.__put_int(ConverterConfig.K_PROCESSES_MIN, ConverterConfig.S_GENERAL, ConverterConfig.K_PROCESSES_MIN, ConverterConfig.V_DEFAULT_PROCESSES_MIN)
+        self.__put_float(ConverterConfig.K_PROCESSES_INTERVAL, ConverterConfig.S_GENERAL, ConverterConfig.K_PROCESSES_INTERVAL, ConverterConfig.V_DEFAULT_PROCESSES_INTERVAL)
+        self.__put_int(ConverterConfig.K_THREADS, ConverterConfig.S_GENERAL, ConverterConfig.K_THREADS, ConverterConfig.V_DEFAULT_THREADS)
+        self.__put_str(ConverterConfig.K_ENGINE, ConverterConfig.S_GENERAL, ConverterConfig.K_ENGINE, ConverterConfig.V_DEFAULT_ENGINE)
+        self.__put_str(ConverterConfig.K_JOURNAL, ConverterConfig.S_GENERAL, ConverterConfig.K_JOURNAL, ConverterConfig.V_DEFAULT_JOURNAL)
+        self.__put_float(ConverterConfig.K_PROGRESS_INTERVAL, ConverterConfig.S_GENERAL, ConverterConfig.K_PROGRESS_INTERVAL, ConverterConfig.V_DEFAULT_PROGRESS_INTERVAL)
+        self.__put_int(ConverterConfig.K_QUEUE_HIGH_WATERMARK, ConverterConfig.S_GENERAL, ConverterConfig.K_QUEUE_HIGH_WATERMARK, ConverterConfig.V_DEFAULT_QUEUE_HIGH_WATERMARK)
+        self.__put_int(ConverterConfig.K_QUEUE_LOW_WATERMARK, ConverterConfig.S_GENERAL, ConverterConfig.K_QUEUE_LOW_WATERMARK, ConverterConfig.V_DEFAULT_QUEUE_LOW_WATERMARK)
+        self.__put_str(ConverterConfig.K_SCHEDULER_POLICY, ConverterConfig.S_GENERAL, ConverterConfig.K_SCHEDULER_POLICY, ConverterConfig.V_DEFAULT_SCHEDULER_POLICY)
+        self.__put_int(ConverterConfig.K_SCHEDULER_FAST_SLOTS, ConverterConfig.S_GENERAL, ConverterConfig.K_SCHEDULER_FAST_SLOTS, ConverterConfig.V_DEFAULT_SCHEDULER_FAST_SLOTS)
+        self.__put_float(ConverterConfig.K_SCHEDULER_FAST_DURATION, ConverterConfig.S_GENERAL, ConverterConfig.K_SCHEDULER_FAST_DURATION, ConverterConfig.V_DEFAULT_SCHEDULER_FAST_DURATION)
 
         # section [MEDIA]
         self.__put_str(ConverterConfig.K_IN_FOLDER, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_FOLDER, ConverterConfig.V_DEFAULT_IN_FOLDER)
         self.__put_str(ConverterConfig.K_IN_CONVERTED_FOLDER, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_CONVERTED_FOLDER, ConverterConfig.V_DEFAULT_IN_CONVERTED_FOLDER)
+        self.__put_bool(ConverterConfig.K_IN_RECURSIVE, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_RECURSIVE, ConverterConfig.V_DEFAULT_IN_RECURSIVE)
         self.__put_float(ConverterConfig.K_IN_TIMEOUT, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_TIMEOUT, ConverterConfig.V_DEFAULT_IN_TIMEOUT)
+        self.__put_str(ConverterConfig.K_IN_OBSERVER, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_OBSERVER, ConverterConfig.V_DEFAULT_IN_OBSERVER)
+        self.__put_float(ConverterConfig.K_IN_QUIET_PERIOD, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_QUIET_PERIOD, ConverterConfig.V_DEFAULT_IN_QUIET_PERIOD)
+        self.__put_bool(ConverterConfig.K_IN_BACKLOG, ConverterConfig.S_MEDIA, ConverterConfig.K_IN_BACKLOG, ConverterConfig.V_DEFAULT_IN_BACKLOG)
         self.__put_str(ConverterConfig.K_OUT_FOLDER, ConverterConfig.S_MEDIA, ConverterConfig.K_OUT_FOLDER, ConverterConfig.V_DEFAULT_OUT_FOLDER)
         self.__put_dict(ConverterConfig.K_OUT_FORMAT, ConverterConfig.S_MEDIA, ConverterConfig.K_OUT_FORMAT, ConverterConfig.V_DEFAULT_OUT_FORMAT)
+        self.__put_bool(ConverterConfig.K_OUT_STREAM_COPY, ConverterConfig.S_MEDIA, ConverterConfig.K_OUT_STREAM_COPY, ConverterConfig.V_DEFAULT_OUT_STREAM_COPY)
+        self.__put_float(ConverterConfig.K_STALL_TIMEOUT, ConverterConfig.S_MEDIA, ConverterConfig.K_STALL_TIMEOUT, ConverterConfig.V_DEFAULT_STALL_TIMEOUT)
+        self.__put_float(ConverterConfig.K_STALL_KILL_GRACE, ConverterConfig.S_MEDIA, ConverterConfig.K_STALL_KILL_GRACE, ConverterConfig.V_DEFAULT_STALL_KILL_GRACE)
+        self.__put_int(ConverterConfig.K_LIMIT_MEMORY, ConverterConfig.S_MEDIA, ConverterConfig.K_LIMIT_MEMORY, ConverterConfig.V_DEFAULT_LIMIT_MEMORY)
+        self.__put_int(ConverterConfig.K_LIMIT_CPU, ConverterConfig.S_MEDIA, ConverterConfig.K_LIMIT_CPU, ConverterConfig.V_DEFAULT_LIMIT_CPU)
+        self.__put_bool(ConverterConfig.K_LIMIT_PARENT_DEATH, ConverterConfig.S_MEDIA, ConverterConfig.K_LIMIT_PARENT_DEATH, ConverterConfig.V_DEFAULT_LIMIT_PARENT_DEATH)
+        self.__put_bool(ConverterConfig.K_LIMIT_PROCESS_GROUP, ConverterConfig.S_MEDIA, ConverterConfig.K_LIMIT_PROCESS_GROUP, ConverterConfig.V_DEFAULT_LIMIT_PROCESS_GROUP)
+        self.__put_float(ConverterConfig.K_SEGMENT_THRESHOLD, ConverterConfig.S_MEDIA, ConverterConfig.K_SEGMENT_THRESHOLD, ConverterConfig.V_DEFAULT_SEGMENT_THRESHOLD)
+        self.__put_float(ConverterConfig.K_SEGMENT_LENGTH, ConverterConfig.S_MEDIA, ConverterConfig.K_SEGMENT_LENGTH, ConverterConfig.V_DEFAULT_SEGMENT_LENGTH)
+        self.__put_float(ConverterConfig.K_SEGMENT_SCENE, ConverterConfig.S_MEDIA, ConverterConfig.K_SEGMENT_SCENE, ConverterConfig.V_DEFAULT_SEGMENT_SCENE)
+        self.__put_int(ConverterConfig.K_SEGMENT_WORKERS, ConverterConfig.S_MEDIA, ConverterConfig.K_SEGMENT_WORKERS, ConverterConfig.V_DEFAULT_SEGMENT_WORKERS)
         self.__put_str(ConverterConfig.K_FFMPEG_BIN, ConverterConfig.S_MEDIA, ConverterConfig.K_FFMPEG_BIN, ConverterConfig.V_DEFAULT_FFMPEG_BIN)
         self.__put_str(ConverterConfig.K_FFPROBE_BIN, ConverterConfig.S_MEDIA, ConverterConfig.K_FFPROBE_BIN, ConverterConfig.V_DEFAULT_FFPROBE_BIN)
+        self.__put_str(ConverterConfig.K_PROBE_MODE, ConverterConfig.S_MEDIA, ConverterConfig.K_PROBE_MODE, ConverterConfig.V_DEFAULT_PROBE_MODE)
+        self.__put_str(ConverterConfig.K_PROBE_CACHE, ConverterConfig.S_MEDIA, ConverterConfig.K_PROBE_CACHE, ConverterConfig.V_DEFAULT_PROBE_CACHE)
+        self.__put_str(ConverterConfig.K_RESULT_CACHE, ConverterConfig.S_MEDIA, ConverterConfig.K_RESULT_CACHE, ConverterConfig.V_DEFAULT_RESULT_CACHE)
+        self.__put_int(ConverterConfig.K_RESULT_CACHE_SIZE, ConverterConfig.S_MEDIA, ConverterConfig.K_RESULT_CACHE_SIZE, ConverterConfig.V_DEFAULT_RESULT_CACHE_SIZE)
+
+        # sections [WATCH:<name>]
+        self.__put_profiles(ConverterConfig.K_WATCH_PROFILES)
 
         # intern
         self.__put_str(ConverterConfig.K_VERSION, '', '', ConverterConfig.V_DEFAULT_VERSION)
@@ -113,6 +225,39 @@ class ConverterConfig(dict):
         else:
             self.__put_str(ConverterConfig.K_LOG_FILENAME, '', '', ConverterConfig.V_DEFAULT_LOG_FILENAME)
 
+    def __put_profiles(self, key: str) -> None:
+        """
+        Watch profiles: the one of section [MEDIA], if it specifies an input directory, and one for
+         each section [WATCH:<name>]; keys missing from a [WATCH:<name>] section are taken from [MEDIA]
+        :param key:
+        :raise: SyntaxError if a format of a profile can not be parsed
+        """
+        profiles = []
+        if self.media_in_folder is not None:
+            profiles.append(WatchProfile(
+                ConverterConfig.V_DEFAULT_PROFILE_NAME,
+                self.media_in_folder,
+                self.media_out_folder,
+                self.media_out_format,
+                self.media_in_converted_folder,
+                self.media_in_recursive
+            ))
+
+        for section in self.__config_parser.sections():
+            if not section.startswith(ConverterConfig.S_WATCH_PREFIX):
+                continue
+            options = self.__config_parser[section]
+            out_format = options.get(ConverterConfig.K_OUT_FORMAT)
+            profiles.append(WatchProfile(
+                section[len(ConverterConfig.S_WATCH_PREFIX):],
+                options.get(ConverterConfig.K_IN_FOLDER),
+                options.get(ConverterConfig.K_OUT_FOLDER, self.media_out_folder),
+                ast.literal_eval(out_format) if out_format is not None else self.media_out_format,
+                options.get(ConverterConfig.K_IN_CONVERTED_FOLDER, self.media_in_converted_folder),
+                options.getboolean(ConverterConfig.K_IN_RECURSIVE, self.media_in_recursive)
+            ))
+        self[key] = profiles
+
     def __put_obj(self, key: str, section: str, section_key: str, default: object = None) -> None:
         try:
             self[key] = self.__config_parser.get(section, section_key)
@@ -160,7 +305,7 @@ class ConverterConfig(dict):
 
     def __put_bool(self, key: str, section: str, section_key: str, default: bool = None) -> None:
         try:
-            self[key] = bool(self.__config_parser.get(section, section_key))
+            self[key] = self.__config_parser.getboolean(section, section_key)
         except (configparser.NoOptionError, configparser.NoSectionError):
             self[key] = default
 
@@ -180,6 +325,10 @@ class ConverterConfig(dict):
     def general_log_dir(self) -> str:
         return self.get(ConverterConfig.K_LOG_DIR)
 
+    @property
+    def general_log_ffmpeg_dir(self) -> str:
+        return self.get(ConverterConfig.K_LOG_FFMPEG_DIR)
+
     @property
     def general_tmp(self) -> str:
         return self.get(ConverterConfig.K_TMP)
@@ -188,6 +337,50 @@ class ConverterConfig(dict):
     def general_processes(self) -> int:
         return self.get(ConverterConfig.K_PROCESSES)
 
+    @property
+    def general_processes_min(self) -> int:
+        return self.get(ConverterConfig.K_PROCESSES_MIN)
+
+    @property
+    def general_processes_interval(self) -> float:
+        return self.get(ConverterConfig.K_PROCESSES_INTERVAL)
+
+    @property
+    def general_threads(self) -> int:
+        return self.get(ConverterConfig.K_THREADS)
+
+    @property
+    def general_engine(self) -> str:
+        return self.get(ConverterConfig.K_ENGINE)
+
+    @property
+    def general_journal(self) -> str:
+        return self.get(ConverterConfig.K_JOURNAL)
+
+    @property
+    def general_progress_interval(self) -> float:
+        return self.get(ConverterConfig.K_PROGRESS_INTERVAL)
+
+    @property
+    def general_queue_high_watermark(self) -> int:
+        return self.get(ConverterConfig.K_QUEUE_HIGH_WATERMARK)
+
+    @property
+    def general_queue_low_watermark(self) -> int:
+        return self.get(ConverterConfig.K_QUEUE_LOW_WATERMARK)
+
+    @property
+    def general_scheduler_policy(self) -> str:
+        return self.get(ConverterConfig.K_SCHEDULER_POLICY)
+
+    @property
+    def general_scheduler_fast_slots(self) -> int:
+        return self.get(ConverterConfig.K_SCHEDULER_FAST_SLOTS)
+
+    @property
+    def general_scheduler_fast_duration(self) -> float:
+        return self.get(ConverterConfig.K_SCHEDULER_FAST_DURATION)
+
     @property
     def media_in_folder(self) -> str:
         return self.get(ConverterConfig.K_IN_FOLDER)
@@ -196,18 +389,88 @@ class ConverterConfig(dict):
     def media_in_converted_folder(self) -> str:
         return self.get(ConverterConfig.K_IN_CONVERTED_FOLDER)
 
+    @property
+    def media_in_recursive(self) -> bool:
+        return self.get(ConverterConfig.K_IN_RECURSIVE)
+
     @property
     def media_in_timeout(self) -> float:
         return self.get(ConverterConfig.K_IN_TIMEOUT)
 
+    @property
+    def media_in_observer(self) -> str:
+        return self.get(ConverterConfig.K_IN_OBSERVER)
+
+    @property
+    def media_in_quiet_period(self) -> float:
+        return self.get(ConverterConfig.K_IN_QUIET_PERIOD)
+
+    @property
+    def media_in_backlog(self) -> bool:
+        return self.get(ConverterConfig.K_IN_BACKLOG)
+
     @property
     def media_out_folder(self) -> str:
         return self.get(ConverterConfig.K_OUT_FOLDER, ConverterConfig.V_DEFAULT_OUT_FOLDER)
 
     @property
-    def media_out_format(self) -> dict:
+    def media_out_format(self) -> object:
+        """
+        :return: dict of a single conversion format or list of conversion formats (renditions)
+        """
         return self.get(ConverterConfig.K_OUT_FORMAT, ConverterConfig.V_DEFAULT_OUT_FORMAT)
 
+    @property
+    def media_out_formats(self) -> list:
+        out_format = self.media_out_format
+        if out_format is None:
+            return []
+        return list(out_format) if isinstance(out_format, (list, tuple)) else [out_format]
+
+    @property
+    def media_out_stream_copy(self) -> bool:
+        return self.get(ConverterConfig.K_OUT_STREAM_COPY)
+
+    @property
+    def media_stall_timeout(self) -> float:
+        return self.get(ConverterConfig.K_STALL_TIMEOUT)
+
+    @property
+    def media_stall_kill_grace(self) -> float:
+        return self.get(ConverterConfig.K_STALL_KILL_GRACE)
+
+    @property
+    def media_limit_memory(self) -> int:
+        return self.get(ConverterConfig.K_LIMIT_MEMORY)
+
+    @property
+    def media_limit_cpu(self) -> int:
+        return self.get(ConverterConfig.K_LIMIT_CPU)
+
+    @property
+    def media_limit_parent_death(self) -> bool:
+        return self.get(ConverterConfig.K_LIMIT_PARENT_DEATH)
+
+    @property
+    def media_limit_process_group(self) -> bool:
+        return self.get(ConverterConfig.K_LIMIT_PROCESS_GROUP)
+
+    @property
+    def media_segment_threshold(self) -> float:
+        return self.get(ConverterConfig.K_SEGMENT_THRESHOLD)
+
+    @property
+    def media_segment_length(self) -> float:
+        return self.get(ConverterConfig.K_SEGMENT_LENGTH)
+
+    @property
+    def media_segment_scene(self) -> float:
+        return self.get(ConverterConfig.K_SEGMENT_SCENE)
+
+    @property
+    def media_segment_workers(self) -> int:
+        return self.get(ConverterConfig.K_SEGMENT_WORKERS)
+
     @property
     def media_ffmpeg(self) -> str:
         return self.get(ConverterConfig.K_FFMPEG_BIN)
@@ -216,6 +479,32 @@ class ConverterConfig(dict):
     def media_ffprobe(self) -> str:
         return self.get(ConverterConfig.K_FFPROBE_BIN)
 
+    @property
+    def media_probe_mode(self) -> str:
+        return self.get(ConverterConfig.K_PROBE_MODE)
+
+    @property
+    def media_probe_cache(self) -> str:
+        return self.get(ConverterConfig.K_PROBE_CACHE)
+
+    @property
+    def media_result_cache(self) -> str:
+        return self.get(ConverterConfig.K_RESULT_CACHE)
+
+    @property
+    def media_result_cache_size(self) -> int:
+        """
+        :return: maximum size (MiB) of the result cache
+        """
+        return self.get(ConverterConfig.K_RESULT_CACHE_SIZE)
+
+    @property
+    def watch_profiles(self) -> list:
+        """
+        :return: list of WatchProfile
+        """
+        return self.get(ConverterConfig.K_WATCH_PROFILES, [])
+
     def __str__(self):
         # chr(9) = '\t'
         # chr(10) = '\n'
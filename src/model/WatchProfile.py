@@ -0,0 +1,59 @@
+class WatchProfile(object):
+    """
+    Watched directory tree with its own destination and conversion formats
+    """
+
+    def __init__(self, name: str, in_folder: str, out_folder: str, out_format: object,
+                 in_converted_folder: str = None, recursive: bool = False):
+        """
+
+        :param name: profile name
+        :param in_folder: watched directory
+        :param out_folder: directory for converted files; subdirectories of in_folder are mirrored
+        :param out_format: dict of a single conversion format or list of conversion formats (renditions)
+        :param in_converted_folder: directory where converted files are moved, "" to delete them, None to leave them
+        :param recursive: watch subdirectories of in_folder too
+        """
+        super().__init__()
+
+        self.__name = name
+        self.__in_folder = in_folder
+        self.__out_folder = out_folder
+        self.__out_format = out_format
+        self.__in_converted_folder = in_converted_folder
+        self.__recursive = recursive
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def in_folder(self) -> str:
+        return self.__in_folder
+
+    @property
+    def out_folder(self) -> str:
+        return self.__out_folder
+
+    @property
+    def out_format(self) -> object:
+        return self.__out_format
+
+    @property
+    def out_formats(self) -> list:
+        if self.__out_format is None:
+            return []
+        return list(self.__out_format) if isinstance(self.__out_format, (list, tuple)) else [self.__out_format]
+
+    @property
+    def in_converted_folder(self) -> str:
+        return self.__in_converted_folder
+
+    @property
+    def recursive(self) -> bool:
+        return self.__recursive
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.__name!r}, in_folder={self.__in_folder!r}, " \
+               f"out_folder={self.__out_folder!r}, in_converted_folder={self.__in_converted_folder!r}, " \
+               f"recursive={self.__recursive}, out_format={self.__out_format!r})"
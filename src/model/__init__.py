@@ -1,3 +1,4 @@
+from model.WatchProfile import WatchProfile
 from model.ConverterConfig import ConverterConfig
 
-__all__ = ["ConverterConfig"]
+__all__ = ["WatchProfile", "ConverterConfig"]